@@ -1,83 +1,452 @@
 # app_ctk_login.py
 import customtkinter as ctk
 import tkinter as tk
-from tkinter import ttk, messagebox
-import mysql.connector
-from datetime import datetime
+from tkinter import ttk, messagebox, filedialog, simpledialog
+import argparse
+import json
+import queue
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
 
-#############################################
-#         DATABASE CONFIGURATION
-#############################################
-DB = dict(
-    host="127.0.0.1",
-    user="root",
-    password="",
-    database="rental"
-)
+import db
+from offline import OFFLINE, is_connection_error, offline
+from db import (apply_migrations, change_log_cursor, db_query, pending_migrations, prune_change_log,
+                read_changes)
+from repository import (IMPORT_SPECS, RENTAL_STATUSES, RENTALS_GRID_SQL, RENTALS_HISTORY_SOURCE, BookingError, ValidationError, customer_filter,
+                        customers, export_rentals, import_file, parse_date_flexible, quote_amount, rental_filter,
+                        rentals, validate_customer, validate_rental, validate_vehicle, vehicle_filter, vehicles,
+                        verify_admin, with_history)
 
 #############################################
 #           DATABASE HELPERS
 #############################################
-def db_conn():
+# db.py / repository.py raise on failure; the UI turns that into (ok, err) pairs.
+def db_call(fn, *args, **kwargs):
+    """Run a data-layer call; returns (True, result) or (False, error message)."""
     try:
-        return mysql.connector.connect(**DB)
+        return True, fn(*args, **kwargs)
     except Exception as e:
-        messagebox.showerror("DB Error", f"Could not connect: {e}")
-        return None
+        return False, str(e)
 
-def db_fetch(query, params=()):
-    conn = db_conn()
-    if not conn: return []
-    try:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(query, params)
-        return cur.fetchall()
-    except Exception as e:
-        messagebox.showerror("DB Error", str(e))
-        return []
-    finally:
-        try:
-            cur.close(); conn.close()
-        except: pass
+#############################################
+#           GRID ROW FORMATTING
+#############################################
+AMOUNT_DEBOUNCE_MS = 250     # rental modal waits this long after the last edit before re-pricing
 
-def db_exec(query, params=()):
-    conn = db_conn()
-    if not conn: return False, "Connection Failed"
+def rental_grid_values(r):
+    """Treeview values for one row of RENTALS_GRID_SQL."""
+    amt = r.get('computed_amount')
+    vehicle = r.get('reg_no') or r.get('vehicle_id')
+    customer = r.get('customer_name') or r.get('customer_id')
+    return (
+        r['id'],
+        vehicle if vehicle is not None else "",
+        customer if customer is not None else "",
+        r.get('start_date') or "",
+        r.get('expected_return_date') or "",
+        r.get('actual_return_date') or "",
+        r.get('status') or "",
+        f"{float(amt):.2f}" if amt is not None else "",
+        "✏️",  # edit
+        "🗑️"   # delete
+    )
+
+def rental_row_tag(values):
+    """'overdue' for an ongoing rental past its expected return, from the grid values alone."""
+    status, expected = values[6], values[4]
+    if status == "ongoing" and expected and str(expected) < date.today().isoformat():
+        return "overdue"
+    return None
+
+def vehicle_grid_values(r):
     try:
-        cur = conn.cursor()
-        cur.execute(query, params)
-        conn.commit()
-        return True, None
-    except Exception as e:
-        return False, str(e)
-    finally:
-        try:
-            cur.close(); conn.close()
-        except: pass
+        rate = f"{r['rate_per_day']:.2f}" if r.get('rate_per_day') is not None else ""
+    except:
+        rate = ""
+    # use emoji stickers for edit and delete
+    return (r['id'], r['reg_no'], r['make'], r['model'], r['year'], rate, r['status'], "✏️", "🗑️")
+
+def customer_grid_values(r):
+    return (r['id'], r['name'], r['phone'], r['email'], "✏️", "🗑️")
+
+SEARCH_DEBOUNCE_MS = 300     # search bars wait this long after the last keystroke
 
 #############################################
-#           ADMIN LOGIN HELPERS
+#        BACKGROUND (OFF-UI-THREAD) LOADING
 #############################################
-def verify_admin(username, password):
-    """Plain-text login (NO HASHING)."""
-    r = db_fetch("SELECT * FROM admins WHERE username=%s", (username,))
-    if not r:
-        return False, "User not found"
-    # r is list of dicts; safe access to 'password' key expected
-    if 'password' not in r[0]:
-        return False, "Admin table missing 'password' column"
-    return (r[0]['password'] == password), ("OK" if r[0]['password'] == password else "Incorrect password")
+class BackgroundLoader:
+    """Runs DB work on worker threads and hands results back to the Tk thread.
+
+    Work is submitted on a named channel; submitting again (or calling
+    cancel) on the same channel makes any earlier result stale, and stale
+    results are dropped instead of being delivered. Callbacks always run on
+    the Tk main loop, polled through after().
+    """
+    POLL_MS = 30
+
+    def __init__(self, widget, workers=3):
+        self.widget = widget
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-loader")
+        self._results = queue.Queue()
+        self._generation = {}
+        self._futures = {}
+        self._closed = False
+        self._poll()
+
+    def submit(self, channel, fn, on_done, on_error=None):
+        self.cancel(channel)
+        gen = self._generation[channel]
+        def work():
+            try:
+                self._results.put((channel, gen, True, fn(), on_done, on_error))
+            except Exception as e:
+                self._results.put((channel, gen, False, e, on_done, on_error))
+        self._futures[channel] = self._executor.submit(work)
+
+    def cancel(self, channel):
+        self._generation[channel] = self._generation.get(channel, 0) + 1
+        fut = self._futures.pop(channel, None)
+        if fut is not None:
+            fut.cancel()    # only stops work that has not started yet; running work is dropped on delivery
+
+    def busy(self, channel):
+        fut = self._futures.get(channel)
+        return fut is not None and not fut.done()
+
+    def _poll(self):
+        if self._closed:
+            return
+        while True:
+            try:
+                channel, gen, ok, value, on_done, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if self._generation.get(channel) != gen:
+                continue    # superseded or cancelled
+            self._futures.pop(channel, None)
+            if ok:
+                on_done(value)
+            elif on_error:
+                on_error(value)
+            else:
+                messagebox.showerror("DB Error", str(value))
+        try:
+            self.widget.after(self.POLL_MS, self._poll)
+        except tk.TclError:
+            self._closed = True
+
+    def shutdown(self):
+        self._closed = True
+        for channel in list(self._generation):
+            self.cancel(channel)
+        self._executor.shutdown(wait=False, cancel_futures=True)
 
 #############################################
-#       QUICK VEHICLE & CUSTOMER HELPERS
+#        PAGED (WINDOWED) TREEVIEW GRIDS
 #############################################
-def get_rate(vehicle_id):
-    r = db_fetch("SELECT rate_per_day FROM vehicles WHERE id=%s", (vehicle_id,))
-    if not r: return None
-    try:
-        return float(r[0]['rate_per_day'])
-    except:
-        return None
+GRID_PAGE_SIZE = 200     # rows fetched per keyset page
+GRID_MAX_PAGES = 3       # pages kept in a Treeview at once (visible rows + buffer)
+CHANGE_REPLAY_LIMIT = 500   # change_log entries (any table) refresh() will read before falling back to a reload
+class PagedTree:
+    """Keyset-paginated window over a Treeview.
+
+    Rows are pulled from MySQL a page at a time ordered by ``key DESC`` as the
+    user scrolls; once more than ``max_pages`` pages are materialized the page
+    furthest from the viewport is dropped, so widget size stays flat however
+    large the table grows. Items use the row id as their iid. Queries run on
+    ``loader`` (a BackgroundLoader) when given, otherwise inline.
+
+    After the first load, refresh() replays ``change_log`` entries written
+    since then and patches only the affected items instead of reloading.
+    """
+    def __init__(self, tree, scrollbar, select_sql, count_sql, key, to_values,
+                 count_label=None, page_size=GRID_PAGE_SIZE, max_pages=GRID_MAX_PAGES,
+                 loader=None, channel=None, change_table=None, related=None, offline_rows=None, row_tag=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.select_sql = select_sql      # SELECT ... FROM ... (no WHERE/ORDER BY)
+        self.count_sql = count_sql        # SELECT COUNT(*) AS n FROM ... (no WHERE)
+        self.key = key                    # keyset column, e.g. "id" or "r.id"
+        self.to_values = to_values
+        self.count_label = count_label
+        self.page_size = page_size
+        self.max_pages = max(2, max_pages)
+        self.loader = loader
+        self.channel = channel or str(tree)
+        self.change_table = change_table  # change_log table_name whose edits refresh() applies
+        self.related = related or {}      # other change_log tables -> FK column shown in this grid
+        self.offline_rows = offline_rows  # fn(limit) -> newest rows from the local replica, used when the server is down
+        self.row_tag = row_tag            # fn(values) -> tag replacing the stripe (e.g. "overdue"), or None
+        self.last_change = None           # change_log cursor captured by the last reload
+        self.where = []                   # extra SQL conditions, ANDed together
+        self.params = []
+        self.total = 0
+        self.pages = []                   # materialized pages, top to bottom: lists of ids
+        self.more_above = False
+        self.more_below = False
+        self._busy = False
+        tree.configure(yscrollcommand=self._on_scroll)
+
+    # ----- query side (may run on a worker thread: no widget access) -----
+    def _where_sql(self, extra=None):
+        conds = list(self.where) + ([extra] if extra else [])
+        return (" WHERE " + " AND ".join(f"({c})" for c in conds)) if conds else ""
+
+    def _fetch(self, cond=None, cond_params=(), order="DESC", limit=True):
+        sql = self.select_sql + self._where_sql(cond) + f" ORDER BY {self.key} {order}"
+        params = tuple(self.params) + tuple(cond_params)
+        if limit:
+            sql += " LIMIT %s"; params += (self.page_size + 1,)
+        rows = db_query(sql, params)
+        return [(str(r['id']), self.to_values(r)) for r in rows]
+
+    def _change_cursor(self):
+        if not self.change_table:
+            return None
+        try:
+            return change_log_cursor()
+        except Exception:
+            return None     # no change_log yet (old schema): refresh() falls back to reload()
+
+    def _query_changes(self, since, window):
+        changes = read_changes(since, CHANGE_REPLAY_LIMIT, tables={self.change_table, *self.related})
+        if changes is None:
+            return None     # entries we never saw were pruned, or too far behind: a reload is cheaper
+        log, cursor = changes
+        if not log:
+            return cursor, {}, [], 0
+        own, related = {}, {}
+        for e in log:
+            if e['table_name'] == self.change_table:
+                own.setdefault(int(e['row_id']), []).append(e['op'])
+            else:
+                if e['op'] == 'D':
+                    return None     # a parent vanished: its children may have cascaded silently
+                related.setdefault(e['table_name'], set()).add(int(e['row_id']))
+        rows = []
+        if own:
+            # re-read from the grid's current source, not from the log's ops: with "Include
+            # history" that is RENTALS_HISTORY_SOURCE, so a rental archive.py moved (a 'D' on
+            # rentals) is found in rentals_archive and kept; only rows gone from both are dropped
+            ids = sorted(own)
+            rows += self._fetch(f"{self.key} IN ({','.join(['%s'] * len(ids))})", ids, limit=False)
+        if window:
+            for table, ids in related.items():
+                ids = sorted(ids)
+                rows += self._fetch(f"{self.related[table]} IN ({','.join(['%s'] * len(ids))}) AND {self.key} BETWEEN %s AND %s",
+                                    (*ids, window[1], window[0]), limit=False)
+        if self.where:
+            delta = self._count() - self.total      # filtered grid: edits can move rows in or out
+        else:
+            present = {iid for iid, _ in rows}
+            delta = 0
+            for rid, ops in own.items():
+                if ops[0] == 'I' and str(rid) in present: delta += 1
+                elif ops[-1] == 'D' and ops[0] != 'I' and str(rid) not in present: delta -= 1
+        return cursor, own, rows, delta
+
+    def _count(self):
+        r = db_query(self.count_sql + self._where_sql(), tuple(self.params))
+        return int(r[0]['n']) if r else 0
+
+    def _run(self, fn, on_done):
+        def done(result):
+            self._busy = False
+            on_done(result)
+        def failed(e):
+            self._busy = False
+            if self.offline_rows is not None and is_connection_error(e):
+                return self._load_offline()
+            self._update_count()
+            messagebox.showerror("DB Error", str(e))
+        self._busy = True
+        if self.loader is None:
+            try:
+                result = fn()
+            except Exception as e:
+                return failed(e)
+            return done(result)
+        self.loader.submit(self.channel, fn, done, failed)
+
+    def cancel(self):
+        if self.loader is not None and self.loader.busy(self.channel):
+            self.loader.cancel(self.channel)
+            self._busy = False
+            self._update_count()
+
+    # ----- widget side (Tk thread only) -----
+    def _insert_page(self, rows, index):
+        ids = []
+        for i, (iid, values) in enumerate(rows):
+            # page size is even, so stripes line up across pages
+            self.tree.insert("", index if index == "end" else index + i, iid=iid, values=values, tags=self._tags(i, values))
+            ids.append(iid)
+        return ids
+
+    def _drop_page(self, ids):
+        existing = [i for i in ids if self.tree.exists(i)]
+        if existing:
+            self.tree.delete(*existing)
+
+    def _update_count(self):
+        if self.count_label is not None:
+            shown = sum(len(p) for p in self.pages)
+            self.count_label.configure(text=f"{self.total} records ({shown} loaded)")
+
+    def set_filter(self, where, params):
+        where, params = list(where), list(params)
+        if where == self.where and params == self.params:
+            return
+        self.where, self.params = where, params
+        self.reload()
+
+    def set_source(self, select_sql, count_sql, where=None, params=None):
+        """Switch the tables the grid reads (e.g. to include archived rows) and reload.
+
+        Pass ``where``/``params`` when the filter depends on the source, so both
+        change in the same reload.
+        """
+        where = self.where if where is None else list(where)
+        params = self.params if params is None else list(params)
+        if (select_sql, count_sql, where, params) == (self.select_sql, self.count_sql, self.where, self.params):
+            return
+        self.select_sql, self.count_sql = select_sql, count_sql
+        self.where, self.params = where, params
+        self.reload()
+
+    def reload(self):
+        if self.count_label is not None:
+            self.count_label.configure(text="Loading…")
+        self._run(lambda: (self._change_cursor(), self._count(), self._fetch()), self._apply_reload)
+
+    def _render(self, rows):
+        # Treeview work for one apply step, recorded as render.<channel> in db.metrics
+        return db.metrics.timed(f"render.{self.channel}", len(rows))
+
+    def _apply_reload(self, result):
+        self.last_change, self.total, rows = result
+        with self._render(rows):
+            self.tree.delete(*self.tree.get_children())
+            self.pages = []
+            self.more_above = False
+            self.more_below = len(rows) > self.page_size
+            self.pages.append(self._insert_page(rows[:self.page_size], "end"))
+            self._update_count()
+
+    def _load_offline(self):
+        # server unreachable: show the newest rows of the local replica (no filters, no paging)
+        rows = [(str(r['id']), self.to_values(r)) for r in self.offline_rows(self.page_size)]
+        with self._render(rows):
+            self.tree.delete(*self.tree.get_children())
+            self.last_change = None         # next refresh() does a full reload from the server
+            self.more_above = self.more_below = False
+            self.pages = [self._insert_page(rows, "end")]
+            self.total = len(rows)
+        if self.count_label is not None:
+            self.count_label.configure(text=f"{len(rows)} records (offline copy)")
+
+    def refresh(self):
+        """Apply rows changed since the last load; falls back to reload() when it can't."""
+        ids = [i for p in self.pages for i in p]
+        if self.last_change is None or not ids:
+            return self.reload()
+        since = self.last_change
+        window = (int(ids[0]), int(ids[-1]))
+        self._run(lambda: self._query_changes(since, window), self._apply_changes)
+
+    def _apply_changes(self, result):
+        if result is None:
+            return self.reload()
+        self.last_change, own, rows, delta = result
+        with self._render(rows):
+            fetched = dict(rows)
+            for iid, values in fetched.items():
+                if self.tree.exists(iid):
+                    self.tree.item(iid, values=values)
+                    if self.row_tag:
+                        page = next((p for p in self.pages if iid in p), None)
+                        if page:
+                            self.tree.item(iid, tags=self._tags(page.index(iid), values))
+                elif int(iid) in own:
+                    self._place(iid, values)
+            for rid in own:
+                iid = str(rid)
+                if iid not in fetched and self.tree.exists(iid):
+                    # deleted, or no longer matches the filters
+                    for p in self.pages:
+                        if iid in p:
+                            p.remove(iid); self._retag(p); break
+                    self.tree.delete(iid)
+            self.total = max(0, self.total + delta)
+            self._update_count()
+
+    def _place(self, iid, values):
+        # slot a new row into the id DESC order, unless it falls outside the materialized window
+        rid = int(iid)
+        if not self.pages:
+            self.pages = [[]]
+        ids = [i for p in self.pages for i in p]
+        if ids and rid > int(ids[0]) and self.more_above:
+            return
+        if ids and rid < int(ids[-1]) and self.more_below:
+            return
+        page = self.pages[-1]
+        for p in self.pages:
+            if not p or int(p[-1]) < rid:
+                page = p; break
+        pos = next((n for n, i in enumerate(page) if int(i) < rid), len(page))
+        if pos < len(page):
+            index = self.tree.index(page[pos])
+        elif page:
+            index = self.tree.index(page[-1]) + 1
+        else:
+            index = "end"
+        self.tree.insert("", index, iid=iid, values=values)
+        page.insert(pos, iid)
+        self._retag(page)
+
+    def _tags(self, i, values):
+        tag = self.row_tag(values) if self.row_tag else None
+        return (tag or ("even" if i%2==0 else "odd"),)
+
+    def _retag(self, page):
+        for i, iid in enumerate(page):
+            self.tree.item(iid, tags=self._tags(i, self.tree.item(iid, "values")))
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._busy or not self.pages:
+            return
+        if float(last) >= 0.95 and self.more_below and self.pages[-1]:
+            before = int(self.pages[-1][-1])
+            self._run(lambda: self._fetch(f"{self.key} < %s", (before,), "DESC"), self._apply_next)
+        elif float(first) <= 0.05 and self.more_above and self.pages[0]:
+            after = int(self.pages[0][0])
+            # walk upward (ASC) from the first visible id; flipped back into DESC order on apply
+            self._run(lambda: self._fetch(f"{self.key} > %s", (after,), "ASC"), self._apply_prev)
+
+    def _apply_next(self, rows):
+        anchor = self.pages[-1][-1]
+        with self._render(rows):
+            self.more_below = len(rows) > self.page_size
+            self.pages.append(self._insert_page(rows[:self.page_size], "end"))
+            if len(self.pages) > self.max_pages:
+                self._drop_page(self.pages.pop(0))
+                self.more_above = True
+            self.tree.see(anchor)
+            self._update_count()
+
+    def _apply_prev(self, rows):
+        anchor = self.pages[0][0]
+        with self._render(rows):
+            self.more_above = len(rows) > self.page_size
+            rows = list(reversed(rows[:self.page_size]))
+            self.pages.insert(0, self._insert_page(rows, 0))
+            if len(self.pages) > self.max_pages:
+                self._drop_page(self.pages.pop())
+                self.more_below = True
+            self.tree.see(anchor)
+            self._update_count()
 
 #############################################
 #                 UI APP
@@ -91,10 +460,16 @@ class App(ctk.CTk):
         self.title("Vehicle Rental Management")
         self.state("zoomed")                    # start maximized
         self.configure(fg_color="white")
+        self.loader = BackgroundLoader(self)
+        self.loader.submit("maintenance", prune_change_log, lambda _: None, lambda e: None)
         self._setup_styles()
         self._create_navbar()
         self._create_container()
-        self.switch("vehicles")
+        self.bind_all("<Control-Shift-D>", lambda e: self._debug_panel())
+        self.current = "vehicles"
+        self.after_idle(lambda: self.switch(self.current))     # paint the window first, then build the page
+        self.after(1000, self._offline_tick)
+        self.after(5000, self._overdue_tick)
 
     def _setup_styles(self):
         style = ttk.Style()
@@ -116,48 +491,320 @@ class App(ctk.CTk):
         self.btn_vehicles = ctk.CTkButton(btn_frame, text="Vehicles", width=160, command=lambda: self.switch("vehicles"))
         self.btn_customers = ctk.CTkButton(btn_frame, text="Customers", width=160, command=lambda: self.switch("customers"))
         self.btn_rentals = ctk.CTkButton(btn_frame, text="Rentals", width=160, command=lambda: self.switch("rentals"))
+        self.btn_dashboard = ctk.CTkButton(btn_frame, text="Dashboard", width=160, command=lambda: self.switch("dashboard"))
         self.btn_vehicles.grid(row=0, column=0, padx=6)
         self.btn_customers.grid(row=0, column=1, padx=6)
         self.btn_rentals.grid(row=0, column=2, padx=6)
+        self.btn_dashboard.grid(row=0, column=3, padx=6)
         ctk.CTkButton(nav, text="Logout", fg_color="#d9534f", width=120, command=self._logout).pack(side="right", padx=12)
+        self.sync_lbl = tk.Label(nav, text="", bg="white", font=("Segoe UI", 12), cursor="hand2")
+        self.sync_lbl.pack(side="right", padx=12)
+        self.sync_lbl.bind("<Button-1>", lambda e: self._review_conflicts())
 
     def _create_container(self):
         self.container = ctk.CTkFrame(self, fg_color="white")
         self.container.pack(fill="both", expand=True, padx=12, pady=12)
-        # frames for each section
-        self.frames = {}
-        for name in ("vehicles", "customers", "rentals"):
+        self.frames = {}        # section name -> frame, built on first visit by _page()
+
+    def _page(self, name):
+        if name not in self.frames:
             f = ctk.CTkFrame(self.container, fg_color="white")
             f.place(relx=0, rely=0, relwidth=1, relheight=1)
+            getattr(self, f"_build_{name}_page")(f)
             self.frames[name] = f
-
-        # build pages
-        self._build_vehicles_page(self.frames["vehicles"])
-        self._build_customers_page(self.frames["customers"])
-        self._build_rentals_page(self.frames["rentals"])
+        return self.frames[name]
 
     def switch(self, name):
-        # bring frame to front and refresh its data
-        self.frames[name].lift()
+        # bring frame to front and refresh its data; loads run off the UI thread
+        self._page(name).lift()
+        self.current = name
+        for other in ("vehicles", "customers", "rentals"):
+            if other != name and other in self.frames:
+                getattr(self, f"pager_{other}").cancel()    # drop stale loads for pages the user left
         if name == "vehicles":
-            self.load_vehicles()
+            self.refresh_vehicles()
             self._highlight(self.btn_vehicles)
         elif name == "customers":
-            self.load_customers()
+            self.refresh_customers()
             self._highlight(self.btn_customers)
         elif name == "rentals":
-            self.load_rentals()
+            self.refresh_rentals()
             self._highlight(self.btn_rentals)
+        elif name == "dashboard":
+            self.refresh_dashboard()
+            self._highlight(self.btn_dashboard)
 
     def _highlight(self, active_btn):
-        for b in (self.btn_vehicles, self.btn_customers, self.btn_rentals):
+        for b in (self.btn_vehicles, self.btn_customers, self.btn_rentals, self.btn_dashboard):
             b.configure(fg_color="transparent")
         active_btn.configure(fg_color="#cfe8ff")
 
+    def _debounced(self, key, fn, delay=SEARCH_DEBOUNCE_MS):
+        # run fn once input has been quiet for `delay` ms
+        pending = getattr(self, "_debounce_ids", {})
+        self._debounce_ids = pending
+        if pending.get(key):
+            self.after_cancel(pending[key])
+        pending[key] = self.after(delay, fn)
+
+    def _search_entry(self, parent, label, width=260):
+        tk.Label(parent, text=label, bg="white", font=("Segoe UI", 12)).pack(side="left", padx=(12,4))
+        var = tk.StringVar()
+        ctk.CTkEntry(parent, width=width, textvariable=var).pack(side="left", padx=4)
+        return var
+
+    def _status_filter(self, parent, values):
+        tk.Label(parent, text="Status", bg="white", font=("Segoe UI", 12)).pack(side="left", padx=(12,4))
+        var = tk.StringVar(value="all")
+        cb = ttk.Combobox(parent, textvariable=var, values=["all"] + values, state="readonly", width=12)
+        cb.pack(side="left", padx=4)
+        return var, cb
+
+    def _import(self, table):
+        path = filedialog.askopenfilename(title=f"Import {table}", filetypes=[
+            ("Data files", "*.csv *.json *.jsonl *.ndjson"), ("All files", "*.*")])
+        if not path:
+            return
+        pager = getattr(self, f"pager_{table}")
+        state = {'inserted': 0, 'rejected': 0, 'running': True}
+        def progress(inserted, rejected):
+            state['inserted'], state['rejected'] = inserted, rejected    # read by show_progress on the Tk thread
+        def show_progress():
+            if state['running']:
+                pager.count_label.configure(text=f"Importing… {state['inserted']} rows ({state['rejected']} rejected)")
+                self.after(250, show_progress)
+        def done(report):
+            state['running'] = False
+            msg = f"Imported {report['inserted']} {table} in {report['seconds']}s ({report['rows_per_sec']} rows/s)."
+            if report['rejected']:
+                msg += f"\n{report['rejected']} rejected, see {path}.rejects.csv. First few:\n"
+                msg += "\n".join(f"  record {n}: {err}" for n, err in report['rejects'][:5])
+            messagebox.showinfo("Import", msg)
+            pager.reload()
+            if table == "rentals":
+                self.load_vehicles()
+        def failed(e):
+            state['running'] = False
+            pager.reload()
+            messagebox.showerror("Import Failed", str(e))
+        self.loader.submit(f"import-{table}", lambda: import_file(table, path, progress=progress, rejects_path=path + ".rejects.csv"),
+                           done, failed)
+        show_progress()
+
+    def _export_rentals(self):
+        path = filedialog.asksaveasfilename(title="Export rentals", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("Parquet", "*.parquet")])
+        if not path:
+            return
+        lbl = self.pager_rentals.count_label
+        state = {'rows': 0, 'running': True}
+        def show_progress():
+            if state['running']:
+                lbl.configure(text=f"Exporting… {state['rows']} rows")
+                self.after(250, show_progress)
+        def finish(msg, error=False):
+            state['running'] = False
+            self.pager_rentals._update_count()
+            (messagebox.showerror if error else messagebox.showinfo)("Export", msg)
+        # exports exactly what the rentals grid is currently filtered to
+        where, params = list(self.pager_rentals.where), list(self.pager_rentals.params)
+        history = self.rentals_history.get()
+        self.loader.submit("export-rentals",
+                           lambda: export_rentals(path, where=where, params=params, include_history=history,
+                                                  progress=lambda n: state.update(rows=n)),
+                           lambda r: finish(f"Exported {r['rows']} rentals (revenue {r['revenue']:.2f}) in {r['seconds']}s."),
+                           lambda e: finish(str(e), error=True))
+        show_progress()
+
+    def destroy(self):
+        self.loader.shutdown()
+        super().destroy()
+
+    # ---------------- Offline replica & write queue ----------------
+    def _offline_tick(self):
+        # push queued writes, then pull server changes into the replica; repeats every sync_interval
+        def done(report):
+            text = "Online"
+            if report['pending']:
+                text += f" · {report['pending']} queued"
+            if report['conflicted']:
+                text += f" · {report['conflicted']} conflict(s)"
+            self.sync_lbl.configure(text=text, fg="#d9534f" if report['conflicted'] else "#28a745")
+            if report['applied']:
+                self.refresh_vehicles(); self.refresh_customers(); self.refresh_rentals()
+        def failed(e):
+            ok, pending = db_call(offline.pending_count)
+            self.sync_lbl.configure(text=f"Offline · {pending if ok else '?'} queued" if is_connection_error(e)
+                                    else "Sync error", fg="#d9534f")
+        if not self.loader.busy("offline"):
+            self.loader.submit("offline", offline.sync, done, failed)
+        self.after(OFFLINE['sync_interval'] * 1000, self._offline_tick)
+
+    def _overdue_tick(self):
+        # accrue late fees on overdue rentals; repeats every OVERDUE['interval'] seconds
+        from overdue import OVERDUE, accrue_late_fees
+        def done(report):
+            if report['updated']:
+                self.refresh_rentals()
+        if not self.loader.busy("overdue"):
+            self.loader.submit("overdue", accrue_late_fees, done, lambda e: None)  # offline: next tick retries
+        self.after(OVERDUE['interval'] * 1000, self._overdue_tick)
+
+    def _review_conflicts(self):
+        ok, conflicts = db_call(offline.conflicts)
+        if not ok or not conflicts:
+            return messagebox.showinfo("Sync", "No conflicting offline changes.")
+        forceable = [c for c in conflicts if c['state'] == 'conflict']
+        lines = "\n".join(f"#{c['id']} {c['op']} {c['tbl']} {c['row_id']}: {c['error']}"
+                          + ("" if c['state'] == 'conflict' else " (rejected)") for c in conflicts[:15])
+        modal = tk.Toplevel(self); modal.transient(self); modal.grab_set(); modal.title("Sync conflicts")
+        modal.configure(bg="white"); modal.resizable(False, False)
+        note = "Keep the server versions and discard these offline changes?"
+        if forceable:
+            note += (f"\nOverwrite re-sends the {len(forceable)} conflicting edit(s) over the server's changes;"
+                     " rejected ones cannot be applied and stay listed.")
+        tk.Label(modal, text=f"{lines}\n\n{note}", bg="white", font=("Segoe UI",11), justify="left",
+                 wraplength=640).pack(padx=16, pady=12, anchor="w")
+        def resolve(action, ops):
+            modal.destroy()
+            for c in ops:
+                offline.resolve(c['id'], action)
+            self._offline_tick()
+        btnf = tk.Frame(modal, bg="white"); btnf.pack(pady=10)
+        ctk.CTkButton(btnf, text="Keep server", width=140, command=lambda: resolve("discard", conflicts)).grid(row=0,column=0,padx=8)
+        if forceable:
+            ctk.CTkButton(btnf, text="Overwrite", width=140, fg_color="#d9534f",
+                          command=lambda: resolve("force", forceable)).grid(row=0,column=1,padx=8)
+        ctk.CTkButton(btnf, text="Cancel", width=120, command=modal.destroy).grid(row=0,column=2,padx=8)
+
+    def _read(self, table, fn, row_id):
+        """Fetch one row as a dict, from the offline copy when the server is down; returns (ok, row or error)."""
+        try:
+            rec = fn(row_id)
+            return True, (rec.as_dict() if hasattr(rec, "as_dict") else rec)
+        except Exception as e:
+            if not is_connection_error(e):
+                return False, str(e)
+            return db_call(offline.get, table, row_id)
+
+    def _write(self, table, op, fn, *args, row_id=None, values=None):
+        """Run a write; when the server is unreachable queue it offline instead. Returns (ok, error)."""
+        try:
+            fn(*args)
+            return True, None
+        except BookingError:
+            raise
+        except Exception as e:
+            if not is_connection_error(e):
+                return False, str(e)
+            ok, res = db_call(offline.enqueue, table, op, row_id, values)
+            if not ok:
+                return False, f"{e}\n\nCould not queue the change offline: {res}"
+        self.sync_lbl.configure(text=f"Offline · {offline.pending_count()} queued", fg="#d9534f")
+        messagebox.showinfo("Saved offline", "The server is unreachable. The change was saved on this computer "
+                                             "and will be sent when the connection is back.")
+        return True, None
+
+    def _bulk(self, tree, title, fn, *args, confirm=None, done="{n} rows updated.", refresh=(), guard=None):
+        """Run ``fn(selected ids, *args)`` as one call, then refresh each grid in ``refresh`` once.
+
+        ``guard(ids)`` may return a message refusing the selection.
+        """
+        ids = [int(i) for i in tree.selection()]
+        if not ids:
+            return messagebox.showinfo(title, "Select rows first (Ctrl+click / Shift+click for several).")
+        refusal = guard(ids) if guard else None
+        if refusal:
+            return messagebox.showinfo(title, refusal)
+        if confirm and not messagebox.askyesno(title, confirm.format(count=len(ids))):
+            return
+        ok, res = db_call(fn, ids, *args)
+        if not ok:
+            return messagebox.showerror(title, res)
+        for r in refresh:
+            r()
+        messagebox.showinfo(title, done.format(**res) if isinstance(res, dict) else done.format(n=res))
+
+    def _bulk_status(self, parent, tree_attr, statuses, fn, refresh, guard=None):
+        """'Set status' menu applying the picked status to the selected rows of ``self.<tree_attr>``."""
+        def pick(status):
+            menu.set("Set status…")
+            self._bulk(getattr(self, tree_attr), "Set status", fn, status, confirm=f"Set {{count}} selected rows to {status!r}?",
+                       done=f"{{n}} rows set to {status!r}.", refresh=refresh, guard=guard)
+        menu = ctk.CTkOptionMenu(parent, values=list(statuses), width=130, command=pick)
+        menu.set("Set status…")
+        menu.pack(side="left", padx=6)
+
+    def _mark_returned(self):
+        day = simpledialog.askstring("Mark returned", "Actual return date for the selected rentals:",
+                                     initialvalue=date.today().isoformat(), parent=self)
+        if day is None:
+            return
+        try:
+            day = parse_date_flexible(day)
+        except ValueError as ve:
+            return messagebox.showerror("Actual Date", str(ve))
+        if not day:
+            return
+        self._bulk(self.tree_rentals, "Mark returned", rentals.mark_returned, day,
+                   done="{returned} rentals returned, {vehicles} vehicles freed.",
+                   refresh=(self.refresh_rentals, self.refresh_vehicles), guard=self._refuse_archived)
+
+    def _debug_panel(self):
+        """Ctrl+Shift+D: query/render latency table and slow-query log from db.metrics."""
+        if getattr(self, "_debug_win", None) is not None and self._debug_win.winfo_exists():
+            return self._debug_win.lift()
+        win = self._debug_win = tk.Toplevel(self); win.title("Diagnostics"); win.geometry("1200x640"); win.configure(bg="white")
+        bar = tk.Frame(win, bg="white"); bar.pack(fill="x", padx=8, pady=8)
+        pool_lbl = tk.Label(bar, text="", bg="white", font=("Segoe UI", 11)); pool_lbl.pack(side="right", padx=6)
+
+        cols = ("key", "count", "rows", "mean", "p50", "p95", "p99", "max", "errors")
+        series = ttk.Treeview(win, columns=cols, show="headings", height=10)
+        for col, (txt, w) in zip(cols, [("Query / phase", 560), ("Count", 70), ("Rows", 80), ("Mean ms", 80), ("p50", 70),
+                                        ("p95", 70), ("p99", 70), ("Max ms", 80), ("Errors", 70)]):
+            series.heading(col, text=txt); series.column(col, width=w, anchor="w" if col == "key" else "center")
+        series.pack(fill="both", expand=True, padx=8)
+        tk.Label(win, text=f"Slow queries (≥ {db.METRICS['slow_query_ms']} ms)", bg="white",
+                 font=("Segoe UI", 12, "bold")).pack(anchor="w", padx=8, pady=(8, 0))
+        slow_cols = ("at", "ms", "rows", "sql", "params")
+        slow = ttk.Treeview(win, columns=slow_cols, show="headings", height=8)
+        for col, (txt, w) in zip(slow_cols, [("At", 150), ("ms", 70), ("Rows", 70), ("SQL", 640), ("Params", 240)]):
+            slow.heading(col, text=txt); slow.column(col, width=w, anchor="w")
+        slow.pack(fill="both", expand=True, padx=8, pady=(0, 8))
+
+        def refresh():
+            series.delete(*series.get_children()); slow.delete(*slow.get_children())
+            for key, s in db.metrics.snapshot().items():
+                series.insert("", "end", values=(key, s['count'], s['rows'], s['mean_ms'], s['p50_ms'], s['p95_ms'],
+                                                 s['p99_ms'], s['max_ms'], s['errors']))
+            for e in reversed(db.metrics.slow):
+                slow.insert("", "end", values=(e['at'], e['ms'], e['rows'], e['sql'], e['params']))
+            p = db._pool.stats if db._pool is not None else {}
+            replicas = "".join(f" · {r['replica']} {'up' if r['up'] else 'DOWN'}: {r['queries']} queries"
+                               for r in db.replication_status())
+            pool_lbl.configure(text=f"pool: {p.get('connects', 0)} connects, {p.get('queries', 0)} queries{replicas}")
+        def reset():
+            db.metrics.reset(); refresh()
+        def export():
+            path = filedialog.asksaveasfilename(parent=win, defaultextension=".json", filetypes=[("JSON", "*.json")])
+            if path:
+                ok, res = db_call(db.metrics.export, path)
+                messagebox.showinfo("Export", f"Metrics written to {path}") if ok else messagebox.showerror("Export Error", res)
+
+        ctk.CTkButton(bar, text="Refresh", width=110, command=refresh).pack(side="left", padx=6)
+        ctk.CTkButton(bar, text="Reset", width=110, command=reset).pack(side="left", padx=6)
+        ctk.CTkButton(bar, text="Export JSON", width=130, command=export).pack(side="left", padx=6)
+        refresh()
+
     def _logout(self):
+        # the window stays alive (hidden) with its pages and pool, so logging back in is instant
         if messagebox.askyesno("Logout", "Do you want to logout?"):
-            self.destroy()
-            LoginWindow().mainloop()
+            self.withdraw()
+            ReloginWindow(self)
+
+    def resume(self):
+        self.deiconify()
+        self.switch(self.current)      # catch up on changes made while logged out
 
     # ---------------- Vehicles Page ----------------
     def _build_vehicles_page(self, parent):
@@ -165,6 +812,25 @@ class App(ctk.CTk):
         top = ctk.CTkFrame(parent, fg_color="white")
         top.pack(fill="x", padx=8, pady=8)
         ctk.CTkButton(top, text="Add Vehicle", width=160, command=lambda: self._vehicle_modal()).pack(side="left", padx=6)
+        ctk.CTkButton(top, text="Import", width=110, command=lambda: self._import("vehicles")).pack(side="left", padx=6)
+        ctk.CTkButton(top, text="Delete selected", width=130, command=self._delete_vehicles).pack(side="left", padx=6)
+        self._bulk_status(top, "tree_vehicles", ("available", "rented"), vehicles.set_status,
+                          (self.refresh_vehicles,))
+        count_lbl = tk.Label(top, text="", bg="white", font=("Segoe UI", 12)); count_lbl.pack(side="right", padx=6)
+        search_var = self._search_entry(top, "Search")
+        status_var, status_cb = self._status_filter(top, ["available","rented"])
+        free_from_var = self._search_entry(top, "Free from", width=120)
+        free_to_var = self._search_entry(top, "to", width=120)
+        def apply_filter():
+            def date_or_none(var):
+                try: return parse_date_flexible(var.get())
+                except ValueError: return None
+            s = status_var.get()
+            self.pager_vehicles.set_filter(*vehicle_filter(search_var.get(), "" if s == "all" else s,
+                                                          date_or_none(free_from_var), date_or_none(free_to_var)))
+        for var in (search_var, free_from_var, free_to_var):
+            var.trace_add("write", lambda *_: self._debounced("vehicles", apply_filter))
+        status_cb.bind("<<ComboboxSelected>>", lambda e: apply_filter())
         tv_frame = ctk.CTkFrame(parent, fg_color="white")
         tv_frame.pack(fill="both", expand=True, padx=8, pady=8)
         cols = ("id","reg_no","make","model","year","rate","status","edit","delete")
@@ -176,38 +842,24 @@ class App(ctk.CTk):
         self.tree_vehicles.tag_configure("odd", background="#f7fbff")
         self.tree_vehicles.tag_configure("even", background="white")
         sb = ttk.Scrollbar(tv_frame, command=self.tree_vehicles.yview)
-        self.tree_vehicles.configure(yscrollcommand=sb.set)
+        self.pager_vehicles = PagedTree(self.tree_vehicles, sb, "SELECT * FROM vehicles",
+                                        "SELECT COUNT(*) AS n FROM vehicles", "id", vehicle_grid_values, count_lbl,
+                                        loader=self.loader, channel="vehicles", change_table="vehicles",
+                                        offline_rows=lambda n: offline.grid_rows("vehicles", n))
         self.tree_vehicles.pack(side="left", fill="both", expand=True)
         sb.pack(side="left", fill="y")
         # bind clicks for edit/delete cells
         self.tree_vehicles.bind("<Button-1>", self._on_vehicle_click)
+        self.tree_vehicles.bind("<Delete>", lambda e: self._delete_vehicles())
         self.tree_vehicles.bind("<Motion>", lambda e: self._tree_motion(e, self.tree_vehicles, edit_col=8, delete_col=9))
 
     def load_vehicles(self):
-        rows = db_fetch("SELECT * FROM vehicles ORDER BY id DESC")
-        self.tree_vehicles.delete(*self.tree_vehicles.get_children())
-        for i, r in enumerate(rows):
-            tag = "even" if i%2==0 else "odd"
-            try:
-                rate = f"{r['rate_per_day']:.2f}" if r.get('rate_per_day') is not None else ""
-            except:
-                rate = ""
-            # use emoji stickers for edit and delete
-            self.tree_vehicles.insert(
-                "", "end",
-                values=(
-                    r['id'],
-                    r['reg_no'],
-                    r['make'],
-                    r['model'],
-                    r['year'],
-                    rate,
-                    r['status'],
-                    "✏️",   # edit sticker
-                    "🗑️"    # delete sticker
-                ),
-                tags=(tag,)
-            )
+        if "vehicles" in self.frames:
+            self.pager_vehicles.reload()
+
+    def refresh_vehicles(self):
+        if "vehicles" in self.frames:    # an unbuilt page loads on its first visit
+            self.pager_vehicles.refresh()
 
     def _on_vehicle_click(self, event):
         if self.tree_vehicles.identify_region(event.x, event.y) != "cell": return
@@ -217,21 +869,23 @@ class App(ctk.CTk):
         vals = self.tree_vehicles.item(item, "values")
         vid = vals[0]
         if col == 8:   # Edit column (index 8)
-            rec = db_fetch("SELECT * FROM vehicles WHERE id=%s", (vid,))
-            self._vehicle_modal(data=(rec[0] if rec else None), vid=vid)
+            ok, rec = self._read("vehicles", lambda i: vehicles.get(i, primary=True), vid)
+            if not ok: return messagebox.showerror("DB Error", rec)
+            self._vehicle_modal(data=rec, vid=vid)
         elif col == 9: # Delete (index 9)
             if messagebox.askyesno("Delete", f"Delete vehicle {vid}? This will also delete related rentals."):
-                ok, err = db_exec("DELETE FROM rentals WHERE vehicle_id=%s", (vid,))
-                if not ok:
-                    messagebox.showerror("Error", err)
-                    return
-                ok, err = db_exec("DELETE FROM vehicles WHERE id=%s", (vid,))
+                ok, err = self._write("vehicles", "delete", vehicles.delete, vid, row_id=int(vid))
                 if not ok:
                     messagebox.showerror("Error", err)
                 else:
                     messagebox.showinfo("Deleted", "Vehicle deleted")
-                    self.load_vehicles()
-                    self.load_rentals()
+                    self.refresh_vehicles()
+                    self.refresh_rentals()
+
+    def _delete_vehicles(self):
+        self._bulk(self.tree_vehicles, "Delete", vehicles.delete_many, done="{n} vehicles deleted.",
+                   confirm="Delete {count} selected vehicles? This will also delete their rentals.",
+                   refresh=(self.refresh_vehicles, self.refresh_rentals))
 
     # ---------------- Customers Page ----------------
     def _build_customers_page(self, parent):
@@ -239,6 +893,12 @@ class App(ctk.CTk):
         top = ctk.CTkFrame(parent, fg_color="white")
         top.pack(fill="x", padx=8, pady=8)
         ctk.CTkButton(top, text="Add Customer", width=160, command=lambda: self._customer_modal()).pack(side="left", padx=6)
+        ctk.CTkButton(top, text="Import", width=110, command=lambda: self._import("customers")).pack(side="left", padx=6)
+        ctk.CTkButton(top, text="Delete selected", width=130, command=self._delete_customers).pack(side="left", padx=6)
+        count_lbl = tk.Label(top, text="", bg="white", font=("Segoe UI", 12)); count_lbl.pack(side="right", padx=6)
+        search_var = self._search_entry(top, "Search")
+        search_var.trace_add("write", lambda *_: self._debounced(
+            "customers", lambda: self.pager_customers.set_filter(*customer_filter(search_var.get()))))
         tv_frame = ctk.CTkFrame(parent, fg_color="white")
         tv_frame.pack(fill="both", expand=True, padx=8, pady=8)
         cols = ("id","name","phone","email","edit","delete")
@@ -250,30 +910,23 @@ class App(ctk.CTk):
         self.tree_customers.tag_configure("odd", background="#f7fbff")
         self.tree_customers.tag_configure("even", background="white")
         sb = ttk.Scrollbar(tv_frame, command=self.tree_customers.yview)
-        self.tree_customers.configure(yscrollcommand=sb.set)
+        self.pager_customers = PagedTree(self.tree_customers, sb, "SELECT * FROM customers",
+                                         "SELECT COUNT(*) AS n FROM customers", "id", customer_grid_values, count_lbl,
+                                         loader=self.loader, channel="customers", change_table="customers",
+                                         offline_rows=lambda n: offline.grid_rows("customers", n))
         self.tree_customers.pack(side="left", fill="both", expand=True)
         sb.pack(side="left", fill="y")
         self.tree_customers.bind("<Button-1>", self._on_customer_click)
+        self.tree_customers.bind("<Delete>", lambda e: self._delete_customers())
         self.tree_customers.bind("<Motion>", lambda e: self._tree_motion(e, self.tree_customers, edit_col=5, delete_col=6))
 
     def load_customers(self):
-        rows = db_fetch("SELECT * FROM customers ORDER BY id DESC")
-        self.tree_customers.delete(*self.tree_customers.get_children())
-        for i, r in enumerate(rows):
-            tag = "even" if i%2==0 else "odd"
-            # emoji stickers for edit/delete
-            self.tree_customers.insert(
-                "", "end",
-                values=(
-                    r['id'],
-                    r['name'],
-                    r['phone'],
-                    r['email'],
-                    "✏️",  # edit
-                    "🗑️"   # delete
-                ),
-                tags=(tag,)
-            )
+        if "customers" in self.frames:
+            self.pager_customers.reload()
+
+    def refresh_customers(self):
+        if "customers" in self.frames:    # an unbuilt page loads on its first visit
+            self.pager_customers.refresh()
 
     def _on_customer_click(self, event):
         if self.tree_customers.identify_region(event.x, event.y) != "cell": return
@@ -283,21 +936,24 @@ class App(ctk.CTk):
         vals = self.tree_customers.item(item, "values")
         cid = vals[0]
         if col == 5:
-            rec = db_fetch("SELECT * FROM customers WHERE id=%s", (cid,))
-            self._customer_modal(data=(rec[0] if rec else None), cid=cid)
+            ok, rec = self._read("customers", lambda i: customers.get(i, primary=True), cid)
+            if not ok: return messagebox.showerror("DB Error", rec)
+            self._customer_modal(data=rec, cid=cid)
         elif col == 6:
             if messagebox.askyesno("Delete", f"Delete customer {cid}? This will also delete related rentals."):
-                ok, err = db_exec("DELETE FROM rentals WHERE customer_id=%s", (cid,))
-                if not ok:
-                    messagebox.showerror("Error", err)
-                    return
-                ok, err = db_exec("DELETE FROM customers WHERE id=%s", (cid,))
+                ok, err = self._write("customers", "delete", customers.delete, cid, row_id=int(cid))
                 if not ok:
                     messagebox.showerror("Error", err)
                 else:
                     messagebox.showinfo("Deleted", "Customer deleted")
-                    self.load_customers()
-                    self.load_rentals()
+                    self.refresh_customers()
+                    self.refresh_rentals()
+                    self.refresh_vehicles()
+
+    def _delete_customers(self):
+        self._bulk(self.tree_customers, "Delete", customers.delete_many, done="{n} customers deleted.",
+                   confirm="Delete {count} selected customers? This will also delete their rentals.",
+                   refresh=(self.refresh_customers, self.refresh_rentals, self.refresh_vehicles))
 
     # ---------------- Rentals Page ----------------
     def _build_rentals_page(self, parent):
@@ -305,59 +961,68 @@ class App(ctk.CTk):
         top = ctk.CTkFrame(parent, fg_color="white")
         top.pack(fill="x", padx=8, pady=8)
         ctk.CTkButton(top, text="Add Rental", width=160, command=lambda: self._rental_modal()).pack(side="left", padx=6)
+        ctk.CTkButton(top, text="Import", width=110, command=lambda: self._import("rentals")).pack(side="left", padx=6)
+        ctk.CTkButton(top, text="Export", width=110, command=self._export_rentals).pack(side="left", padx=6)
+        ctk.CTkButton(top, text="Delete selected", width=130, command=self._delete_rentals).pack(side="left", padx=6)
+        ctk.CTkButton(top, text="Mark returned", width=130, command=self._mark_returned).pack(side="left", padx=6)
+        self._bulk_status(top, "tree_rentals", RENTAL_STATUSES, rentals.set_status,
+                          (self.refresh_rentals, self.refresh_vehicles), guard=self._refuse_archived)
+        count_lbl = tk.Label(top, text="", bg="white", font=("Segoe UI", 12)); count_lbl.pack(side="right", padx=6)
+        search_var = self._search_entry(top, "Search", width=200)
+        status_var, status_cb = self._status_filter(top, list(RENTAL_STATUSES))
+        from_var = self._search_entry(top, "From", width=120)
+        to_var = self._search_entry(top, "To", width=120)
+        def current_filter():
+            def date_or_none(var):
+                try: return parse_date_flexible(var.get())
+                except ValueError: return None      # half-typed date: ignore until it parses
+            s = status_var.get()
+            return rental_filter(search_var.get(), "" if s == "all" else s, date_or_none(from_var), date_or_none(to_var),
+                                 include_history=self.rentals_history.get())
+        def apply_filter():
+            self.pager_rentals.set_filter(*current_filter())
+        for var in (search_var, from_var, to_var):
+            var.trace_add("write", lambda *_: self._debounced("rentals", apply_filter))
+        status_cb.bind("<<ComboboxSelected>>", lambda e: apply_filter())
+        # archived (old returned) rentals are left out unless asked for
+        self.rentals_history = tk.BooleanVar(value=False)
+        def apply_source():
+            if self.rentals_history.get():
+                self.pager_rentals.set_source(with_history(RENTALS_GRID_SQL), f"SELECT COUNT(*) AS n FROM {RENTALS_HISTORY_SOURCE} r",
+                                              *current_filter())
+            else:
+                self.pager_rentals.set_source(RENTALS_GRID_SQL, "SELECT COUNT(*) AS n FROM rentals r", *current_filter())
+        ctk.CTkCheckBox(top, text="Include history", variable=self.rentals_history, command=apply_source).pack(side="left", padx=(12,4))
         tv_frame = ctk.CTkFrame(parent, fg_color="white")
         tv_frame.pack(fill="both", expand=True, padx=8, pady=8)
         cols = ("id","vehicle","customer","start","expected","actual","status","amount","edit","delete")
         self.tree_rentals = ttk.Treeview(tv_frame, columns=cols, show="headings")
-        headings = [("ID",80),("Vehicle",140),("Customer",160),("Start",140),("Expected",140),("Actual",140),("Status",120),("Amount",140),("✏️",100),("🗑️",100)]
+        headings = [("ID",80),("Vehicle",180),("Customer",240),("Start",140),("Expected",140),("Actual",140),("Status",120),("Amount",140),("✏️",100),("🗑️",100)]
         for col, (txt,w) in zip(cols, headings):
             self.tree_rentals.heading(col, text=txt)
             self.tree_rentals.column(col, width=w, anchor="center")
         self.tree_rentals.tag_configure("odd", background="#f7fbff")
         self.tree_rentals.tag_configure("even", background="white")
+        self.tree_rentals.tag_configure("overdue", background="#ffe3e3", foreground="#a61b1b")
         sb = ttk.Scrollbar(tv_frame, command=self.tree_rentals.yview)
-        self.tree_rentals.configure(yscrollcommand=sb.set)
+        self.pager_rentals = PagedTree(self.tree_rentals, sb, RENTALS_GRID_SQL,
+                                       "SELECT COUNT(*) AS n FROM rentals r", "r.id", rental_grid_values, count_lbl,
+                                       loader=self.loader, channel="rentals", change_table="rentals",
+                                       related={"vehicles": "r.vehicle_id", "customers": "r.customer_id"},
+                                       offline_rows=lambda n: offline.grid_rows("rentals", n), row_tag=rental_row_tag)
         self.tree_rentals.pack(side="left", fill="both", expand=True)
         sb.pack(side="left", fill="y")
         self.tree_rentals.bind("<Button-1>", self._on_rental_click)
+        self.tree_rentals.bind("<Delete>", lambda e: self._delete_rentals())
         self.tree_rentals.bind("<Motion>", lambda e: self._tree_motion(e, self.tree_rentals, edit_col=9, delete_col=10))
 
     def load_rentals(self):
-        rows = db_fetch("SELECT * FROM rentals ORDER BY id DESC")
-        self.tree_rentals.delete(*self.tree_rentals.get_children())
-        for i, r in enumerate(rows):
-            tag = "even" if i%2==0 else "odd"
-            amt = ""
-            try:
-                # prefer stored amount if available
-                if r.get('amount') is not None:
-                    amt = f"{float(r.get('amount')):.2f}"
-                else:
-                    rate = get_rate(r['vehicle_id'])
-                    if rate and r.get('start_date'):
-                        sd = datetime.strptime(r['start_date'], "%Y-%m-%d")
-                        ed = datetime.strptime(r['expected_return_date'], "%Y-%m-%d") if r.get('expected_return_date') else sd
-                        days = max(1, (ed - sd).days + 1)
-                        amt = f"{(rate or 0) * days:.2f}"
-            except:
-                amt = ""
-            # insert with emoji stickers for actions
-            self.tree_rentals.insert(
-                "", "end",
-                values=(
-                    r['id'],
-                    r['vehicle_id'],
-                    r['customer_id'],
-                    r.get('start_date') or "",
-                    r.get('expected_return_date') or "",
-                    r.get('actual_return_date') or "",
-                    r.get('status') or "",
-                    amt,
-                    "✏️",  # edit
-                    "🗑️"   # delete
-                ),
-                tags=(tag,)
-            )
+        if "rentals" in self.frames:
+            self.pager_rentals.reload()
+
+    def refresh_rentals(self):
+        if "rentals" in self.frames:    # an unbuilt page loads on its first visit
+            self.pager_rentals.refresh()
 
     def _on_rental_click(self, event):
         if self.tree_rentals.identify_region(event.x, event.y) != "cell": return
@@ -367,21 +1032,118 @@ class App(ctk.CTk):
         vals = self.tree_rentals.item(item, "values")
         rid = vals[0]
         if col == 9:
-            rec = db_fetch("SELECT * FROM rentals WHERE id=%s", (rid,))
-            self._rental_modal(data=(rec[0] if rec else None), rid=rid)
+            ok, rec = self._read("rentals", lambda i: rentals.get(i, primary=True), rid)
+            if not ok: return messagebox.showerror("DB Error", rec)
+            if rec is None:
+                ok, archived = db_call(rentals.archived, [int(rid)])
+                if not ok: return messagebox.showerror("DB Error", archived)
+                if archived:
+                    return messagebox.showinfo("Archived", f"Rental {rid} is archived history and can't be edited.")
+                # deleted by someone else since the grid loaded
+                messagebox.showinfo("Not found", f"Rental {rid} no longer exists.")
+                return self.refresh_rentals()
+            self._rental_modal(data=rec, rid=rid)
         elif col == 10:
+            refusal = self._refuse_archived([int(rid)])
+            if refusal:
+                return messagebox.showinfo("Archived", refusal)
             if messagebox.askyesno("Delete", f"Delete rental {rid}? This will free the vehicle if not returned."):
-                # free vehicle if needed
-                r = db_fetch("SELECT vehicle_id, status FROM rentals WHERE id=%s", (rid,))
-                if r and r[0].get('status') != 'returned':
-                    db_exec("UPDATE vehicles SET status='available' WHERE id=%s", (r[0]['vehicle_id'],))
-                ok, err = db_exec("DELETE FROM rentals WHERE id=%s", (rid,))
+                # frees the vehicle in the same transaction if it was not returned
+                ok, err = self._write("rentals", "delete", rentals.delete, rid, row_id=int(rid))
                 if not ok:
                     messagebox.showerror("Error", err)
                     return
                 messagebox.showinfo("Deleted", "Rental deleted")
-                self.load_rentals()
-                self.load_vehicles()
+                self.refresh_rentals()
+                self.refresh_vehicles()
+
+    def _delete_rentals(self):
+        self._bulk(self.tree_rentals, "Delete", rentals.delete_many, done="{n} rentals deleted.",
+                   confirm="Delete {count} selected rentals? Vehicles of rentals not yet returned are freed.",
+                   refresh=(self.refresh_rentals, self.refresh_vehicles), guard=self._refuse_archived)
+
+    def _refuse_archived(self, ids):
+        # with "Include history" on the grid also lists archived rentals, which are read-only
+        if not self.rentals_history.get():
+            return None
+        ok, archived = db_call(rentals.archived, ids)
+        if not ok:
+            return archived
+        if archived:
+            return ("Archived history can't be changed: rental " + ", ".join(f"#{i}" for i in archived[:10])
+                    + ("…" if len(archived) > 10 else "") + ".")
+        return None
+
+    # ---------------- Dashboard Page ----------------
+    def _build_dashboard_page(self, parent):
+        from dashboard import DASHBOARD_DAYS
+        tk.Label(parent, text="Dashboard", bg="white", font=("Segoe UI", 18, "bold")).pack(anchor="nw", padx=8, pady=(6,0))
+        top = ctk.CTkFrame(parent, fg_color="white")
+        top.pack(fill="x", padx=8, pady=8)
+        ctk.CTkButton(top, text="Refresh", width=120, command=self.refresh_dashboard).pack(side="left", padx=6)
+        ctk.CTkButton(top, text="Rebuild summaries", width=170, fg_color="#6c757d",
+                      command=self._rebuild_summaries).pack(side="left", padx=6)
+        self.dash_status = tk.Label(top, text="", bg="white", font=("Segoe UI", 12)); self.dash_status.pack(side="right", padx=6)
+
+        tiles = tk.Frame(parent, bg="white"); tiles.pack(fill="x", padx=8, pady=4)
+        self.dash_tiles = {}
+        for i, (key, title) in enumerate([("fleet", "Fleet"), ("utilization", "Utilization"), ("overdue", "Overdue"),
+                                          ("recent", f"Revenue, last {DASHBOARD_DAYS} days"), ("total", "Revenue, all time")]):
+            box = tk.Frame(tiles, bg="#f7fbff", highlightbackground="#cfe8ff", highlightthickness=1)
+            box.grid(row=0, column=i, padx=6, sticky="nsew"); tiles.columnconfigure(i, weight=1)
+            tk.Label(box, text=title, bg="#f7fbff", font=("Segoe UI", 12)).pack(anchor="w", padx=12, pady=(10,0))
+            self.dash_tiles[key] = tk.Label(box, text="–", bg="#f7fbff", font=("Segoe UI", 22, "bold"))
+            self.dash_tiles[key].pack(anchor="w", padx=12, pady=(0,10))
+
+        tables = tk.Frame(parent, bg="white"); tables.pack(fill="both", expand=True, padx=8, pady=8)
+        def table(column, title, cols):
+            frame = tk.Frame(tables, bg="white"); frame.grid(row=0, column=column, padx=6, sticky="nsew")
+            tables.columnconfigure(column, weight=1); tables.rowconfigure(0, weight=1)
+            tk.Label(frame, text=title, bg="white", font=("Segoe UI", 14, "bold")).pack(anchor="w")
+            tree = ttk.Treeview(frame, columns=[c for c, _ in cols], show="headings")
+            for c, w in cols:
+                tree.heading(c, text=c); tree.column(c, width=w, anchor="center")
+            tree.tag_configure("odd", background="#f7fbff")
+            tree.pack(fill="both", expand=True)
+            return tree
+        self.dash_by_day = table(0, "Revenue by day", [("Day", 140), ("Rentals", 90), ("Revenue", 140)])
+        self.dash_by_make = table(1, "Revenue by make", [("Make", 140), ("Vehicles", 90), ("Rentals", 90), ("Revenue", 140)])
+        self.dash_top = table(2, "Top vehicles", [("Reg No", 160), ("Vehicle", 200), ("Rentals", 90), ("Days", 80), ("Revenue", 140)])
+
+    def refresh_dashboard(self):
+        if "dashboard" not in self.frames:
+            return
+        from dashboard import dashboard_snapshot
+        self.dash_status.configure(text="Loading…")
+        self.loader.submit("dashboard", dashboard_snapshot, self._apply_dashboard,
+                           lambda e: self.dash_status.configure(text=f"Error: {e}"))
+
+    def _apply_dashboard(self, snap):
+        fleet, overdue, revenue = snap['fleet'], snap['overdue'], snap['revenue']
+        self.dash_tiles['fleet'].configure(text=f"{fleet['rented']} / {fleet['total']} out")
+        self.dash_tiles['utilization'].configure(text=f"{fleet['utilization_pct']:.1f}%")
+        self.dash_tiles['overdue'].configure(text=str(overdue['count']), fg="#d9534f" if overdue['count'] else "black")
+        self.dash_tiles['recent'].configure(text=f"{revenue['last_days']:,.2f}")
+        self.dash_tiles['total'].configure(text=f"{revenue['total']:,.2f}")
+        with db.metrics.timed("render.dashboard", len(snap['by_day']) + len(snap['by_make']) + len(snap['top_vehicles'])):
+            for tree, rows in ((self.dash_by_day, [(r['day'], r['rentals'], f"{float(r['revenue']):,.2f}") for r in snap['by_day']]),
+                               (self.dash_by_make, [(r['make'], r['vehicles'], r['rentals'], f"{float(r['revenue']):,.2f}")
+                                                    for r in snap['by_make']]),
+                               (self.dash_top, [(r['reg_no'], f"{r['make']} {r['model']}", r['rentals'], r['rented_days'],
+                                                 f"{float(r['revenue']):,.2f}") for r in snap['top_vehicles']])):
+                tree.delete(*tree.get_children())
+                for i, values in enumerate(rows):
+                    tree.insert("", "end", values=values, tags=("even" if i%2==0 else "odd",))
+        oldest = overdue['oldest_expected']
+        self.dash_status.configure(text=f"Oldest overdue: due {oldest}" if oldest else "No overdue rentals")
+
+    def _rebuild_summaries(self):
+        if not messagebox.askyesno("Rebuild", "Recompute the revenue summaries from all rentals?"):
+            return
+        self.dash_status.configure(text="Rebuilding…")
+        from dashboard import rebuild_summaries
+        self.loader.submit("dashboard", rebuild_summaries, lambda _: self.refresh_dashboard(),
+                           lambda e: messagebox.showerror("DB Error", str(e)))
 
     def _tree_motion(self, event, tree, edit_col, delete_col):
         try:
@@ -410,19 +1172,13 @@ class App(ctk.CTk):
             for k in entries: entries[k].insert(0, str(data.get(k,"")))
         def save_vehicle():
             try:
-                payload = {
-                    'reg_no': entries['reg_no'].get().strip(),
-                    'make': entries['make'].get().strip(),
-                    'model': entries['model'].get().strip(),
-                    'year': int(entries['year'].get().strip()),
-                    'rate_per_day': float(entries['rate_per_day'].get().strip()),
-                    'status': status_var.get()
-                }
-            except Exception:
-                return messagebox.showerror("Input Error", "Please check Year and Rate fields.")
-            ok, err = (db_exec("UPDATE vehicles SET reg_no=%s,make=%s,model=%s,year=%s,rate_per_day=%s,status=%s WHERE id=%s", (payload['reg_no'],payload['make'],payload['model'],payload['year'],payload['rate_per_day'],payload['status'],vid)) if vid else db_exec("INSERT INTO vehicles (reg_no,make,model,year,rate_per_day,status) VALUES (%s,%s,%s,%s,%s,%s)", (payload['reg_no'],payload['make'],payload['model'],payload['year'],payload['rate_per_day'],payload['status'])))
+                payload = validate_vehicle(dict({k: e.get() for k, e in entries.items()}, status=status_var.get()))
+            except ValidationError as ve:
+                return messagebox.showerror(ve.title, str(ve))
+            ok, err = (self._write("vehicles", "update", vehicles.update, vid, payload, row_id=int(vid), values=payload) if vid
+                       else self._write("vehicles", "insert", vehicles.insert, payload, values=payload))
             if not ok: messagebox.showerror("DB Error", err); return
-            modal.destroy(); self.load_vehicles()
+            modal.destroy(); self.refresh_vehicles()
         btnf = tk.Frame(modal, bg="white"); btnf.pack(pady=10)
         ctk.CTkButton(btnf, text="Save", width=140, command=save_vehicle).grid(row=0,column=0,padx=8)
         ctk.CTkButton(btnf, text="Cancel", width=120, command=modal.destroy).grid(row=0,column=1,padx=8)
@@ -439,27 +1195,32 @@ class App(ctk.CTk):
         if data:
             name.insert(0,data['name']); phone.insert(0,data['phone']); email.insert(0,data['email'])
         def save_customer():
-            if not (name.get().strip() and phone.get().strip() and email.get().strip()):
-                return messagebox.showerror("Input Error", "All fields required")
-            payload = {'name':name.get().strip(),'phone':phone.get().strip(),'email':email.get().strip()}
-            ok, err = (db_exec("UPDATE customers SET name=%s,phone=%s,email=%s WHERE id=%s", (payload['name'],payload['phone'],payload['email'],cid)) if cid else db_exec("INSERT INTO customers (name,phone,email) VALUES (%s,%s,%s)", (payload['name'],payload['phone'],payload['email'])))
+            try:
+                payload = validate_customer({'name': name.get(), 'phone': phone.get(), 'email': email.get()})
+            except ValidationError as ve:
+                return messagebox.showerror(ve.title, str(ve))
+            ok, err = (self._write("customers", "update", customers.update, cid, payload, row_id=int(cid), values=payload) if cid
+                       else self._write("customers", "insert", customers.insert, payload, values=payload))
             if not ok: messagebox.showerror("DB Error", err); return
-            modal.destroy(); self.load_customers()
+            modal.destroy(); self.refresh_customers()
         btnf = tk.Frame(modal, bg="white"); btnf.pack(pady=8)
         ctk.CTkButton(btnf, text="Save", width=140, command=save_customer).grid(row=0,column=0,padx=8)
         ctk.CTkButton(btnf, text="Cancel", width=120, command=modal.destroy).grid(row=0,column=1,padx=8)
 
     # ---------------- Rental modal (auto-calc amount and save to DB) ----------------
     def _rental_modal(self, data=None, rid=None):
+        from availability import availability   # billing/availability load on first use, not at startup
+        from billing import bill_rental
         modal = tk.Toplevel(self); modal.transient(self); modal.grab_set(); modal.title("Rental")
         modal.geometry("760x520"); modal.minsize(700,480); modal.configure(bg="white"); modal.lift(); modal.focus_force()
         content = tk.Frame(modal, bg="white"); content.pack(fill="both", expand=True, padx=20, pady=(20,10))
 
-        vehicle = ctk.CTkEntry(content, width=260)
+        vehicle_var = tk.StringVar(); start_var = tk.StringVar(); expected_var = tk.StringVar(); actual_var = tk.StringVar()
+        vehicle = ctk.CTkEntry(content, width=260, textvariable=vehicle_var)
         customer = ctk.CTkEntry(content, width=260)
-        start = ctk.CTkEntry(content, width=260)
-        expected = ctk.CTkEntry(content, width=260)
-        actual = ctk.CTkEntry(content, width=260)
+        start = ctk.CTkEntry(content, width=260, textvariable=start_var)
+        expected = ctk.CTkEntry(content, width=260, textvariable=expected_var)
+        actual = ctk.CTkEntry(content, width=260, textvariable=actual_var)
 
         tk.Label(content, text="Vehicle ID", bg="white", font=("Segoe UI",12)).grid(row=0, column=0, sticky="w", pady=8)
         vehicle.grid(row=0, column=1, pady=8, sticky="w")
@@ -474,7 +1235,7 @@ class App(ctk.CTk):
 
         tk.Label(content, text="Status", bg="white", font=("Segoe UI",12)).grid(row=5, column=0, sticky="w", pady=8)
         status_var = tk.StringVar(value=(data['status'] if data else 'ongoing'))
-        status_cb = ttk.Combobox(content, textvariable=status_var, values=["ongoing","returned"], state="readonly", width=22)
+        status_cb = ttk.Combobox(content, textvariable=status_var, values=list(RENTAL_STATUSES), state="readonly", width=22)
         status_cb.grid(row=5, column=1, pady=8, sticky="w")
 
         # read-only amount entry (visible like vehicle)
@@ -482,6 +1243,10 @@ class App(ctk.CTk):
         tk.Label(content, text="Amount (auto-calculated)", bg="white", font=("Segoe UI",12,"bold")).grid(row=6, column=0, sticky="w", pady=10)
         amt_entry = ctk.CTkEntry(content, textvariable=amt_var, width=340, state="readonly")
         amt_entry.grid(row=6, column=1, sticky="w", pady=10)
+        late_lbl = tk.Label(content, text="", bg="white", fg="#d9534f", font=("Segoe UI",12))
+        late_lbl.grid(row=7, column=1, sticky="w")
+        avail_lbl = tk.Label(content, text="", bg="white", fg="#d9534f", font=("Segoe UI",12))
+        avail_lbl.grid(row=8, column=1, sticky="w")
 
         computed_amount = {'value': None}
 
@@ -498,61 +1263,53 @@ class App(ctk.CTk):
                 except:
                     pass
 
-        def parse_date_flexible(s):
-            if not s or not s.strip():
-                return None
-            s = s.strip()
-            fmts = ["%Y-%m-%d", "%d-%m-%Y", "%d-%m-%y", "%Y/%m/%d", "%d/%m/%Y"]
-            for f in fmts:
-                try:
-                    dt = datetime.strptime(s, f)
-                    return dt.strftime("%Y-%m-%d")
-                except:
-                    continue
-            raise ValueError(f"Unrecognized date format: {s!r}. Use YYYY-MM-DD or DD-MM-YYYY.")
-
         def compute_amount():
+            # pricing and the availability check run on the loader; the labels fill in when they return
             amt_var.set("")
             computed_amount['value'] = None
-            try:
-                vid_text = vehicle.get().strip()
-                sd_text = start.get().strip()
-                ed_text = expected.get().strip() or sd_text
-
-                if not vid_text or not sd_text:
-                    return
-                try:
-                    vid = int(vid_text)
-                except:
-                    return
-                rate = get_rate(vid)
-                if rate is None:
+            late_lbl.configure(text=""); avail_lbl.configure(text="")
+            v, s, e, a, st = vehicle.get(), start.get(), expected.get(), actual.get(), status_var.get()
+            exclude = int(rid) if rid else None
+            def work():
+                quote = quote_amount(v, s, e)
+                if quote is None:
+                    return None
+                total, days, rate = quote
+                # same rules as the batch billing run (billing.py)
+                sd, ed = parse_date_flexible(s), parse_date_flexible(e)
+                _, _, overdue, fee = bill_rental(rate, sd, ed, parse_date_flexible(a), st)
+                clash = None
+                if st in ("ongoing", "reserved"):
+                    try:
+                        clash = availability.clash(v, sd, ed, exclude=exclude)
+                    except Exception:
+                        pass    # index unavailable: booking still checks in its transaction
+                return total, days, rate, overdue, fee, clash
+            def done(result):
+                if result is None:
                     return
-                try:
-                    sd_iso = parse_date_flexible(sd_text)
-                    ed_iso = parse_date_flexible(ed_text) or sd_iso
-                except:
-                    return
-                d1 = datetime.strptime(sd_iso, "%Y-%m-%d")
-                d2 = datetime.strptime(ed_iso, "%Y-%m-%d")
-                days = max(1, (d2 - d1).days + 1)
-                total = (rate or 0) * days
+                total, days, rate, overdue, fee, clash = result
                 computed_amount['value'] = float(total)
                 amt_var.set(f"{total:.2f}   ( {days} days @ {rate:.2f} )")
-            except:
-                amt_var.set("")
-                computed_amount['value'] = None
+                if overdue:
+                    late_lbl.configure(text=f"+ late fee {fee:.2f}  ( {overdue} days overdue )")
+                if clash is not None:
+                    avail_lbl.configure(text=f"Vehicle is booked for these dates (rental #{clash})")
+            self.loader.submit("rental-quote", work, done, lambda e: None)    # half-typed input: leave blank
 
-        # polling for reliable updates
-        def poll():
-            compute_amount()
+        # recompute only when an input changes, debounced so typing doesn't hit the DB per keystroke
+        def schedule_compute(*_):
             try:
-                modal._after_id = modal.after(300, poll)
+                if getattr(modal, "_after_id", None):
+                    modal.after_cancel(modal._after_id)
+                modal._after_id = modal.after(AMOUNT_DEBOUNCE_MS, compute_amount)
             except:
                 pass
 
         modal._after_id = None
-        poll()
+        for var in (vehicle_var, start_var, expected_var, actual_var, status_var):
+            var.trace_add("write", schedule_compute)
+        schedule_compute()
 
         def _on_close():
             try:
@@ -560,6 +1317,7 @@ class App(ctk.CTk):
                     modal.after_cancel(modal._after_id)
             except:
                 pass
+            self.loader.cancel("rental-quote")
             try: modal.destroy()
             except: pass
 
@@ -568,62 +1326,31 @@ class App(ctk.CTk):
         btn_frame = tk.Frame(modal, bg="white"); btn_frame.pack(fill="x", side="bottom", pady=(6,12))
 
         def on_save_rental():
-            # validate IDs
-            vid_text = vehicle.get().strip(); cid_text = customer.get().strip()
-            if not vid_text or not cid_text:
-                return messagebox.showerror("Input Error", "Vehicle ID and Customer ID are required.")
-            try:
-                vid = int(vid_text)
-            except:
-                return messagebox.showerror("Input Error", "Vehicle ID must be an integer.")
-            try:
-                cid = int(cid_text)
-            except:
-                return messagebox.showerror("Input Error", "Customer ID must be an integer.")
-            # parse dates
-            try:
-                sd_iso = parse_date_flexible(start.get().strip())
-                if not sd_iso:
-                    return messagebox.showerror("Input Error", "Start date required.")
-            except ValueError as ve:
-                return messagebox.showerror("Start Date", str(ve))
             try:
-                ed_iso = parse_date_flexible(expected.get().strip()) or sd_iso
-            except ValueError as ve:
-                return messagebox.showerror("Expected Date", str(ve))
-            try:
-                act_iso = parse_date_flexible(actual.get().strip())
-            except ValueError as ve:
-                return messagebox.showerror("Actual Date", str(ve))
+                vid, cid, sd_iso, ed_iso, act_iso, _, _ = validate_rental({
+                    'vehicle_id': vehicle.get(), 'customer_id': customer.get(), 'start_date': start.get(),
+                    'expected_return_date': expected.get(), 'actual_return_date': actual.get(), 'status': status_var.get()})
+            except ValidationError as ve:
+                return messagebox.showerror(ve.title, str(ve))
 
-            # logical check
+            # price with the saved inputs; a quote still in flight is dropped
+            self.loader.cancel("rental-quote")
             try:
-                sd_dt = datetime.strptime(sd_iso, "%Y-%m-%d")
-                ed_dt = datetime.strptime(ed_iso, "%Y-%m-%d")
-                if ed_dt < sd_dt:
-                    return messagebox.showerror("Input Error", "Expected return date cannot be before start date.")
-            except:
-                return messagebox.showerror("Input Error", "Invalid dates.")
-
-            # compute and include amount
-            compute_amount()
-            amt_val = computed_amount['value']
+                quote = quote_amount(vid, sd_iso, ed_iso)
+                amt_val = float(quote[0]) if quote else None
+            except Exception:
+                amt_val = None
 
             payload = (vid, cid, sd_iso, ed_iso, act_iso, status_var.get(), amt_val)
 
-            if rid:
-                ok, err = db_exec("UPDATE rentals SET vehicle_id=%s,customer_id=%s,start_date=%s,expected_return_date=%s,actual_return_date=%s,status=%s,amount=%s WHERE id=%s", (vid, cid, sd_iso, ed_iso, act_iso, status_var.get(), amt_val, rid))
-            else:
-                # check vehicle availability if starting ongoing
-                if status_var.get() == 'ongoing':
-                    v = db_fetch("SELECT status FROM vehicles WHERE id=%s", (vid,))
-                    if not v:
-                        return messagebox.showerror("Error", "Vehicle not found.")
-                    if v[0].get('status') != 'available':
-                        return messagebox.showerror("Error", "Vehicle is not available.")
-                ok, err = db_exec("INSERT INTO rentals (vehicle_id,customer_id,start_date,expected_return_date,actual_return_date,status,amount) VALUES (%s,%s,%s,%s,%s,%s,%s)", payload)
-                if ok and status_var.get() == 'ongoing':
-                    db_exec("UPDATE vehicles SET status='rented' WHERE id=%s", (vid,))
+            # availability check, write and vehicle status flips happen in one locked transaction
+            try:
+                if rid:
+                    ok, err = self._write("rentals", "update", rentals.update, rid, payload, row_id=int(rid), values=payload)
+                else:
+                    ok, err = self._write("rentals", "insert", rentals.book, *payload, values=payload)
+            except BookingError as be:
+                return messagebox.showerror("Error", str(be))
 
             if not ok:
                 # helpful hint if 'amount' missing in DB
@@ -633,28 +1360,29 @@ class App(ctk.CTk):
                     messagebox.showerror("DB Error", err)
                 return
 
-            # cancel poll then close
+            # cancel pending recompute then close
             try:
                 if getattr(modal, "_after_id", None):
                     modal.after_cancel(modal._after_id)
             except:
                 pass
+            self.loader.cancel("rental-quote")
             modal.destroy()
-            self.load_rentals()
-            self.load_vehicles()
+            self.refresh_rentals()
+            self.refresh_vehicles()
 
         ctk.CTkButton(btn_frame, text="Save", width=170, fg_color="#28a745", command=on_save_rental).pack(side="right", padx=(6,14))
         ctk.CTkButton(btn_frame, text="Cancel", width=140, fg_color="#6c757d", command=_on_close).pack(side="right", padx=6)
 
 # -------- Login Window (plain-text password) --------
-class LoginWindow(ctk.CTk):
-    def __init__(self):
-        super().__init__()
-        self.title("Admin Login")
-        self.state("zoomed")
-        self.configure(fg_color="white")
-        self._build_ui()
+STARTUP_CONNECTIONS = 3     # pool connections opened while the login form is on screen
+
+def _startup_checks():
+    db.get_pool().prefill(STARTUP_CONNECTIONS)
+    return pending_migrations()
 
+class _LoginForm:
+    """Username/password card shared by the startup window and the re-login window."""
     def _build_ui(self):
         page = ctk.CTkFrame(self, fg_color="white")
         page.pack(fill="both", expand=True)
@@ -666,21 +1394,161 @@ class LoginWindow(ctk.CTk):
         tk.Label(card, text="Password", bg="white", font=("Segoe UI",12)).pack(anchor="w", padx=24, pady=(12,6))
         self.entry_pass = ctk.CTkEntry(card, width=520); self.entry_pass.pack(padx=24)
         f = ctk.CTkFrame(card, fg_color="white"); f.pack(pady=14)
-        ctk.CTkButton(f, text="Login", width=160, command=self._login).grid(row=0,column=0,padx=8)
-        ctk.CTkButton(f, text="Exit", width=140, command=self.destroy).grid(row=0,column=1,padx=8)
+        self.btn_login = ctk.CTkButton(f, text="Login", width=160, command=self._login)
+        self.btn_login.grid(row=0,column=0,padx=8)
+        ctk.CTkButton(f, text="Exit", width=140, command=self._exit).grid(row=0,column=1,padx=8)
         self.bind("<Return>", lambda e: self._login())
+        self.entry_user.focus_set()
 
     def _login(self):
+        if self.btn_login.cget("state") == "disabled":
+            return      # schema upgrade still running
         user = self.entry_user.get().strip(); pwd = self.entry_pass.get().strip()
         if not user or not pwd:
             return messagebox.showwarning("Input Error", "Enter username and password")
-        ok, msg = verify_admin(user, pwd)
+        reachable, result = db_call(verify_admin, user, pwd)
+        if not reachable:
+            return messagebox.showerror("DB Error", f"Could not connect: {result}")
+        ok, msg = result
         if ok:
             messagebox.showinfo("Welcome", "Login successful")
-            self.destroy()
-            app = App(); app.mainloop()
+            self._logged_in()
         else:
             messagebox.showerror("Login Failed", msg)
 
+class LoginWindow(_LoginForm, ctk.CTk):
+    """Startup window; main() opens the App once ``logged_in`` is set and this window is gone."""
+    def __init__(self):
+        super().__init__()
+        self.title("Admin Login")
+        self.state("zoomed")
+        self.configure(fg_color="white")
+        self.logged_in = False
+        self._build_ui()
+        # connect and check the schema in the background while the form is shown
+        self.loader = BackgroundLoader(self, workers=1)
+        self.loader.submit("startup", _startup_checks, self._check_schema,
+                           lambda e: messagebox.showerror("DB Error", f"Could not check schema version: {e}"))
+
+    def _check_schema(self, pending):
+        if not pending:
+            return
+        names = "\n".join(f"{v:03d}_{n}" for v, n, _ in pending)
+        if not messagebox.askyesno("Database Upgrade", f"The database needs these migrations:\n{names}\n\nApply them now?"):
+            return
+        # migrations can rebuild big tables: run them on the loader and hold the login until they finish
+        self.btn_login.configure(state="disabled", text="Upgrading…")
+        def finished():
+            self.btn_login.configure(state="normal", text="Login")
+        def done(_):
+            finished()
+            messagebox.showinfo("Database Upgrade", f"Applied {len(pending)} migration(s).")
+        def failed(e):
+            finished()
+            messagebox.showerror("Database Upgrade", str(e))
+        self.loader.submit("migrate", lambda: apply_migrations(log=lambda msg: None), done, failed)
+
+    def _logged_in(self):
+        self.logged_in = True
+        self._exit()
+
+    def _exit(self):
+        self.loader.shutdown()
+        self.destroy()
+
+class ReloginWindow(_LoginForm, ctk.CTkToplevel):
+    """Login shown over the hidden main window after logout."""
+    def __init__(self, app):
+        super().__init__(app)
+        self.app = app
+        self.title("Admin Login")
+        self.state("zoomed")
+        self.configure(fg_color="white")
+        self.protocol("WM_DELETE_WINDOW", self._exit)
+        self._build_ui()
+
+    def _logged_in(self):
+        self.destroy()
+        self.app.resume()
+
+    def _exit(self):
+        self.app.destroy()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Vehicle Rental Management")
+    ap.add_argument("--migrate", action="store_true", help="apply pending schema migrations and exit")
+    ap.add_argument("--import", dest="import_", nargs=2, metavar=("TABLE", "FILE"),
+                    help=f"bulk-import a .csv/.json/.jsonl file into one of: {', '.join(IMPORT_SPECS)}")
+    ap.add_argument("--export-rentals", metavar="FILE", help="stream rentals to a .csv or .parquet file")
+    ap.add_argument("--status", default="", help="export filter: rental status")
+    ap.add_argument("--from", dest="date_from", help="export filter: start date on/after")
+    ap.add_argument("--to", dest="date_to", help="export filter: start date on/before")
+    ap.add_argument("--history", action="store_true", help="export: include archived rentals")
+    ap.add_argument("--bill", action="store_true", help="recompute overdue days and late fees for all rentals and exit")
+    ap.add_argument("--overdue", action="store_true", help="accrue late fees on overdue rentals once and exit")
+    ap.add_argument("--rebill-amounts", action="store_true", help="with --bill: also overwrite stored amounts")
+    ap.add_argument("--free", nargs=2, metavar=("FROM", "TO"), help="list vehicles with no booking in the date range")
+    ap.add_argument("--archive", action="store_true", help="move old returned rentals to rentals_archive and exit")
+    ap.add_argument("--archive-days", type=int, help="with --archive: minimum age in days since return")
+    ap.add_argument("--rebuild-summaries", action="store_true", help="recompute the dashboard revenue summaries and exit")
+    ap.add_argument("--slow-log", metavar="FILE", help="append slow queries to FILE as JSON lines")
+    ap.add_argument("--slow-ms", type=float, help=f"slow-query threshold in ms (default {db.METRICS['slow_query_ms']})")
+    ap.add_argument("--metrics-out", metavar="FILE", help="write query/render metrics as JSON on exit")
+    args = ap.parse_args(argv)
+    if args.slow_log:
+        db.METRICS['slow_log_file'] = args.slow_log
+    if args.slow_ms is not None:
+        db.METRICS['slow_query_ms'] = args.slow_ms
+
+    if args.import_:
+        table, path = args.import_
+        if table not in IMPORT_SPECS:
+            ap.error(f"unknown table {table!r}")
+        report = import_file(table, path, rejects_path=path + ".rejects.csv",
+                             progress=lambda ins, rej: print(f"\r{ins} inserted, {rej} rejected", end="", flush=True))
+        print(); print(json.dumps({k: v for k, v in report.items() if k != 'rejects'}))
+        return
+    if args.export_rentals:
+        report = export_rentals(args.export_rentals, args.status, parse_date_flexible(args.date_from),
+                                parse_date_flexible(args.date_to), include_history=args.history)
+        print(json.dumps(report))
+        return
+    if args.free:
+        from availability import availability
+        start, end = (parse_date_flexible(d) for d in args.free)
+        print(json.dumps(availability.free_vehicles(start, end)))
+        return
+    if args.overdue:
+        from overdue import accrue_late_fees
+        print(json.dumps(accrue_late_fees()))
+        return
+    if args.archive:
+        from archive import archive_rentals
+        report = archive_rentals(args.archive_days,
+                                 progress=lambda n: print(f"\r{n} rentals archived", end="", flush=True))
+        print(); print(json.dumps(report))
+        return
+    if args.rebuild_summaries:
+        from dashboard import rebuild_summaries
+        print(json.dumps(rebuild_summaries()))
+        return
+    if args.bill:
+        from billing import run_billing
+        report = run_billing(rebill_amounts=args.rebill_amounts,
+                             progress=lambda n, u: print(f"\r{n} rentals billed, {u} updated", end="", flush=True))
+        print(); print(json.dumps(report))
+        return
+    if args.migrate:
+        done = apply_migrations()
+        print(f"{len(done)} migration(s) applied." if done else "Schema is up to date.")
+        return
+    login = LoginWindow()
+    login.mainloop()
+    if login.logged_in:
+        App().mainloop()
+    if args.metrics_out:
+        db.metrics.export(args.metrics_out)
+    db.close_pools()
+
 if __name__ == "__main__":
-    LoginWindow().mainloop()
+    main()
@@ -0,0 +1,76 @@
+# archive.py
+"""Hot/cold split for rentals: move old returned rentals to rentals_archive.
+
+The rentals table then holds only open and recently returned rentals, so
+the grids, availability checks and billing stay the same size however many
+years of history pile up. Each batch copies up to ``batch_rows`` rentals
+into the archive and deletes them from rentals in one transaction, with
+@rental_archiving set so the dashboard summary triggers keep their revenue
+(migration 007). The deletes still reach change_log: on their next refresh
+grids over the hot table drop the rows, while "Include history" grids re-read
+the logged ids from repository.RENTALS_HISTORY_SOURCE, which reads both
+tables, and keep them.
+
+    python app_ctk_login.py --archive [--archive-days 365]
+"""
+from datetime import date, timedelta
+
+from db import db_query, transaction
+
+ARCHIVE = dict(
+    min_age_days=365,     # returned rentals whose expected and actual return dates are older than this are archived
+    batch_rows=5000       # rentals moved per transaction
+)
+
+_COLUMNS = ("id, vehicle_id, customer_id, start_date, expected_return_date, actual_return_date,"
+            " status, amount, overdue_days, late_fee")
+
+# a range on idx_rentals_status_expected (status, expected_return_date), oldest first; the
+# COALESCE only filters within it. Rentals without an expected return date are never archived.
+_CANDIDATES_SQL = ("SELECT id FROM rentals WHERE status='returned' AND expected_return_date < %s"
+                   " AND COALESCE(actual_return_date, expected_return_date) < %s"
+                   " ORDER BY expected_return_date LIMIT %s")
+
+def _archive_batch(cutoff, batch_rows):
+    with transaction() as cur:
+        cur.execute(_CANDIDATES_SQL, (cutoff, cutoff, int(batch_rows)))
+        ids = [r[0] for r in cur.fetchall()]
+        if not ids:
+            return 0
+        marks = ",".join(["%s"] * len(ids))
+        cur.execute("SET @rental_archiving = 1")
+        try:
+            cur.execute(f"INSERT INTO rentals_archive ({_COLUMNS}) SELECT {_COLUMNS} FROM rentals"
+                        f" WHERE id IN ({marks}) AND status='returned'", ids)     # re-checked: INSERT ... SELECT locks the rows
+            cur.execute(f"DELETE FROM rentals WHERE id IN ({marks}) AND status='returned'", ids)
+            return cur.rowcount
+        finally:
+            cur.execute("SET @rental_archiving = NULL")    # pooled connection: don't leak the flag
+
+def archive_rentals(min_age_days=None, batch_rows=None, today=None, progress=None):
+    """Move returned rentals older than ``min_age_days`` to the archive, batch by batch.
+
+    A rental qualifies once both its expected and actual return dates are
+    before the cutoff; rentals with no expected return date stay hot.
+
+    Returns {'archived': rentals moved, 'batches': transactions, 'cutoff': date}.
+    """
+    min_age_days = ARCHIVE['min_age_days'] if min_age_days is None else int(min_age_days)
+    batch_rows = batch_rows or ARCHIVE['batch_rows']
+    cutoff = (today or date.today()) - timedelta(days=min_age_days)
+    moved = batches = 0
+    while True:
+        n = _archive_batch(cutoff, batch_rows)
+        if not n:
+            break
+        moved += n
+        batches += 1
+        if progress:
+            progress(moved)
+    return {'archived': moved, 'batches': batches, 'cutoff': cutoff.isoformat()}
+
+def archive_stats():
+    """Row counts of the hot and archived rentals."""
+    hot = db_query("SELECT COUNT(*) AS n FROM rentals")[0]['n']
+    cold = db_query("SELECT COUNT(*) AS n, MIN(start_date) AS oldest, MAX(archived_at) AS last_run FROM rentals_archive")[0]
+    return {'hot': int(hot), 'archived': int(cold['n']), 'oldest': cold['oldest'], 'last_run': cold['last_run']}
@@ -0,0 +1,140 @@
+# async_service.py
+"""asyncio data path for kiosk/API processes: lookups, quotes and bookings over aiomysql.
+
+Shares the desktop app's rules rather than re-implementing them: input is
+checked with repository.validate_rental (the rental modal's validator),
+quotes use rental_days, and the booking transaction runs the same SQL
+and check_booking() as RentalRepository.book(), including the FOR UPDATE
+lock and deadlock retries. One event loop with a pool of ``maxsize``
+connections serves many concurrent requests.
+
+Needs aiomysql (pip install aiomysql).
+
+    async def main():
+        svc = await RentalService.create()
+        rental_id = await svc.book({'vehicle_id': 3, 'customer_id': 7, 'start_date': '2025-03-10',
+                                    'expected_return_date': '2025-03-15', 'status': 'reserved'})
+        await svc.close()
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+from db import DB
+from repository import (BOOKING_CLASH_SQL, BOOKING_LOCK_SQL, BOOKING_RENTED_SQL, BOOKING_RETRIES,
+                        BOOKING_RETRY_ERRNOS, VEHICLE_CACHE, Rental, RentalRepository, check_booking,
+                        parse_date_flexible, rental_days, rental_overlap_sql, validate_rental)
+
+ASYNC_DB_POOL = dict(
+    minsize=2,
+    maxsize=20,           # concurrent statements in flight; requests beyond this wait for a connection
+    pool_recycle=3600     # seconds before an idle connection is replaced
+)
+
+_VEHICLE_COLUMNS = "id, reg_no, make, model, year, rate_per_day, status"
+
+class RentalService:
+    """Async lookups, quotes and bookings on an aiomysql pool."""
+    def __init__(self, pool):
+        self.pool = pool
+        self._vehicles = OrderedDict()      # vehicle_id -> (expires, row): same LRU/TTL policy as VehicleCache
+
+    @classmethod
+    async def create(cls, **pool_overrides):
+        try:
+            import aiomysql
+        except ImportError:
+            raise RuntimeError("The async backend needs aiomysql: pip install aiomysql")
+        cfg = dict(ASYNC_DB_POOL, **pool_overrides)
+        pool = await aiomysql.create_pool(host=DB['host'], port=DB.get('port', 3306), user=DB['user'],
+                                          password=DB['password'], db=DB['database'], autocommit=True,
+                                          cursorclass=aiomysql.DictCursor, **cfg)
+        return cls(pool)
+
+    async def close(self):
+        self.pool.close()
+        await self.pool.wait_closed()
+
+    async def _query(self, sql, params=()):
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                return await cur.fetchall()
+
+    # ----- lookups -----
+    async def get_vehicle(self, vehicle_id):
+        vehicle_id = int(vehicle_id)
+        hit = self._vehicles.get(vehicle_id)
+        if hit and hit[0] > time.monotonic():
+            self._vehicles.move_to_end(vehicle_id)
+            return hit[1]
+        rows = await self._query(f"SELECT {_VEHICLE_COLUMNS} FROM vehicles WHERE id=%s", (vehicle_id,))
+        if not rows:
+            self._vehicles.pop(vehicle_id, None)
+            return None     # misses aren't cached, like repository.vehicle_cache: a new vehicle shows up at once
+        row = rows[0]
+        self._vehicles[vehicle_id] = (time.monotonic() + VEHICLE_CACHE['ttl'], row)
+        self._vehicles.move_to_end(vehicle_id)
+        while len(self._vehicles) > VEHICLE_CACHE['max_size']:
+            self._vehicles.popitem(last=False)
+        return row
+
+    async def get_rental(self, rental_id):
+        rows = await self._query(RentalRepository.select_sql() + " WHERE id=%s", (int(rental_id),))
+        return Rental.from_dict(rows[0]) if rows else None
+
+    async def free_vehicles(self, start, end=None, limit=100):
+        """Vehicles with no booking overlapping [start, end]; same rule as the Vehicles page filter."""
+        start = parse_date_flexible(start)
+        end = parse_date_flexible(end) or start
+        return await self._query(f"SELECT {_VEHICLE_COLUMNS} FROM vehicles WHERE NOT EXISTS"
+                                 f" (SELECT 1 FROM rentals r WHERE {rental_overlap_sql('vehicles.id')})"
+                                 " ORDER BY id LIMIT %s", (end, start, int(limit)))
+
+    async def quote(self, vehicle_id, start_text, expected_text=""):
+        """(total, days, rate) like repository.quote_amount, or None while inputs are incomplete."""
+        try:
+            v = await self.get_vehicle(vehicle_id)
+            sd = parse_date_flexible(start_text)
+            ed = parse_date_flexible(expected_text) or sd
+        except (TypeError, ValueError):
+            return None
+        if not v or not sd or v['rate_per_day'] is None:
+            return None
+        rate = float(v['rate_per_day'])
+        days = rental_days(sd, ed)
+        return rate * days, days, rate
+
+    # ----- booking -----
+    async def book(self, rec):
+        """Validate a rental mapping like the rental modal and book it; returns the new rental id.
+
+        Raises ValidationError or BookingError.
+        """
+        vid, cid, sd, ed, act, status, amount = validate_rental(rec)
+        for attempt in range(1, BOOKING_RETRIES + 1):
+            async with self.pool.acquire() as conn:
+                try:
+                    await conn.begin()
+                    async with conn.cursor() as cur:
+                        await cur.execute(BOOKING_LOCK_SQL, (vid,))
+                        v = await cur.fetchone()
+                        clash = None
+                        if v and status in ('ongoing', 'reserved'):
+                            await cur.execute(BOOKING_CLASH_SQL, (vid, ed or sd, sd))
+                            clash = await cur.fetchone()
+                        check_booking(v, clash, status)
+                        await cur.execute(RentalRepository.insert_sql(), (vid, cid, sd, ed, act, status, amount))
+                        rental_id = cur.lastrowid
+                        if status == 'ongoing':
+                            await cur.execute(BOOKING_RENTED_SQL, (vid,))
+                    await conn.commit()
+                except Exception as e:
+                    await conn.rollback()
+                    errno = e.args[0] if e.args and isinstance(e.args[0], int) else None
+                    if errno in BOOKING_RETRY_ERRNOS and attempt < BOOKING_RETRIES:
+                        await asyncio.sleep(0.01 * attempt)
+                        continue
+                    raise
+            self._vehicles.pop(vid, None)
+            return rental_id
@@ -0,0 +1,204 @@
+# availability.py
+"""In-memory interval index answering "which vehicles are free from X to Y".
+
+Only bookings that can still block a vehicle (ongoing and reserved
+rentals) are indexed, so the index stays small however much history the
+rentals table holds. Per vehicle, intervals are kept sorted by start date;
+a range query bisects to the last interval starting on or before the range
+end and walks back at most the vehicle's longest booking; one without an
+expected return date is open-ended, held from its start on. The index follows
+the database through change_log, like the grids do: sync() re-reads only
+the rentals logged since the last call and rebuilds when it falls too far
+behind. The same rules in SQL are repository.rental_overlap_sql().
+"""
+import bisect
+import threading
+from datetime import date, datetime, timedelta
+
+from db import change_log_cursor, db_query, read_changes
+
+AVAILABILITY_REPLAY_LIMIT = 5000    # change_log entries sync() applies before rebuilding instead
+
+_OPEN_RENTALS_SQL = ("SELECT id, vehicle_id, start_date, expected_return_date, status FROM rentals"
+                     " WHERE status IN ('ongoing','reserved')")
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date) or value is None:
+        return value
+    return datetime.strptime(str(value), "%Y-%m-%d").date()
+
+class _VehicleIntervals:
+    __slots__ = ("starts", "items", "longest", "ongoing", "open_ended")
+
+    def __init__(self):
+        self.starts = []        # sorted start dates, parallel to items
+        self.items = []         # (start, end, rental_id)
+        self.longest = timedelta(0)
+        self.ongoing = {}       # rental_id -> (start, end), checked separately: overdue ones never end
+        self.open_ended = {}    # rental_id -> start: no expected return date, so held from the start on
+
+    def add(self, start, end, rental_id, ongoing):
+        if end is None:
+            self.open_ended[rental_id] = start      # never overdue: there is no date to be late against
+            return
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.items.insert(i, (start, end, rental_id))
+        self.longest = max(self.longest, end - start)   # only grows; a stale maximum just scans a little more
+        if ongoing:
+            self.ongoing[rental_id] = (start, end)
+
+    def remove(self, rental_id, start):
+        if self.open_ended.pop(rental_id, None) is not None:
+            return
+        self.ongoing.pop(rental_id, None)
+        i = bisect.bisect_left(self.starts, start)
+        while i < len(self.items) and self.starts[i] == start:
+            if self.items[i][2] == rental_id:
+                del self.starts[i], self.items[i]
+                return
+            i += 1
+
+    def clash(self, start, end, today, exclude=None):
+        """Rental id of the first booking overlapping [start, end], or None."""
+        for rid, s in self.open_ended.items():
+            if rid != exclude and s <= end:
+                return rid
+        for rid, (s, e) in self.ongoing.items():
+            if rid != exclude and s <= end and e < today:
+                return rid                  # overdue: held until it comes back
+        i = bisect.bisect_right(self.starts, end) - 1
+        floor = start - self.longest
+        while i >= 0:
+            s, e, rid = self.items[i]
+            if s < floor:
+                break                       # nothing this early can reach the range
+            if e >= start and rid != exclude:
+                return rid
+            i -= 1
+        return None
+
+class BookingSet:
+    """A throwaway set of open bookings to test new ones against, in memory.
+
+    Same rules as AvailabilityIndex.clash(); used to check a batch of new
+    bookings against the database and against each other (bulk import).
+    Rental ids are only returned from clash(), so any label works.
+    """
+    def __init__(self, today=None):
+        self.today = _as_date(today) or date.today()
+        self._vehicles = {}
+
+    def add(self, rental_id, vehicle_id, start, expected, status):
+        start = _as_date(start)
+        self._vehicles.setdefault(vehicle_id, _VehicleIntervals()).add(start, _as_date(expected), rental_id, status == 'ongoing')
+
+    def clash(self, vehicle_id, start, expected=None):
+        """Id of a booking overlapping [start, expected] for the vehicle, or None."""
+        iv = self._vehicles.get(vehicle_id)
+        if iv is None:
+            return None
+        start = _as_date(start)
+        return iv.clash(start, _as_date(expected) or start, self.today)
+
+class AvailabilityIndex:
+    """Interval index over open bookings, kept current from change_log."""
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._vehicles = None       # vehicle_id -> _VehicleIntervals (every vehicle has an entry)
+        self._rentals = {}          # rental_id -> (vehicle_id, start)
+        self._cursor = None         # change_log cursor (db.read_changes) applied up to
+
+    # ----- loading -----
+    def build(self):
+        cursor = change_log_cursor()
+        vehicle_ids = [r['id'] for r in db_query("SELECT id FROM vehicles")]
+        rows = db_query(_OPEN_RENTALS_SQL)
+        with self._lock:
+            self._vehicles = {vid: _VehicleIntervals() for vid in vehicle_ids}
+            self._rentals = {}
+            for r in rows:
+                self._add(r)
+            self._cursor = cursor
+
+    def _add(self, r):
+        start = _as_date(r['start_date'])
+        vid = r['vehicle_id']
+        self._vehicles.setdefault(vid, _VehicleIntervals()).add(start, _as_date(r['expected_return_date']), r['id'],
+                                                                r['status'] == 'ongoing')
+        self._rentals[r['id']] = (vid, start)
+
+    def _drop(self, rental_id):
+        entry = self._rentals.pop(rental_id, None)
+        if entry and entry[0] in self._vehicles:
+            self._vehicles[entry[0]].remove(rental_id, entry[1])
+
+    def sync(self):
+        """Apply rentals/vehicles changes logged since the last build or sync."""
+        if self._vehicles is None:
+            return self.build()
+        changes = read_changes(self._cursor, AVAILABILITY_REPLAY_LIMIT, tables=('rentals', 'vehicles'))
+        if changes is None:
+            return self.build()     # entries we never saw were pruned, or too far behind
+        log, cursor = changes
+        if not log:
+            with self._lock:
+                self._cursor = cursor
+            return
+        rental_ids = sorted({int(e['row_id']) for e in log if e['table_name'] == 'rentals'})
+        vehicle_events = [(int(e['row_id']), e['op']) for e in log if e['table_name'] == 'vehicles']
+        rows = []
+        if rental_ids:
+            rows = db_query(_OPEN_RENTALS_SQL + f" AND id IN ({','.join(['%s'] * len(rental_ids))})", rental_ids)
+        with self._lock:
+            for vid, op in vehicle_events:
+                if op == 'D':
+                    # ON DELETE CASCADE removed its rentals without logging them
+                    for rid in [rid for rid, (v, _) in self._rentals.items() if v == vid]:
+                        self._rentals.pop(rid)
+                    self._vehicles.pop(vid, None)
+                else:
+                    self._vehicles.setdefault(vid, _VehicleIntervals())
+            for rid in rental_ids:
+                self._drop(rid)     # re-added below if still open; gone or returned otherwise
+            for r in rows:
+                if r['vehicle_id'] in self._vehicles:
+                    self._add(r)
+            self._cursor = cursor
+
+    # ----- queries -----
+    def _range(self, start, end):
+        start = _as_date(start)
+        end = _as_date(end) or start
+        if end < start:
+            raise ValueError("Range end is before its start.")
+        return start, end
+
+    def clash(self, vehicle_id, start, end=None, exclude=None, sync=True):
+        """Id of a booking that overlaps [start, end] for the vehicle, or None when it is free."""
+        if sync:
+            self.sync()
+        start, end = self._range(start, end)
+        with self._lock:
+            iv = self._vehicles.get(int(vehicle_id))
+            return iv.clash(start, end, date.today(), exclude) if iv else None
+
+    def is_free(self, vehicle_id, start, end=None, exclude=None):
+        return self.clash(vehicle_id, start, end, exclude) is None
+
+    def free_vehicles(self, start, end=None):
+        """Sorted ids of vehicles with no booking overlapping [start, end] (inclusive dates)."""
+        self.sync()
+        start, end = self._range(start, end)
+        today = date.today()
+        with self._lock:
+            return sorted(vid for vid, iv in self._vehicles.items() if iv.clash(start, end, today) is None)
+
+    def stats(self):
+        with self._lock:
+            return {'vehicles': len(self._vehicles or {}), 'bookings': len(self._rentals),
+                    'cursor': self._cursor[0] if self._cursor else None}
+
+availability = AvailabilityIndex()
@@ -0,0 +1,72 @@
+# benchmarks/bench_indexes.py
+"""Query-plan and latency check for the hot-query indexes (migration 002).
+
+Each hot query is run twice against the configured database: once normally
+and once with its index hidden via IGNORE INDEX, so the before/after effect
+is visible without dropping anything. Prints EXPLAIN access type, rows
+examined and median latency per variant as JSON.
+
+    python benchmarks/bench_indexes.py [--repeat 50]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db import get_pool  # noqa: E402
+
+# (label, table, index, query with {hint} placeholder after the table name, params)
+HOT_QUERIES = [
+    ("overdue rentals", "rentals", "idx_rentals_status_expected",
+     "SELECT id FROM rentals {hint} WHERE status=%s AND expected_return_date < CURDATE()", ("ongoing",)),
+    ("open rentals for vehicle", "rentals", "idx_rentals_vehicle_status",
+     "SELECT id FROM rentals {hint} WHERE vehicle_id=%s AND status=%s", (1, "ongoing")),
+    ("rentals started in range", "rentals", "idx_rentals_start_date",
+     "SELECT id FROM rentals {hint} WHERE start_date BETWEEN %s AND %s", ("2025-01-01", "2025-01-31")),
+    ("available vehicles", "vehicles", "idx_vehicles_status",
+     "SELECT id FROM vehicles {hint} WHERE status=%s", ("available",)),
+    ("vehicle by reg_no", "vehicles", "uq_vehicles_reg_no",
+     "SELECT id FROM vehicles {hint} WHERE reg_no=%s", ("RJ14AB1234",)),
+    ("customer by phone", "customers", "idx_customers_phone",
+     "SELECT id FROM customers {hint} WHERE phone=%s", ("9876543210",)),
+]
+
+def _explain(cur, sql, params):
+    cur.execute("EXPLAIN " + sql, params)
+    cols = [d[0] for d in cur.description]
+    row = dict(zip(cols, cur.fetchall()[0]))
+    return {'type': row.get('type'), 'key': row.get('key'), 'rows': row.get('rows')}
+
+def _time(cur, sql, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(samples), 3)
+
+def run(repeat):
+    results = []
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        for label, table, index, template, params in HOT_QUERIES:
+            entry = {'query': label, 'index': index}
+            for variant, hint in (("without_index", f"IGNORE INDEX ({index})"), ("with_index", "")):
+                sql = template.format(hint=hint)
+                try:
+                    entry[variant] = dict(_explain(cur, sql, params), median_ms=_time(cur, sql, params, repeat))
+                except Exception as e:
+                    entry[variant] = {'error': str(e)}   # e.g. migration 002 not applied yet
+            results.append(entry)
+        cur.close()
+    return results
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+    print(json.dumps(run(args.repeat), indent=2, default=str))
@@ -0,0 +1,89 @@
+# benchmarks/bench_startup.py
+"""Startup-time benchmark: cold start to a usable login form, login to first rows, and re-login.
+
+Each run starts a fresh interpreter (so imports are really cold) that
+times, from process launch:
+
+    import_ms        app_ctk_login imported
+    login_ms         login form painted
+    app_ms           main window painted after login
+    first_rows_ms    first Vehicles page of rows shown
+    relogin_ms       logout -> re-login form -> main window painted again
+
+Prints the median of ``--runs`` runs as JSON and exits non-zero when cold
+start (login_ms) or re-login exceeds its budget. Needs a display (use
+xvfb-run on a server) and the configured, migrated database.
+
+    python benchmarks/bench_startup.py [--runs 5] [--budget-login-ms 1500] [--budget-relogin-ms 300]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_ROWS_TIMEOUT = 30     # seconds
+
+def _child(launched):
+    def ms():
+        return round((time.time() - launched) * 1000, 1)
+    sys.path.insert(0, ROOT)
+    import app_ctk_login as ui
+    out = {'import_ms': ms()}
+
+    login = ui.LoginWindow()
+    login.update()
+    out['login_ms'] = ms()
+    login.logged_in = True
+    login._exit()
+
+    app = ui.App()
+    app.update()
+    out['app_ms'] = ms()
+    deadline = time.monotonic() + FIRST_ROWS_TIMEOUT
+    while time.monotonic() < deadline:
+        app.update()
+        if "vehicles" in app.frames and app.pager_vehicles.pages and app.pager_vehicles.pages[0]:
+            break
+        time.sleep(0.005)
+    out['first_rows_ms'] = ms()
+
+    t0 = time.perf_counter()
+    app.withdraw()
+    relogin = ui.ReloginWindow(app)
+    relogin.update()
+    relogin.destroy()
+    app.resume()
+    app.update()
+    out['relogin_ms'] = round((time.perf_counter() - t0) * 1000, 1)
+    app.destroy()
+    print(json.dumps(out))
+
+def run(runs):
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", repr(time.time())],
+                              capture_output=True, text=True, cwd=ROOT)
+        if proc.returncode:
+            sys.exit(proc.stderr.strip() or f"child exited with {proc.returncode}")
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {k: statistics.median(s[k] for s in samples) for k in samples[0]}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget-login-ms", type=float, default=1500, help="cold start to painted login form")
+    ap.add_argument("--budget-relogin-ms", type=float, default=300, help="logout to main window shown again")
+    ap.add_argument("--child", type=float, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child is not None:
+        _child(args.child)
+        sys.exit(0)
+    report = run(args.runs)
+    report['over_budget'] = [k for k, budget in (('login_ms', args.budget_login_ms), ('relogin_ms', args.budget_relogin_ms))
+                             if report[k] > budget]
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report['over_budget'] else 0)
@@ -0,0 +1,368 @@
+# benchmarks/bench_suite.py
+"""Reproducible benchmark suite for the app's query, pricing, booking and render paths.
+
+Step 1 builds a throwaway database from db_init.sql and fills it with a
+synthetic fleet (seeded, so every run generates the same data):
+
+    python benchmarks/bench_suite.py generate --scale small
+
+Step 2 times the app's hot paths headlessly against it and prints
+p50/p95/p99 latency and rows/sec per scenario as JSON:
+
+    python benchmarks/bench_suite.py run --out results.json [--compare baseline.json]
+
+With --compare, scenarios whose p95 grew by more than --tolerance are
+listed under "regressions" and the exit status is 1. The suite targets
+MySQL: the app's SQL (DATEDIFF, FOR UPDATE, FULLTEXT) has no SQLite
+equivalent worth benchmarking.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import mysql.connector  # noqa: E402
+
+import billing  # noqa: E402
+import db  # noqa: E402
+import repository  # noqa: E402
+from availability import availability  # noqa: E402
+from dashboard import dashboard_snapshot  # noqa: E402
+from repository import (RENTALS_GRID_SQL, customer_filter, customers, quote_amount, rental_filter,  # noqa: E402
+                        rentals, vehicle_cache, vehicle_filter, vehicles)
+
+BENCH_DATABASE = "rental_bench"
+
+# vehicles, customers, rentals
+SCALES = {
+    'tiny': (100, 1_000, 10_000),
+    'small': (1_000, 20_000, 200_000),
+    'medium': (5_000, 200_000, 2_000_000),
+    'large': (10_000, 1_000_000, 10_000_000),
+}
+
+GEN_CHUNK_ROWS = 10_000
+MAKES = {
+    'Toyota': ["Innova", "Corolla", "Fortuner", "Etios"],
+    'Hyundai': ["Creta", "i20", "Verna", "Venue"],
+    'Maruti': ["Swift", "Baleno", "Dzire", "Ertiga"],
+    'Mahindra': ["XUV700", "Scorpio", "Thar", "Bolero"],
+    'Honda': ["City", "Amaze", "Jazz", "WR-V"],
+}
+FIRST = ["Rahul", "Priya", "Amit", "Sneha", "Vikram", "Anjali", "Rohan", "Kavya", "Arjun", "Neha"]
+LAST = ["Sharma", "Kapoor", "Verma", "Gupta", "Singh", "Iyer", "Reddy", "Nair", "Mehta", "Joshi"]
+
+#############################################
+#           DATA GENERATION
+#############################################
+def create_schema(database):
+    """Run db_init.sql against ``database`` instead of ``rental`` (drops it first)."""
+    with open(os.path.join(ROOT, "db_init.sql"), encoding="utf-8") as f:
+        sql = re.sub(r"^(DROP DATABASE IF EXISTS|CREATE DATABASE|USE)\s+rental;", rf"\1 {database};", f.read(), flags=re.M)
+    cfg = {k: v for k, v in db.DB.items() if k != "database"}
+    conn = mysql.connector.connect(**cfg)
+    cur = conn.cursor()
+    for stmt in db._split_sql(sql):
+        cur.execute(stmt)
+    conn.commit()
+    cur.close(); conn.close()
+
+def _chunks(rows, size=GEN_CHUNK_ROWS):
+    batch = []
+    for r in rows:
+        batch.append(r)
+        if len(batch) >= size:
+            yield batch; batch = []
+    if batch:
+        yield batch
+
+def _vehicle_rows(rng, n):
+    makes = list(MAKES)
+    for i in range(n):
+        make = rng.choice(makes)
+        yield (f"BN{i:07d}", make, rng.choice(MAKES[make]), rng.randint(2012, 2025),
+               rng.choice([800, 900, 1200, 1500, 2000, 2500, 3500]), "available")
+
+def _customer_rows(rng, n):
+    for i in range(n):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        yield (f"{first} {last}", f"9{rng.randint(0, 999_999_999):09d}", f"{first.lower()}.{last.lower()}{i}@example.com")
+
+def _rental_rows(rng, n, n_vehicles, n_customers, ongoing):
+    # history runs back ~5 years; the newest rentals are the still-ongoing ones, one per vehicle
+    today = date.today()
+    for i in range(n):
+        if i >= n - ongoing:
+            vid = n - i                                  # distinct vehicles 1..ongoing
+            start = today - timedelta(days=rng.randint(0, 6))
+            expected = start + timedelta(days=rng.randint(1, 14))
+            yield (vid, rng.randint(1, n_customers), start, expected, None, "ongoing", None)
+            continue
+        start = today - timedelta(days=int(1825 * (n - i) / n) + rng.randint(0, 3))
+        expected = start + timedelta(days=rng.randint(0, 10))
+        actual = expected + timedelta(days=rng.choice([0, 0, 0, 1, 2]))
+        amount = None if rng.random() < 0.3 else rng.choice([800, 900, 1200, 1500]) * ((expected - start).days + 1)
+        yield (rng.randint(1, n_vehicles), rng.randint(1, n_customers), start, expected, actual, "returned", amount)
+
+def generate(scale, seed, database, log=print):
+    n_vehicles, n_customers, n_rentals = SCALES[scale]
+    rng = random.Random(seed)
+    create_schema(database)
+    db.DB['database'] = database
+    db.apply_migrations(log=lambda msg: None)     # schema newer than db_init.sql (summaries, archive)
+    ongoing = min(n_vehicles // 4, n_rentals)
+    t0 = time.perf_counter()
+    for repo, rows, total in ((vehicles, _vehicle_rows(rng, n_vehicles), n_vehicles),
+                              (customers, _customer_rows(rng, n_customers), n_customers),
+                              (rentals, _rental_rows(rng, n_rentals, n_vehicles, n_customers, ongoing), n_rentals)):
+        done = 0
+        for batch in _chunks(rows):
+            with db.transaction() as cur:
+                done += repo.insert_many(batch, cur)
+            log(f"\r{repo.table}: {done}/{total}", end="", flush=True)
+        log()
+    with db.transaction() as cur:
+        cur.execute("UPDATE vehicles SET status='rented' WHERE id <= %s", (ongoing,))
+        cur.execute("TRUNCATE TABLE change_log")      # generation noise, not app activity
+        cur.execute("ANALYZE TABLE vehicles, customers, rentals")
+        cur.fetchall()
+    return {'scale': scale, 'seed': seed, 'vehicles': n_vehicles, 'customers': n_customers,
+            'rentals': n_rentals, 'seconds': round(time.perf_counter() - t0, 1)}
+
+#############################################
+#           SCENARIOS
+#############################################
+def _percentile(samples, p):
+    s = sorted(samples)
+    k = (len(s) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+def _measure(fn, iterations, warmup=3):
+    """Call fn() (returns rows handled) repeatedly; latency percentiles in ms plus throughput."""
+    for _ in range(warmup):
+        fn()
+    samples, rows = [], 0
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        rows += fn() or 0
+        samples.append((time.perf_counter() - t0) * 1000)
+    total_s = sum(samples) / 1000
+    return {'n': iterations, 'p50_ms': round(_percentile(samples, 50), 3), 'p95_ms': round(_percentile(samples, 95), 3),
+            'p99_ms': round(_percentile(samples, 99), 3), 'mean_ms': round(statistics.mean(samples), 3),
+            'rows_per_sec': round(rows / total_s, 1) if total_s and rows else None}
+
+def scenarios(rng, page_size):
+    max_vehicle = vehicles.list(limit=1)[0].id
+    max_customer = customers.list(limit=1)[0].id
+    max_rental = int(db.db_query("SELECT MAX(id) AS m FROM rentals")[0]['m'])
+    grid_page = RENTALS_GRID_SQL + " WHERE r.id < %s ORDER BY r.id DESC LIMIT %s"
+
+    def rentals_first_page():
+        return len(db.db_query(RENTALS_GRID_SQL + " ORDER BY r.id DESC LIMIT %s", (page_size + 1,)))
+
+    def rentals_deep_page():
+        return len(db.db_query(grid_page, (rng.randint(1, max_rental), page_size + 1)))
+
+    def rentals_count():
+        db.db_query("SELECT COUNT(*) AS n FROM rentals r"); return 1
+
+    def vehicles_first_page():
+        return len(vehicles.list(limit=page_size + 1))
+
+    def customers_deep_page():
+        return len(customers.list(before_id=rng.randint(1, max_customer), limit=page_size + 1))
+
+    def search_vehicle_text():
+        where, params = vehicle_filter(rng.choice(list(MAKES)), "available")
+        return len(vehicles.list(where, params, limit=page_size + 1))
+
+    def search_customer_phone():
+        where, params = customer_filter(f"9{rng.randint(10, 99)}")
+        return len(customers.list(where, params, limit=page_size + 1))
+
+    def _some_customer():
+        c = customers.get(rng.randint(1, max_customer))
+        return c or customers.list(limit=1)[0]
+
+    def search_customer_selective():
+        # one customer's full phone: the page and count the grid run for it
+        where, params = customer_filter(_some_customer().phone)
+        customers.count(where, params)
+        return len(customers.list(where, params, limit=page_size + 1))
+
+    def filter_rentals_by_customer():
+        where, params = rental_filter(_some_customer().name)
+        db.db_query("SELECT COUNT(*) AS n FROM rentals r" + repository.Repository._where(where), params)
+        return len(db.db_query(RENTALS_GRID_SQL + repository.Repository._where(where) + " ORDER BY r.id DESC LIMIT %s",
+                               params + [page_size + 1]))
+
+    def filter_rentals_ongoing():
+        where, params = rental_filter("", "ongoing", None, date.today().isoformat())
+        return len(db.db_query(RENTALS_GRID_SQL + repository.Repository._where(where) + " ORDER BY r.id DESC LIMIT %s",
+                               params + [page_size + 1]))
+
+    def get_vehicle_prepared():
+        vehicles.get(rng.randint(1, max_vehicle)); return 1
+
+    def quote_cold():
+        vehicle_cache.invalidate()
+        return 1 if quote_amount(rng.randint(1, max_vehicle), "2025-01-01", "2025-01-05") else 0
+
+    def quote_warm():
+        return 1 if quote_amount(rng.randint(1, min(max_vehicle, 50)), "2025-01-01", "2025-01-05") else 0
+
+    def billing_batch():
+        rows = billing._read_batch(rng.randint(0, max_rental), 5000)
+        if rows:
+            _, rates, sd, ed, ad, st = zip(*rows)
+            billing.bill_columns(rates, sd, ed, ad, st)
+        return len(rows)
+
+    def free_vehicles_index():
+        start = date.today() + timedelta(days=rng.randint(0, 30))
+        return len(availability.free_vehicles(start, start + timedelta(days=5)))
+
+    def free_vehicles_sql():
+        start = date.today() + timedelta(days=rng.randint(0, 30))
+        where, params = vehicle_filter(free_from=start.isoformat(), free_to=(start + timedelta(days=5)).isoformat())
+        return len(vehicles.list(where, params, limit=page_size + 1))
+
+    def dashboard():
+        dashboard_snapshot(); return 1
+
+    def book_and_cancel():
+        # book a free vehicle, then delete the rental so the fleet state is unchanged
+        free = vehicles.list(["status='available'"], limit=1)
+        if not free:
+            return 0
+        rid = rentals.book(free[0].id, rng.randint(1, max_customer), date.today().isoformat(), date.today().isoformat())
+        rentals.delete(rid)
+        return 1
+
+    return {
+        'rentals_first_page': rentals_first_page,
+        'rentals_deep_page': rentals_deep_page,
+        'rentals_count': rentals_count,
+        'vehicles_first_page': vehicles_first_page,
+        'customers_deep_page': customers_deep_page,
+        'search_vehicle_text': search_vehicle_text,
+        'search_customer_phone': search_customer_phone,
+        'search_customer_selective': search_customer_selective,
+        'filter_rentals_by_customer': filter_rentals_by_customer,
+        'filter_rentals_ongoing': filter_rentals_ongoing,
+        'get_vehicle_prepared': get_vehicle_prepared,
+        'quote_amount_cold': quote_cold,
+        'quote_amount_warm': quote_warm,
+        'billing_batch_5k': billing_batch,
+        'free_vehicles_index': free_vehicles_index,
+        'free_vehicles_sql_page': free_vehicles_sql,
+        'dashboard_snapshot': dashboard,
+        'book_and_cancel': book_and_cancel,
+    }
+
+def render_scenarios(page_size):
+    """Grid render path: row formatting always, Treeview inserts when a display is available."""
+    try:
+        import app_ctk_login as app
+    except Exception as e:
+        return {}, f"app import failed: {e}"
+    rows = db.db_query(RENTALS_GRID_SQL + " ORDER BY r.id DESC LIMIT %s", (page_size,))
+
+    def format_page():
+        for r in rows:
+            app.rental_grid_values(r)
+        return len(rows)
+
+    out, note = {'render_format_page': format_page}, None
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk(); root.withdraw()
+        tree = ttk.Treeview(root, columns=[str(i) for i in range(10)], show="headings")
+        values = [(str(r['id']), app.rental_grid_values(r)) for r in rows]
+
+        def insert_page():
+            for iid, v in values:
+                tree.insert("", "end", iid=iid, values=v)
+            tree.delete(*tree.get_children())
+            return len(values)
+
+        out['render_treeview_page'] = insert_page
+    except Exception as e:
+        note = f"Treeview render skipped: {e}"
+    return out, note
+
+def run(database, iterations, page_size, seed, only=None):
+    db.DB['database'] = database
+    rng = random.Random(seed)
+    cases = scenarios(rng, page_size)
+    render, note = render_scenarios(page_size)
+    cases.update(render)
+    results = {}
+    for name, fn in cases.items():
+        if only and not any(o in name for o in only):
+            continue
+        results[name] = _measure(fn, iterations)
+    sizes = {t: int(db.db_query(f"SELECT COUNT(*) AS n FROM {t}")[0]['n']) for t in ("vehicles", "customers", "rentals")}
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    meta = {'database': database, 'rows': sizes, 'iterations': iterations, 'page_size': page_size, 'seed': seed,
+            'commit': commit, 'python': platform.python_version(), 'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'vehicle_cache': vehicle_cache.stats(), 'pool': dict(db.get_pool().stats)}
+    if note:
+        meta['note'] = note
+    return {'meta': meta, 'results': results}
+
+def compare(report, baseline, tolerance):
+    regressions = {}
+    for name, cur in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base and base.get('p95_ms') and cur['p95_ms'] > base['p95_ms'] * tolerance:
+            regressions[name] = {'baseline_p95_ms': base['p95_ms'], 'p95_ms': cur['p95_ms'],
+                                 'ratio': round(cur['p95_ms'] / base['p95_ms'], 2)}
+    return regressions
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--database", default=BENCH_DATABASE)
+    ap.add_argument("--seed", type=int, default=42)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    g = sub.add_parser("generate", help="(re)create the bench database with synthetic data")
+    g.add_argument("--scale", choices=SCALES, default="small")
+    r = sub.add_parser("run", help="time the scenarios and print JSON")
+    r.add_argument("--iterations", type=int, default=200)
+    r.add_argument("--page-size", type=int, default=200)
+    r.add_argument("--only", nargs="*", help="run scenarios whose name contains any of these")
+    r.add_argument("--out", help="also write the JSON report here")
+    r.add_argument("--compare", help="baseline report to check p95 regressions against")
+    r.add_argument("--tolerance", type=float, default=1.25, help="allowed p95 ratio vs baseline")
+    args = ap.parse_args()
+
+    if args.cmd == "generate":
+        print(json.dumps(generate(args.scale, args.seed, args.database)))
+        sys.exit(0)
+    report = run(args.database, args.iterations, args.page_size, args.seed, args.only)
+    status = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report['regressions'] = compare(report, json.load(f), args.tolerance)
+        status = 1 if report['regressions'] else 0
+    text = json.dumps(report, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    sys.exit(status)
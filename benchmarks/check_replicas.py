@@ -0,0 +1,79 @@
+# benchmarks/check_replicas.py
+"""Check read/write splitting: reads on replicas, read-your-writes, failover.
+
+Points db.DB_REPLICAS at the given replicas (by default the primary itself
+stands in as a replica, which is enough to check the routing) and verifies:
+
+    1. reads go to a replica once the sticky window has passed
+    2. right after a write, reads go to the primary and see the new row
+    3. an unreachable replica is skipped and reads fall back to the primary
+
+Which server answered is read from each pool's query counter.
+
+    python benchmarks/check_replicas.py [--replica 127.0.0.1:3307 ...] [--sticky 0.5]
+
+Exits non-zero if any check fails.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db  # noqa: E402
+
+def _replica(spec):
+    host, _, port = spec.partition(":")
+    return dict(host=host, port=int(port)) if port else dict(host=host)
+
+def _served_by(fn):
+    """Run fn; return (result, 'primary' | replica name | None)."""
+    before = {'primary': db.get_pool().stats['queries'], **{r['replica']: r['queries'] for r in db.replication_status()}}
+    result = fn()
+    after = {'primary': db.get_pool().stats['queries'], **{r['replica']: r['queries'] for r in db.replication_status()}}
+    return result, next((k for k in after if after[k] > before.get(k, 0)), None)
+
+def run(replicas, sticky):
+    db.DB_REPLICAS[:] = replicas
+    db.REPLICATION['sticky_seconds'] = sticky
+    db._replicas = None
+    checks = {}
+    time.sleep(sticky)
+    _, where = _served_by(lambda: db.db_query("SELECT 1 AS ok"))
+    checks['read_on_replica'] = {'served_by': where, 'ok': where not in (None, 'primary')}
+
+    tag = uuid.uuid4().hex[:8]
+    _, new_id = db.db_execute("INSERT INTO customers (name, phone, email) VALUES (%s,%s,%s)",
+                              (f"replica check {tag}", "0000000000", f"replica-{tag}@example.com"))
+    try:
+        rows, where = _served_by(lambda: db.db_query("SELECT id FROM customers WHERE id=%s", (new_id,)))
+        checks['read_your_writes'] = {'served_by': where, 'row_visible': bool(rows),
+                                      'ok': where == 'primary' and bool(rows)}
+        time.sleep(sticky)
+        _, where = _served_by(lambda: db.db_query("SELECT 1 AS ok"))
+        checks['back_on_replica'] = {'served_by': where, 'ok': where not in (None, 'primary')}
+    finally:
+        db.db_execute("DELETE FROM customers WHERE id=%s", (new_id,))
+
+    time.sleep(sticky)
+    db.DB_REPLICAS[:] = [dict(host="127.0.0.1", port=1)]     # nothing listens here
+    db._replicas = None
+    rows, where = _served_by(lambda: db.db_query("SELECT 1 AS ok"))
+    status = db.replication_status()
+    checks['failover'] = {'served_by': where, 'replica_up': status[0]['up'] if status else None,
+                          'ok': where == 'primary' and bool(rows) and bool(status) and not status[0]['up']}
+    db.close_pools()
+    return checks
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--replica", action="append", default=[], metavar="HOST[:PORT]",
+                    help="replica to route reads to (repeatable; default: the primary as a stand-in)")
+    ap.add_argument("--sticky", type=float, default=0.5, help="read-your-writes window for the test, seconds")
+    args = ap.parse_args()
+    replicas = [_replica(r) for r in args.replica] or [dict(host=db.DB['host'])]
+    checks = run(replicas, args.sticky)
+    print(json.dumps(checks, indent=2))
+    sys.exit(0 if all(c['ok'] for c in checks.values()) else 1)
@@ -0,0 +1,116 @@
+# benchmarks/load_async.py
+"""Asyncio load test for async_service.RentalService.
+
+Creates throwaway vehicles and a customer, then runs ``--tasks`` concurrent
+clients on one event loop, each issuing ``--requests`` calls drawn from a
+mix of vehicle lookups, quotes, free-vehicle searches and bookings (every
+client tries to book the same few vehicles for the same day, so most
+bookings must be refused). Reports requests/s and per-operation latency
+percentiles, and checks that no vehicle ended up with two overlapping
+bookings. Test rows are removed afterwards.
+
+    python benchmarks/load_async.py [--tasks 500] [--requests 20] [--vehicles 20] [--pool 20]
+
+Exits non-zero if anything was double-booked.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from async_service import RentalService  # noqa: E402
+from repository import BookingError  # noqa: E402
+
+MIX = (("get_vehicle", 50), ("quote", 30), ("free_vehicles", 5), ("book", 15))
+
+def _pct(samples, p):
+    s = sorted(samples)
+    return round(s[min(len(s) - 1, int(len(s) * p / 100))] * 1000, 2) if s else None
+
+async def _exec(svc, sql, params=()):
+    async with svc.pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(sql, params)
+            await conn.commit()
+            return cur.lastrowid
+
+async def client(svc, rng, vehicle_ids, customer_id, day, n, stats):
+    ops, weights = zip(*MIX)
+    for _ in range(n):
+        op = rng.choices(ops, weights)[0]
+        vid = rng.choice(vehicle_ids)
+        t0 = time.perf_counter()
+        outcome = 'ok'
+        try:
+            if op == "get_vehicle":
+                await svc.get_vehicle(vid)
+            elif op == "quote":
+                await svc.quote(vid, day, day)
+            elif op == "free_vehicles":
+                await svc.free_vehicles(day, day, limit=50)
+            else:
+                await svc.book({'vehicle_id': vid, 'customer_id': customer_id, 'start_date': day,
+                                'expected_return_date': day, 'status': 'reserved'})
+        except BookingError:
+            outcome = 'rejected'
+        except Exception:
+            outcome = 'errors'
+        s = stats.setdefault(op, {'ok': 0, 'rejected': 0, 'errors': 0, 'latency': []})
+        s[outcome] += 1
+        s['latency'].append(time.perf_counter() - t0)
+
+async def run(tasks, requests, vehicles, pool, seed):
+    svc = await RentalService.create(maxsize=pool)
+    tag = uuid.uuid4().hex[:8].upper()
+    day = time.strftime("%Y-%m-%d")
+    customer_id = await _exec(svc, "INSERT INTO customers (name, phone, email) VALUES (%s,%s,%s)",
+                              (f"load {tag}", "0000000000", f"load-{tag}@example.com"))
+    ids = []
+    try:
+        for i in range(vehicles):
+            ids.append(await _exec(svc, "INSERT INTO vehicles (reg_no, make, model, year, rate_per_day, status)"
+                                        " VALUES (%s,'Load','Test',2024,1000,'available')", (f"LD{tag}{i:04d}",)))
+        stats = {}
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client(svc, random.Random(seed + n), ids, customer_id, day, requests, stats)
+                               for n in range(tasks)))
+        elapsed = time.perf_counter() - t0
+        marks = ",".join(["%s"] * len(ids))
+        async with svc.pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(f"SELECT vehicle_id, COUNT(*) AS n FROM rentals WHERE vehicle_id IN ({marks})"
+                                  " AND status IN ('ongoing','reserved') GROUP BY vehicle_id", tuple(ids))
+                per_vehicle = await cur.fetchall()
+        total = sum(s['ok'] + s['rejected'] + s['errors'] for s in stats.values())
+        return {
+            'tasks': tasks, 'requests': total, 'pool': pool, 'seconds': round(elapsed, 3),
+            'requests_per_sec': round(total / elapsed, 1) if elapsed else None,
+            'ops': {op: {'ok': s['ok'], 'rejected': s['rejected'], 'errors': s['errors'],
+                         'p50_ms': _pct(s['latency'], 50), 'p95_ms': _pct(s['latency'], 95),
+                         'p99_ms': _pct(s['latency'], 99)} for op, s in sorted(stats.items())},
+            'double_booked_vehicles': sum(1 for r in per_vehicle if r['n'] > 1),
+        }
+    finally:
+        if ids:
+            marks = ",".join(["%s"] * len(ids))
+            await _exec(svc, f"DELETE FROM rentals WHERE vehicle_id IN ({marks})", tuple(ids))
+            await _exec(svc, f"DELETE FROM vehicles WHERE id IN ({marks})", tuple(ids))
+        await _exec(svc, "DELETE FROM customers WHERE id=%s", (customer_id,))
+        await svc.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--tasks", type=int, default=500, help="concurrent clients")
+    ap.add_argument("--requests", type=int, default=20, help="requests per client")
+    ap.add_argument("--vehicles", type=int, default=20)
+    ap.add_argument("--pool", type=int, default=20, help="aiomysql pool maxsize")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    report = asyncio.run(run(args.tasks, args.requests, args.vehicles, args.pool, args.seed))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report['double_booked_vehicles'] else 0)
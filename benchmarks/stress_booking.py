@@ -0,0 +1,117 @@
+# benchmarks/stress_booking.py
+"""Concurrent booking stress test for book_rental().
+
+Creates a handful of throwaway vehicles, then lets many threads race to
+book them at once. Every vehicle must end up with exactly one ongoing
+rental; any more is a double booking. With --naive the old
+check-then-insert sequence (separate autocommitted statements) is raced
+as well, for comparison. Test rows are removed afterwards.
+
+    python benchmarks/stress_booking.py [--threads 32] [--vehicles 20] [--rounds 5]
+
+Exits non-zero if book_rental() double-booked anything.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db import DB_POOL, get_pool  # noqa: E402
+from repository import BookingError, book_rental  # noqa: E402
+
+def _exec(sql, params=()):
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        conn.commit()
+        last = cur.lastrowid
+        cur.close()
+    return last
+
+def _fetch(sql, params=()):
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        cur.close()
+    return rows
+
+def naive_book(vehicle_id, customer_id, day):
+    # the pre-transaction flow: read status, insert, flip status - each on its own autocommit
+    status = _fetch("SELECT status FROM vehicles WHERE id=%s", (vehicle_id,))
+    if not status or status[0][0] != 'available':
+        raise BookingError("Vehicle is not available.")
+    _exec("INSERT INTO rentals (vehicle_id,customer_id,start_date,expected_return_date,status) VALUES (%s,%s,%s,%s,'ongoing')",
+          (vehicle_id, customer_id, day, day))
+    _exec("UPDATE vehicles SET status='rented' WHERE id=%s", (vehicle_id,))
+
+def race(book, vehicle_ids, customer_id, threads, rounds):
+    day = time.strftime("%Y-%m-%d")
+    counts = {'booked': 0, 'rejected': 0, 'errors': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(n):
+        barrier.wait()
+        for r in range(rounds):
+            for vid in vehicle_ids:
+                try:
+                    book(vid, customer_id, day)
+                    key = 'booked'
+                except BookingError:
+                    key = 'rejected'
+                except Exception:
+                    key = 'errors'
+                with lock:
+                    counts[key] += 1
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool: t.start()
+    for t in pool: t.join()
+    elapsed = time.perf_counter() - t0
+    marks = ",".join(["%s"] * len(vehicle_ids))
+    per_vehicle = _fetch(f"SELECT vehicle_id, COUNT(*) FROM rentals WHERE status='ongoing' AND vehicle_id IN ({marks}) GROUP BY vehicle_id",
+                         tuple(vehicle_ids))
+    attempts = sum(counts.values())
+    return dict(counts, attempts=attempts, seconds=round(elapsed, 3),
+                attempts_per_sec=round(attempts / elapsed, 1) if elapsed else None,
+                double_booked_vehicles=sum(1 for _, n in per_vehicle if n > 1))
+
+def run(threads, vehicles, rounds, naive):
+    tag = uuid.uuid4().hex[:8].upper()
+    customer_id = _exec("INSERT INTO customers (name, phone, email) VALUES (%s,%s,%s)",
+                        (f"stress {tag}", "0000000000", f"stress-{tag}@example.com"))
+    report = {'threads': threads, 'vehicles': vehicles, 'rounds': rounds}
+    variants = [("book_rental", lambda v, c, d: book_rental(v, c, d, d))]
+    if naive:
+        variants.append(("naive", naive_book))
+    try:
+        for name, book in variants:
+            ids = [_exec("INSERT INTO vehicles (reg_no, make, model, year, rate_per_day, status) VALUES (%s,'Stress','Test',2024,1000,'available')",
+                         (f"ST{tag}{name[:2].upper()}{i:04d}",)) for i in range(vehicles)]
+            try:
+                report[name] = race(book, ids, customer_id, threads, rounds)
+            finally:
+                marks = ",".join(["%s"] * len(ids))
+                _exec(f"DELETE FROM rentals WHERE vehicle_id IN ({marks})", tuple(ids))
+                _exec(f"DELETE FROM vehicles WHERE id IN ({marks})", tuple(ids))
+    finally:
+        _exec("DELETE FROM customers WHERE id=%s", (customer_id,))
+    return report
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--threads", type=int, default=32)
+    ap.add_argument("--vehicles", type=int, default=20)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--naive", action="store_true", help="also race the old non-transactional flow")
+    args = ap.parse_args()
+    DB_POOL['size'] = max(DB_POOL['size'], args.threads)   # one connection per thread
+    report = run(args.threads, args.vehicles, args.rounds, args.naive)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report['book_rental']['double_booked_vehicles'] else 0)
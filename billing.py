@@ -0,0 +1,139 @@
+# billing.py
+"""Batch billing: days, base amount, overdue days and late fees for whole columns.
+
+The per-rental rules live in bill_rental(); bill_columns() applies the same
+rules to NumPy datetime64 arrays so month-end re-billing over millions of
+rentals is a handful of array operations per batch. Without NumPy installed
+bill_columns() falls back to calling bill_rental() per row.
+
+    python app_ctk_login.py --bill [--rebill-amounts]
+"""
+from datetime import date, datetime
+
+from db import get_pool, transaction
+from repository import rental_days
+
+# late returns: every day past expected_return_date (after the grace period)
+# is charged at rate_per_day * multiplier
+LATE_FEE = dict(
+    grace_days=0,
+    multiplier=1.5
+)
+
+BILLING_BATCH_ROWS = 50_000
+
+#############################################
+#           BILLING RULES
+#############################################
+def _as_date(value):
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return datetime.strptime(str(value), "%Y-%m-%d").date()
+
+def bill_rental(rate, start, expected=None, actual=None, status="ongoing", today=None):
+    """(days, base, overdue_days, late_fee) for one rental; dates may be ISO strings or dates.
+
+    days/base match the rental modal (quote_amount); a rental without a
+    start date bills the 1-day minimum. Overdue days run from
+    expected_return_date to the actual return, or to ``today`` while the
+    rental is ongoing; a reservation accrues nothing until it starts.
+    """
+    start, expected, actual = _as_date(start), _as_date(expected), _as_date(actual)
+    today = _as_date(today) or date.today()
+    rate = float(rate or 0)
+    days = rental_days(start.isoformat(), (expected or start).isoformat()) if start else 1
+    returned = actual or (today if status == "ongoing" else None)
+    overdue = 0
+    if expected is not None and returned is not None:
+        overdue = max(0, (returned - expected).days - LATE_FEE['grace_days'])
+    return days, round(rate * days, 2), overdue, round(rate * LATE_FEE['multiplier'] * overdue, 2)
+
+def overdue_days_sql(until):
+    """bill_rental()'s overdue days for rentals ``r`` as SQL, counted up to the SQL expression ``until``."""
+    return (f"IF(r.expected_return_date IS NULL, 0,"
+            f" GREATEST(0, DATEDIFF({until}, r.expected_return_date) - {int(LATE_FEE['grace_days'])}))")
+
+def late_fee_sql(until, rate="v.rate_per_day"):
+    """bill_rental()'s late fee as SQL; ``rate`` is the rate_per_day column in scope."""
+    return f"ROUND({rate} * {float(LATE_FEE['multiplier'])} * {overdue_days_sql(until)}, 2)"
+
+def bill_columns(rates, starts, expected, actual, statuses, today=None):
+    """bill_rental() over columns; returns (days, base, overdue_days, late_fee) arrays or lists."""
+    try:
+        import numpy as np
+    except ImportError:
+        out = [bill_rental(*row, today=today) for row in zip(rates, starts, expected, actual, statuses)]
+        return tuple(list(col) for col in zip(*out)) if out else ([], [], [], [])
+    today = np.datetime64(_as_date(today) or date.today(), "D")
+    rate = np.array([float(r or 0) for r in rates], dtype=np.float64)
+    sd = np.array(starts, dtype="datetime64[D]")                    # None -> NaT
+    ed = np.array(expected, dtype="datetime64[D]")
+    ad = np.array(actual, dtype="datetime64[D]")
+    out = np.array([s == "ongoing" for s in statuses], dtype=bool)
+
+    ed_or_sd = np.where(np.isnat(ed), sd, ed)
+    days = np.maximum(1, (ed_or_sd - sd).astype(np.int64) + 1)
+    returned = np.where(np.isnat(ad), np.where(out, today, np.datetime64("NaT")), ad)
+    known = ~np.isnat(ed) & ~np.isnat(returned)
+    late = np.where(known, (returned - np.where(known, ed, returned)).astype(np.int64), 0)
+    overdue = np.maximum(0, late - LATE_FEE['grace_days'])
+    base = np.round(rate * days, 2)
+    fee = np.round(rate * LATE_FEE['multiplier'] * overdue, 2)
+    return days, base, overdue, fee
+
+#############################################
+#           BULK RE-BILLING
+#############################################
+_BILLING_SELECT = """
+    SELECT r.id, v.rate_per_day, r.start_date, r.expected_return_date, r.actual_return_date, r.status
+    FROM rentals r JOIN vehicles v ON v.id = r.vehicle_id
+    WHERE r.id > %s ORDER BY r.id LIMIT %s
+"""
+
+def _read_batch(after_id, limit):
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute(_BILLING_SELECT, (after_id, limit))
+        rows = cur.fetchall()
+        cur.close()
+    return rows
+
+def _write_batch(ids, base, overdue, fee, rebill_amounts):
+    # stage the computed columns, then one joined UPDATE touching only rows that change
+    amount_sql = "b.amount" if rebill_amounts else "COALESCE(r.amount, b.amount)"
+    with transaction() as cur:
+        cur.execute("CREATE TEMPORARY TABLE IF NOT EXISTS billing_stage ("
+                    "id INT PRIMARY KEY, amount DECIMAL(12,2), overdue_days INT, late_fee DECIMAL(12,2)) ENGINE=MEMORY")
+        cur.execute("DELETE FROM billing_stage")
+        cur.executemany("INSERT INTO billing_stage (id, amount, overdue_days, late_fee) VALUES (%s,%s,%s,%s)",
+                        list(zip(ids, (float(b) for b in base), (int(o) for o in overdue), (float(f) for f in fee))))
+        cur.execute(f"UPDATE rentals r JOIN billing_stage b ON b.id = r.id "
+                    f"SET r.amount = {amount_sql}, r.overdue_days = b.overdue_days, r.late_fee = b.late_fee "
+                    f"WHERE NOT (r.amount <=> {amount_sql}) OR r.overdue_days <> b.overdue_days OR r.late_fee <> b.late_fee")
+        changed = cur.rowcount
+        cur.execute("DROP TEMPORARY TABLE billing_stage")
+    return changed
+
+def run_billing(today=None, rebill_amounts=False, batch_rows=BILLING_BATCH_ROWS, progress=None):
+    """Recompute overdue days and late fees for every rental, filling in missing amounts.
+
+    With ``rebill_amounts`` stored amounts are replaced by rate * days too.
+    Rentals are processed in id order, one transaction per batch. Returns
+    {'rows': scanned, 'updated': changed, 'late_fees': total late fees}.
+    """
+    after, scanned, updated, late_total = 0, 0, 0, 0.0
+    while True:
+        rows = _read_batch(after, batch_rows)
+        if not rows:
+            break
+        ids, rates, sd, ed, ad, st = (list(c) for c in zip(*rows))
+        _, base, overdue, fee = bill_columns(rates, sd, ed, ad, st, today)
+        updated += _write_batch(ids, base, overdue, fee, rebill_amounts)
+        scanned += len(rows)
+        late_total += float(sum(fee))
+        after = ids[-1]
+        if progress:
+            progress(scanned, updated)
+    return {'rows': scanned, 'updated': updated, 'late_fees': round(late_total, 2)}
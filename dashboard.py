@@ -0,0 +1,70 @@
+# dashboard.py
+"""Dashboard figures: fleet utilization, overdue rentals and revenue by day, make and vehicle.
+
+Revenue comes from the summary tables of migration 006, which triggers on
+rentals keep current, so a snapshot costs the same however much rental
+history there is: every query here is bounded by the fleet size, the
+number of open rentals or the requested day window.
+"""
+from datetime import date, timedelta
+
+from db import db_query, locked_tables, transaction
+from repository import RENTAL_DAYS_SQL, RENTALS_HISTORY_SOURCE
+
+DASHBOARD_DAYS = 30         # revenue-by-day window
+DASHBOARD_TOP_VEHICLES = 10
+
+# same pricing as the triggers: stored amount, else rate * inclusive days, plus late fee
+_REVENUE = ("COALESCE(r.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = r.vehicle_id)"
+            f" * {RENTAL_DAYS_SQL}, 0) + r.late_fee")
+_RENTED_DAYS = ("COALESCE(GREATEST(1, DATEDIFF(COALESCE(r.actual_return_date, r.expected_return_date, r.start_date),"
+                " r.start_date) + 1), 1)")
+# what a rebuild reads and writes, as the 006 backfill locks them: the history
+# source reads rentals and rentals_archive unaliased, the rate lookup vehicles as v
+_REBUILD_LOCKS = ("rentals READ, rentals_archive READ, vehicles AS v READ,"
+                  " summary_revenue_day WRITE, summary_revenue_vehicle WRITE")
+
+def dashboard_snapshot(days=DASHBOARD_DAYS, top=DASHBOARD_TOP_VEHICLES):
+    """All dashboard figures as one dict of plain values."""
+    fleet = {r['status']: int(r['n']) for r in db_query("SELECT status, COUNT(*) AS n FROM vehicles GROUP BY status")}
+    total = sum(fleet.values())
+    overdue = db_query("SELECT COUNT(*) AS n, MIN(expected_return_date) AS oldest FROM rentals"
+                       " WHERE status='ongoing' AND expected_return_date < CURDATE()")[0]
+    since = date.today() - timedelta(days=days - 1)
+    by_day = db_query("SELECT day, rentals, revenue FROM summary_revenue_day WHERE day >= %s ORDER BY day DESC", (since,))
+    by_make = db_query("SELECT v.make, COUNT(*) AS vehicles, SUM(s.rentals) AS rentals, SUM(s.revenue) AS revenue"
+                       " FROM summary_revenue_vehicle s JOIN vehicles v ON v.id = s.vehicle_id"
+                       " GROUP BY v.make ORDER BY revenue DESC")
+    top_vehicles = db_query("SELECT s.vehicle_id, v.reg_no, v.make, v.model, s.rentals, s.revenue, s.rented_days"
+                            " FROM summary_revenue_vehicle s JOIN vehicles v ON v.id = s.vehicle_id"
+                            " ORDER BY s.revenue DESC LIMIT %s", (int(top),))
+    totals = db_query("SELECT COALESCE(SUM(rentals), 0) AS rentals, COALESCE(SUM(revenue), 0) AS revenue"
+                      " FROM summary_revenue_vehicle")[0]
+    return {
+        'fleet': {'total': total, 'rented': fleet.get('rented', 0), 'available': fleet.get('available', 0),
+                  'utilization_pct': round(100.0 * fleet.get('rented', 0) / total, 1) if total else 0.0},
+        'overdue': {'count': int(overdue['n']), 'oldest_expected': overdue['oldest']},
+        'revenue': {'rentals': int(totals['rentals']), 'total': float(totals['revenue']),
+                    'last_days': float(sum(r['revenue'] for r in by_day))},
+        'by_day': by_day, 'by_make': by_make, 'top_vehicles': top_vehicles,
+    }
+
+def rebuild_summaries():
+    """Recompute both summary tables from hot and archived rentals (e.g. after vehicle rates changed).
+
+    The summary triggers stay live, so rental writes are held off by the same
+    table locks as the 006 backfill: a rental written between a DELETE and its
+    INSERT ... SELECT would otherwise be counted twice or not at all.
+    """
+    with transaction() as cur, locked_tables(cur, _REBUILD_LOCKS):
+        cur.execute("DELETE FROM summary_revenue_day")
+        cur.execute("INSERT INTO summary_revenue_day (day, rentals, revenue)"
+                    f" SELECT r.start_date, COUNT(*), SUM({_REVENUE}) FROM {RENTALS_HISTORY_SOURCE} r"
+                    " WHERE r.start_date IS NOT NULL GROUP BY r.start_date")
+        days = cur.rowcount
+        cur.execute("DELETE FROM summary_revenue_vehicle")
+        cur.execute("INSERT INTO summary_revenue_vehicle (vehicle_id, rentals, revenue, rented_days)"
+                    f" SELECT r.vehicle_id, COUNT(*), SUM({_REVENUE}), SUM({_RENTED_DAYS}) FROM {RENTALS_HISTORY_SOURCE} r"
+                    " WHERE r.vehicle_id IS NOT NULL GROUP BY r.vehicle_id")
+        vehicles = cur.rowcount
+    return {'days': days, 'vehicles': vehicles}
@@ -0,0 +1,647 @@
+# db.py
+"""MySQL access shared by the desktop app, CLI commands and benchmarks.
+
+Headless: nothing here imports Tk. Helpers raise on failure; the UI wraps
+them to show message boxes.
+"""
+import bisect
+import json
+import os
+import queue
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+
+#############################################
+#         DATABASE CONFIGURATION
+#############################################
+DB = dict(
+    host="127.0.0.1",
+    user="root",
+    password="",
+    database="rental"
+)
+
+# connection pool tuning (shared by every db_* helper)
+DB_POOL = dict(
+    size=5,               # max open connections
+    timeout=10,           # seconds to wait for a free connection
+    ping_interval=30      # seconds idle before a connection is health-checked
+)
+
+# read replicas: each entry overrides DB keys for one replica, e.g. dict(host="10.0.0.12");
+# db_query/db_query_prepared read from them, writes and transactions always use DB
+DB_REPLICAS = []
+
+REPLICATION = dict(
+    sticky_seconds=5,     # after this process writes, its reads go to the primary this long (read-your-writes)
+    retry_after=30        # seconds a replica that failed is skipped before it is tried again
+)
+
+# query instrumentation (see QueryMetrics below)
+METRICS = dict(
+    enabled=True,
+    slow_query_ms=250,    # statements slower than this go to the slow-query log
+    slow_log_size=200,    # entries kept in memory for the debug panel
+    slow_log_file=None    # optional path: slow queries are also appended here as JSON lines
+)
+
+#############################################
+#           QUERY METRICS
+#############################################
+# histogram bucket upper bounds in ms; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+def _shape(sql):
+    # group statements by text with literals already parameterized; collapse whitespace
+    return re.sub(r"\s+", " ", sql).strip()[:300]
+
+class QueryMetrics:
+    """Thread-safe latency histograms, row counts and a slow-query log.
+
+    Keys are SQL statements (whitespace-collapsed) or named phases such as
+    ``pool.acquire`` and ``render.rentals``. Percentiles are estimated from
+    the histogram buckets, so memory stays constant however long the app runs.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+            self.slow = deque(maxlen=METRICS['slow_log_size'])
+
+    def observe(self, key, elapsed_ms, rows=0, error=False):
+        if not METRICS['enabled']:
+            return
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = {'count': 0, 'errors': 0, 'rows': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                         'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+            s['count'] += 1
+            s['errors'] += bool(error)
+            s['rows'] += rows or 0
+            s['total_ms'] += elapsed_ms
+            s['max_ms'] = max(s['max_ms'], elapsed_ms)
+            s['buckets'][bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def query(self, sql, params, elapsed_ms, rows=0, error=False):
+        key = _shape(sql)
+        self.observe(key, elapsed_ms, rows, error)
+        if METRICS['enabled'] and elapsed_ms >= METRICS['slow_query_ms']:
+            entry = {'at': time.strftime("%Y-%m-%d %H:%M:%S"), 'ms': round(elapsed_ms, 1), 'rows': rows,
+                     'sql': key, 'params': repr(params)[:200], 'error': error}
+            self.slow.append(entry)
+            if METRICS['slow_log_file']:
+                try:
+                    with open(METRICS['slow_log_file'], "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry) + "\n")
+                except OSError:
+                    pass
+
+    @contextmanager
+    def timed(self, key, rows=0):
+        """Time a block as ``key``; yields a dict whose 'rows' entry may be updated inside."""
+        info = {'rows': rows}
+        t0 = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.observe(key, (time.perf_counter() - t0) * 1000, info['rows'])
+
+    @staticmethod
+    def _percentile(buckets, count, p):
+        target = count * p / 100
+        seen = 0
+        for i, n in enumerate(buckets):
+            seen += n
+            if n and seen >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else float("inf")
+        return 0
+
+    def snapshot(self):
+        """{key: summary} sorted by total time spent, highest first."""
+        with self._lock:
+            series = {k: dict(v, buckets=list(v['buckets'])) for k, v in self._series.items()}
+        out = {}
+        for key, s in sorted(series.items(), key=lambda kv: -kv[1]['total_ms']):
+            n = s['count']
+            out[key] = {'count': n, 'errors': s['errors'], 'rows': s['rows'],
+                        'total_ms': round(s['total_ms'], 1), 'mean_ms': round(s['total_ms'] / n, 2) if n else 0,
+                        'max_ms': round(s['max_ms'], 1),
+                        # a bucket bound can overshoot the slowest sample actually seen
+                        **{f"p{p}_ms": min(self._percentile(s['buckets'], n, p), round(s['max_ms'], 1)) for p in (50, 95, 99)},
+                        'histogram': dict(zip([f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"],
+                                              s['buckets']))}
+        return out
+
+    def export(self, path):
+        """Write the snapshot, slow log and pool stats as JSON; returns the path."""
+        data = {'generated_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                'pool': dict(_pool.stats) if _pool is not None else None,
+                'replicas': replication_status(),
+                'slow_query_ms': METRICS['slow_query_ms'],
+                'series': self.snapshot(), 'slow_queries': list(self.slow)}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, default=str)
+        return path
+
+metrics = QueryMetrics()
+
+#############################################
+#           CONNECTION POOL
+#############################################
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections, reused across queries."""
+    def __init__(self, config, size=5, timeout=10, ping_interval=30):
+        self.config = dict(config)
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = queue.LifoQueue()          # (conn, last_used) pairs, most recent first
+        self._lock = threading.Lock()
+        self._open = 0
+        self.stats = {'queries': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0,
+                      'connects': 0}
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self.config)
+        self.stats['connects'] += 1
+        return conn
+
+    def _healthy(self, conn, last_used):
+        # only ping connections that sat idle long enough to have gone stale
+        if time.monotonic() - last_used < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=True, attempts=1, delay=0)
+            _prepared.pop(conn, None)    # a reconnect drops server-side prepared statements
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        t0 = time.perf_counter()
+        try:
+            return self._acquire()
+        finally:
+            metrics.observe("pool.acquire", (time.perf_counter() - t0) * 1000)
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    grow = self._open < self.size
+                    if grow:
+                        self._open += 1
+                if grow:
+                    try:
+                        return self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._open -= 1
+                        raise
+                # pool exhausted: wait for another thread to hand one back
+                try:
+                    conn, last_used = self._idle.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    raise TimeoutError(f"No free DB connection after {self.timeout}s (pool size {self.size})")
+            if self._healthy(conn, last_used):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn, discard=False):
+        if conn is None:
+            return
+        if discard:
+            return self._discard(conn)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            return self._discard(conn)
+        self._idle.put((conn, time.monotonic()))
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except:
+            pass
+        with self._lock:
+            self._open = max(0, self._open - 1)
+
+    def prefill(self, n):
+        """Open up to ``n`` connections ahead of demand (e.g. while a login form is on screen)."""
+        conns = []
+        try:
+            for _ in range(min(int(n), self.size)):
+                conns.append(self.acquire())
+        finally:
+            for conn in conns:
+                self.release(conn)
+        return len(conns)
+
+    def record(self, elapsed_ms):
+        s = self.stats
+        s['queries'] += 1
+        s['total_ms'] += elapsed_ms
+        s['last_ms'] = elapsed_ms
+        s['max_ms'] = max(s['max_ms'], elapsed_ms)
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(conn, discard=broken)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(DB, **DB_POOL)
+        return _pool
+
+#############################################
+#           READ/WRITE SPLITTING
+#############################################
+_replicas = None            # [{'name', 'pool', 'down_until'}], built from DB_REPLICAS on first read
+_last_write = 0.0           # monotonic time of this process's last committed write
+_route = threading.local()  # replica pinned to the current thread
+
+def _replica_pools():
+    global _replicas
+    with _pool_lock:
+        if _replicas is None:
+            _replicas = [{'name': f"{r.get('host', DB['host'])}:{r.get('port', DB.get('port', 3306))}",
+                          'pool': ConnectionPool(dict(DB, **r), **DB_POOL), 'down_until': 0.0} for r in DB_REPLICAS]
+        return _replicas
+
+def _mark_written():
+    global _last_write
+    _last_write = time.monotonic()
+
+def read_pool():
+    """Pool for the next read: the primary when there are no live replicas or
+    this process wrote within REPLICATION['sticky_seconds'], else a replica.
+
+    Each thread stays on one replica, so a change_log cursor and the rows
+    read after it come from the same server and agree on replication lag.
+    """
+    if not DB_REPLICAS or time.monotonic() - _last_write < REPLICATION['sticky_seconds']:
+        return get_pool()
+    now = time.monotonic()
+    live = [r for r in _replica_pools() if r['down_until'] <= now]
+    if not live:
+        return get_pool()
+    pinned = getattr(_route, 'replica', None)
+    if pinned not in live:
+        pinned = _route.replica = live[threading.get_ident() % len(live)]
+    return pinned['pool']
+
+def _replica_failed(pool):
+    for r in _replicas or ():
+        if r['pool'] is pool:
+            r['down_until'] = time.monotonic() + REPLICATION['retry_after']
+            pool.close_all()
+
+def _acquire_read(pool):
+    # a replica that can't be reached is skipped for a while and the read goes to the primary
+    try:
+        return pool.acquire(), pool
+    except _STALE_ERRORS:
+        if pool is get_pool():
+            raise
+        _replica_failed(pool)
+        return get_pool().acquire(), get_pool()
+
+def replication_status():
+    now = time.monotonic()
+    return [{'replica': r['name'], 'up': r['down_until'] <= now, 'queries': r['pool'].stats['queries'],
+             'connects': r['pool'].stats['connects']} for r in (_replicas or ())]
+
+def close_pools():
+    if _pool is not None:
+        _pool.close_all()
+    for r in _replicas or ():
+        r['pool'].close_all()
+
+#############################################
+#           QUERY HELPERS
+#############################################
+_STALE_ERRORS = (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError)
+
+# callbacks run after every successful db_execute: fn(query, params)
+_write_hooks = []
+
+def add_write_hook(fn):
+    _write_hooks.append(fn)
+
+def _record(pool, query, params, t0, rows=0, error=False):
+    elapsed = (time.perf_counter() - t0) * 1000
+    if not error:
+        pool.record(elapsed)
+    metrics.query(query, params, elapsed, rows, error)
+
+def db_query(query, params=(), dictionary=True, primary=False):
+    """Run a read and return all rows (dicts by default); a stale connection is retried once.
+
+    Reads go through read_pool() unless ``primary`` is set.
+    """
+    pool = get_pool() if primary else read_pool()
+    for attempt in (1, 2):
+        conn, pool = _acquire_read(pool)
+        cur = None; broken = False
+        try:
+            t0 = time.perf_counter()
+            cur = conn.cursor(dictionary=dictionary)
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            _record(pool, query, params, t0, len(rows))
+            return rows
+        except _STALE_ERRORS:
+            # connection died under us: drop it and retry the read once on a fresh one
+            broken = True
+            _record(pool, query, params, t0, error=True)
+            if attempt == 2:
+                raise
+        except Exception:
+            _record(pool, query, params, t0, error=True)
+            raise
+        finally:
+            try:
+                if cur: cur.close()
+            except: broken = True
+            pool.release(conn, discard=broken)
+        if pool is not get_pool():
+            _replica_failed(pool)
+            pool = get_pool()
+
+# server-side prepared statements, cached per pooled connection so each SQL
+# string is prepared once per connection rather than once per call
+_prepared = weakref.WeakKeyDictionary()
+
+def _prepared_cursor(conn, query):
+    cursors = _prepared.setdefault(conn, {})
+    cur = cursors.get(query)
+    if cur is None:
+        cur = cursors[query] = conn.cursor(prepared=True)
+    return cur
+
+def db_query_prepared(query, params=(), primary=False):
+    """Like db_query(dictionary=False) but through a cached prepared statement."""
+    pool = get_pool() if primary else read_pool()
+    for attempt in (1, 2):
+        conn, pool = _acquire_read(pool)
+        broken = False
+        try:
+            t0 = time.perf_counter()
+            cur = _prepared_cursor(conn, query)
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            _record(pool, query, params, t0, len(rows))
+            return rows
+        except _STALE_ERRORS:
+            broken = True
+            _prepared.pop(conn, None)
+            _record(pool, query, params, t0, error=True)
+            if attempt == 2:
+                raise
+        except Exception:
+            _prepared.get(conn, {}).pop(query, None)     # don't reuse a cursor left mid-result
+            _record(pool, query, params, t0, error=True)
+            raise
+        finally:
+            pool.release(conn, discard=broken)
+        if pool is not get_pool():
+            _replica_failed(pool)
+            pool = get_pool()
+
+def db_execute(query, params=(), many=False):
+    """Run one write (or executemany) in its own transaction; returns (rowcount, lastrowid)."""
+    pool = get_pool()
+    conn = pool.acquire()
+    cur = None; broken = False
+    try:
+        t0 = time.perf_counter()
+        cur = conn.cursor()
+        if many:
+            cur.executemany(query, params)
+        else:
+            cur.execute(query, params)
+        conn.commit()
+        _mark_written()
+        result = (cur.rowcount, cur.lastrowid)
+        _record(pool, query, params if not many else f"{len(params)} rows", t0, max(0, cur.rowcount))
+    except _STALE_ERRORS:
+        # writes are not retried: the statement may already have been applied
+        broken = True
+        _record(pool, query, params, t0, error=True)
+        raise
+    except Exception:
+        _record(pool, query, params, t0, error=True)
+        try: conn.rollback()
+        except: broken = True
+        raise
+    finally:
+        try:
+            if cur: cur.close()
+        except: broken = True
+        pool.release(conn, discard=broken)
+    for hook in _write_hooks:
+        hook(query, params)
+    return result
+
+@contextmanager
+def transaction(dictionary=False):
+    """Yield a cursor inside one transaction: committed on success, rolled back on error."""
+    with get_pool().connection() as conn, metrics.timed("transaction"):
+        cur = conn.cursor(dictionary=dictionary)
+        try:
+            conn.start_transaction()
+            yield cur
+            conn.commit()
+            _mark_written()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+@contextmanager
+def locked_tables(cur, tables):
+    """Hold ``LOCK TABLES tables`` on ``cur``'s connection for the block.
+
+    Every table the block reads must be named, under each alias it is read
+    by. UNLOCK TABLES commits the block's work; an error rolls it back first,
+    and the locks are released either way so they never go back to the pool.
+    """
+    cur.execute(f"LOCK TABLES {tables}")
+    try:
+        yield cur
+    except Exception:
+        cur.execute("ROLLBACK")
+        raise
+    finally:
+        cur.execute("UNLOCK TABLES")
+
+#############################################
+#           SCHEMA MIGRATIONS
+#############################################
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+def _migration_files():
+    """(version, name, path) for every migrations/NNN_name.sql, in version order."""
+    out = []
+    if os.path.isdir(MIGRATIONS_DIR):
+        for fn in os.listdir(MIGRATIONS_DIR):
+            m = re.match(r"^(\d+)_(\w+)\.sql$", fn)
+            if m:
+                out.append((int(m.group(1)), m.group(2), os.path.join(MIGRATIONS_DIR, fn)))
+    return sorted(out)
+
+def _split_sql(text):
+    # statements end with ';' at end of line; leading '--' comment lines are skipped
+    stmts, buf = [], []
+    for line in text.splitlines():
+        if not buf and (not line.strip() or line.strip().startswith("--")):
+            continue
+        buf.append(line)
+        if line.rstrip().endswith(";"):
+            stmts.append("\n".join(buf).strip().rstrip(";"))
+            buf = []
+    if buf and "\n".join(buf).strip():
+        stmts.append("\n".join(buf).strip())
+    return stmts
+
+def pending_migrations():
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TABLE IF NOT EXISTS schema_migrations ("
+                    "version INT PRIMARY KEY, name VARCHAR(255) NOT NULL, "
+                    "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)")
+        cur.execute("SELECT version FROM schema_migrations")
+        done = {r[0] for r in cur.fetchall()}
+        cur.close()
+    return [m for m in _migration_files() if m[0] not in done]
+
+def apply_migrations(log=print):
+    """Apply pending migrations in order; returns the versions applied.
+
+    MySQL commits DDL implicitly, so a migration that fails midway is left
+    partially applied and unrecorded: fix the cause and re-run.
+    """
+    applied = []
+    for version, name, path in pending_migrations():
+        with open(path, encoding="utf-8") as f:
+            stmts = _split_sql(f.read())
+        log(f"Applying migration {version:03d}_{name} ({len(stmts)} statements)")
+        with get_pool().connection() as conn:
+            cur = conn.cursor()
+            try:
+                for s in stmts:
+                    cur.execute(s)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s,%s)", (version, name))
+                conn.commit()
+            except Exception as e:
+                try:
+                    cur.execute("UNLOCK TABLES")    # a migration failing under LOCK TABLES: don't pool the locks
+                except Exception:
+                    pass
+                raise RuntimeError(f"Migration {version:03d}_{name} failed: {e}") from e
+            finally:
+                cur.close()
+        applied.append(version)
+    return applied
+
+#############################################
+#           CHANGE LOG
+#############################################
+CHANGE_LOG_RETENTION_HOURS = 24
+# change_log ids are allocated when a row is logged but only become visible when
+# its transaction commits, so a long transaction (billing, import, overdue pass)
+# can commit ids below ones already read. A hole in the ids younger than this is
+# waited for; an older one is taken as rolled back.
+CHANGE_LOG_SETTLE_SECONDS = 60
+CHANGE_LOG_TAIL = 1000      # newest entries change_log_cursor() checks for holes
+
+def _advance(safe, seen, entries):
+    # entries: (id, settled) in id order, all > safe. The cursor moves up to the
+    # first hole that may still fill; ids read past it are remembered in `seen`.
+    seen = set(seen)
+    blocked = False
+    for rid, settled in entries:
+        if not blocked and (rid == safe + 1 or settled):
+            safe = rid
+        else:
+            blocked = True
+            seen.add(rid)
+    return safe, frozenset(i for i in seen if i > safe)
+
+def _settled_sql():
+    return f"changed_at < NOW() - INTERVAL {int(CHANGE_LOG_SETTLE_SECONDS)} SECOND AS settled"
+
+def change_log_cursor():
+    """Cursor for read_changes() covering everything committed to change_log so far.
+
+    A cursor is (id, seen): every entry up to ``id`` has been read, plus the
+    ids in ``seen`` above it. Treat it as opaque.
+    """
+    rows = db_query(f"SELECT id, {_settled_sql()} FROM change_log ORDER BY id DESC LIMIT %s", (CHANGE_LOG_TAIL,))
+    if not rows:
+        return 0, frozenset()
+    rows.reverse()
+    return _advance(int(rows[0]['id']) - 1, (), [(int(r['id']), bool(r['settled'])) for r in rows])
+
+def read_changes(cursor, limit, tables=None):
+    """change_log entries committed since ``cursor`` and not returned before.
+
+    Returns (entries, new cursor); entries are dicts with id, table_name,
+    row_id and op, filtered to ``tables`` if given. Returns None when entries
+    after the cursor were pruned or more than ``limit`` are waiting: the
+    caller should reload instead of replaying.
+    """
+    safe, seen = cursor
+    oldest = db_query("SELECT MIN(id) AS m FROM change_log")
+    if oldest and oldest[0]['m'] is not None and int(oldest[0]['m']) > safe + 1:
+        return None
+    rows = db_query(f"SELECT id, table_name, row_id, op, {_settled_sql()} FROM change_log WHERE id > %s"
+                    " ORDER BY id LIMIT %s", (safe, limit + len(seen) + 1))
+    if len(rows) > limit + len(seen):
+        return None
+    new_cursor = _advance(safe, seen, [(int(r['id']), bool(r['settled'])) for r in rows])
+    entries = [r for r in rows if int(r['id']) not in seen and (tables is None or r['table_name'] in tables)]
+    return entries, new_cursor
+
+def prune_change_log(hours=CHANGE_LOG_RETENTION_HOURS):
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM change_log WHERE changed_at < NOW() - INTERVAL %s HOUR LIMIT 10000", (hours,))
+        conn.commit()
+        cur.close()
@@ -14,7 +14,6 @@ CREATE TABLE admins (
     password VARCHAR(255) NOT NULL
 );
 
-:
 INSERT INTO admins (username, password)
 VALUES ('admin', 'admin123');
 
@@ -64,6 +63,8 @@ CREATE TABLE rentals (
     actual_return_date DATE NULL,
     status VARCHAR(50),
     amount DECIMAL(12,2) NULL,
+    overdue_days INT NOT NULL DEFAULT 0,
+    late_fee DECIMAL(12,2) NOT NULL DEFAULT 0,
 
     FOREIGN KEY (vehicle_id) REFERENCES vehicles(id) ON DELETE CASCADE,
     FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE
@@ -73,3 +74,67 @@ CREATE TABLE rentals (
 INSERT INTO rentals (vehicle_id, customer_id, start_date, expected_return_date, actual_return_date, status, amount)
 VALUES (1, 1, '2025-01-01', '2025-01-03', NULL, 'ongoing', 4500.00);
 
+
+-- -----------------------------------------------------
+-- CHANGE LOG (drives incremental grid refresh)
+-- -----------------------------------------------------
+-- One row per insert/update/delete on the grid tables. The app remembers the
+-- last id it has seen and only re-reads rows logged after it.
+-- Note: MySQL does not fire triggers for ON DELETE CASCADE, so the app deletes
+-- child rentals explicitly or reloads when a parent row disappears.
+CREATE TABLE change_log (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(32) NOT NULL,
+    row_id INT NOT NULL,
+    op CHAR(1) NOT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_change_log_changed_at (changed_at)
+);
+
+CREATE TRIGGER vehicles_ai AFTER INSERT ON vehicles FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('vehicles', NEW.id, 'I');
+CREATE TRIGGER vehicles_au AFTER UPDATE ON vehicles FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('vehicles', NEW.id, 'U');
+CREATE TRIGGER vehicles_ad AFTER DELETE ON vehicles FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('vehicles', OLD.id, 'D');
+
+CREATE TRIGGER customers_ai AFTER INSERT ON customers FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('customers', NEW.id, 'I');
+CREATE TRIGGER customers_au AFTER UPDATE ON customers FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('customers', NEW.id, 'U');
+CREATE TRIGGER customers_ad AFTER DELETE ON customers FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('customers', OLD.id, 'D');
+
+CREATE TRIGGER rentals_ai AFTER INSERT ON rentals FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('rentals', NEW.id, 'I');
+CREATE TRIGGER rentals_au AFTER UPDATE ON rentals FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('rentals', NEW.id, 'U');
+CREATE TRIGGER rentals_ad AFTER DELETE ON rentals FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('rentals', OLD.id, 'D');
+
+-- -----------------------------------------------------
+-- INDEXES (hot filters: rental status/dates, vehicle status, lookups)
+-- -----------------------------------------------------
+CREATE INDEX idx_rentals_status_expected ON rentals (status, expected_return_date);
+CREATE INDEX idx_rentals_vehicle_status ON rentals (vehicle_id, status);
+CREATE INDEX idx_rentals_start_date ON rentals (start_date);
+CREATE INDEX idx_rentals_availability ON rentals (vehicle_id, status, start_date, expected_return_date);
+CREATE INDEX idx_vehicles_status ON vehicles (status);
+CREATE UNIQUE INDEX uq_vehicles_reg_no ON vehicles (reg_no);
+CREATE INDEX idx_customers_phone ON customers (phone);
+CREATE INDEX idx_customers_name ON customers (name);
+CREATE FULLTEXT INDEX ft_vehicles_make_model ON vehicles (make, model);
+CREATE FULLTEXT INDEX ft_customers_name_email ON customers (name, email);
+
+-- -----------------------------------------------------
+-- SCHEMA MIGRATIONS
+-- -----------------------------------------------------
+-- Existing databases are upgraded with the files in migrations/ (the app
+-- checks at startup, or run: python app_ctk_login.py --migrate). A fresh
+-- install already contains everything up to the versions recorded here;
+-- later ones (dashboard summaries, rentals archive) are only defined in
+-- migrations/ and applied by the app on first start.
+CREATE TABLE schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO schema_migrations (version, name)
+VALUES
+(1, 'change_log'),
+(2, 'hot_query_indexes'),
+(3, 'search_fulltext'),
+(4, 'billing_columns'),
+(5, 'availability_index');
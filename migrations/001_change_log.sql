@@ -0,0 +1,23 @@
+-- Change log + triggers used by the incremental grid refresh.
+-- Idempotent so it is safe on databases created from a db_init.sql that
+-- already had the table but no schema_migrations bookkeeping.
+CREATE TABLE IF NOT EXISTS change_log (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(32) NOT NULL,
+    row_id INT NOT NULL,
+    op CHAR(1) NOT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_change_log_changed_at (changed_at)
+);
+
+CREATE TRIGGER IF NOT EXISTS vehicles_ai AFTER INSERT ON vehicles FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('vehicles', NEW.id, 'I');
+CREATE TRIGGER IF NOT EXISTS vehicles_au AFTER UPDATE ON vehicles FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('vehicles', NEW.id, 'U');
+CREATE TRIGGER IF NOT EXISTS vehicles_ad AFTER DELETE ON vehicles FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('vehicles', OLD.id, 'D');
+
+CREATE TRIGGER IF NOT EXISTS customers_ai AFTER INSERT ON customers FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('customers', NEW.id, 'I');
+CREATE TRIGGER IF NOT EXISTS customers_au AFTER UPDATE ON customers FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('customers', NEW.id, 'U');
+CREATE TRIGGER IF NOT EXISTS customers_ad AFTER DELETE ON customers FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('customers', OLD.id, 'D');
+
+CREATE TRIGGER IF NOT EXISTS rentals_ai AFTER INSERT ON rentals FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('rentals', NEW.id, 'I');
+CREATE TRIGGER IF NOT EXISTS rentals_au AFTER UPDATE ON rentals FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('rentals', NEW.id, 'U');
+CREATE TRIGGER IF NOT EXISTS rentals_ad AFTER DELETE ON rentals FOR EACH ROW INSERT INTO change_log (table_name, row_id, op) VALUES ('rentals', OLD.id, 'D');
@@ -0,0 +1,10 @@
+-- Indexes for the filters the app runs all the time.
+-- uq_vehicles_reg_no fails if duplicate registration numbers already exist:
+-- clean those up first, then re-run the migration.
+CREATE INDEX idx_rentals_status_expected ON rentals (status, expected_return_date);
+CREATE INDEX idx_rentals_vehicle_status ON rentals (vehicle_id, status);
+CREATE INDEX idx_rentals_start_date ON rentals (start_date);
+CREATE INDEX idx_vehicles_status ON vehicles (status);
+CREATE UNIQUE INDEX uq_vehicles_reg_no ON vehicles (reg_no);
+CREATE INDEX idx_customers_phone ON customers (phone);
+CREATE INDEX idx_customers_name ON customers (name);
@@ -0,0 +1,4 @@
+-- FULLTEXT indexes behind the search bars (word-prefix matching on make/model
+-- and customer name/email). reg_no and phone use the B-tree indexes from 002.
+CREATE FULLTEXT INDEX ft_vehicles_make_model ON vehicles (make, model);
+CREATE FULLTEXT INDEX ft_customers_name_email ON customers (name, email);
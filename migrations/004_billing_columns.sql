@@ -0,0 +1,5 @@
+-- Columns written by the batch billing run (python app_ctk_login.py --bill).
+-- amount stays the base charge (rate * days); late fees are kept separately.
+ALTER TABLE rentals
+    ADD COLUMN overdue_days INT NOT NULL DEFAULT 0,
+    ADD COLUMN late_fee DECIMAL(12,2) NOT NULL DEFAULT 0;
@@ -0,0 +1,3 @@
+-- Date-range availability ("which vehicles are free 10-15 March"): the
+-- overlap check in repository.rental_overlap_sql() reads only this index.
+CREATE INDEX idx_rentals_availability ON rentals (vehicle_id, status, start_date, expected_return_date);
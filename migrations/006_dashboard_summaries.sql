@@ -0,0 +1,66 @@
+-- Pre-aggregated dashboard summaries: revenue per start day and per vehicle,
+-- kept current by triggers on rentals (so every write path - app, import,
+-- billing - maintains them). Revenue is the stored amount, or rate * days
+-- when none is stored, plus the late fee. Changing a vehicle's rate does not
+-- re-price its unpriced rentals here: python app_ctk_login.py
+-- --rebuild-summaries recomputes both tables from scratch.
+CREATE TABLE IF NOT EXISTS summary_revenue_day (
+    day DATE PRIMARY KEY,
+    rentals INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS summary_revenue_vehicle (
+    vehicle_id INT PRIMARY KEY,
+    rentals INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    rented_days INT NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS rentals_summary_day_ai AFTER INSERT ON rentals FOR EACH ROW
+    INSERT INTO summary_revenue_day (day, rentals, revenue)
+    SELECT NEW.start_date, +1, (COALESCE(NEW.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = NEW.vehicle_id) * GREATEST(1, DATEDIFF(COALESCE(NEW.expected_return_date, NEW.start_date), NEW.start_date) + 1), 0) + NEW.late_fee) FROM DUAL WHERE NEW.start_date IS NOT NULL
+    ON DUPLICATE KEY UPDATE rentals = rentals + VALUES(rentals), revenue = revenue + VALUES(revenue);
+
+CREATE TRIGGER IF NOT EXISTS rentals_summary_vehicle_ai AFTER INSERT ON rentals FOR EACH ROW
+    INSERT INTO summary_revenue_vehicle (vehicle_id, rentals, revenue, rented_days)
+    SELECT NEW.vehicle_id, +1, (COALESCE(NEW.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = NEW.vehicle_id) * GREATEST(1, DATEDIFF(COALESCE(NEW.expected_return_date, NEW.start_date), NEW.start_date) + 1), 0) + NEW.late_fee), GREATEST(1, DATEDIFF(COALESCE(NEW.actual_return_date, NEW.expected_return_date, NEW.start_date), NEW.start_date) + 1) FROM DUAL WHERE NEW.vehicle_id IS NOT NULL
+    ON DUPLICATE KEY UPDATE rentals = rentals + VALUES(rentals), revenue = revenue + VALUES(revenue), rented_days = rented_days + VALUES(rented_days);
+
+CREATE TRIGGER IF NOT EXISTS rentals_summary_day_au AFTER UPDATE ON rentals FOR EACH ROW
+    INSERT INTO summary_revenue_day (day, rentals, revenue)
+    SELECT OLD.start_date, -1, -(COALESCE(OLD.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = OLD.vehicle_id) * GREATEST(1, DATEDIFF(COALESCE(OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1), 0) + OLD.late_fee) FROM DUAL WHERE OLD.start_date IS NOT NULL
+    UNION ALL SELECT NEW.start_date, +1, (COALESCE(NEW.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = NEW.vehicle_id) * GREATEST(1, DATEDIFF(COALESCE(NEW.expected_return_date, NEW.start_date), NEW.start_date) + 1), 0) + NEW.late_fee) FROM DUAL WHERE NEW.start_date IS NOT NULL
+    ON DUPLICATE KEY UPDATE rentals = rentals + VALUES(rentals), revenue = revenue + VALUES(revenue);
+
+CREATE TRIGGER IF NOT EXISTS rentals_summary_vehicle_au AFTER UPDATE ON rentals FOR EACH ROW
+    INSERT INTO summary_revenue_vehicle (vehicle_id, rentals, revenue, rented_days)
+    SELECT OLD.vehicle_id, -1, -(COALESCE(OLD.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = OLD.vehicle_id) * GREATEST(1, DATEDIFF(COALESCE(OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1), 0) + OLD.late_fee), -GREATEST(1, DATEDIFF(COALESCE(OLD.actual_return_date, OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1) FROM DUAL WHERE OLD.vehicle_id IS NOT NULL
+    UNION ALL SELECT NEW.vehicle_id, +1, (COALESCE(NEW.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = NEW.vehicle_id) * GREATEST(1, DATEDIFF(COALESCE(NEW.expected_return_date, NEW.start_date), NEW.start_date) + 1), 0) + NEW.late_fee), GREATEST(1, DATEDIFF(COALESCE(NEW.actual_return_date, NEW.expected_return_date, NEW.start_date), NEW.start_date) + 1) FROM DUAL WHERE NEW.vehicle_id IS NOT NULL
+    ON DUPLICATE KEY UPDATE rentals = rentals + VALUES(rentals), revenue = revenue + VALUES(revenue), rented_days = rented_days + VALUES(rented_days);
+
+CREATE TRIGGER IF NOT EXISTS rentals_summary_day_ad AFTER DELETE ON rentals FOR EACH ROW
+    INSERT INTO summary_revenue_day (day, rentals, revenue)
+    SELECT OLD.start_date, -1, -(COALESCE(OLD.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = OLD.vehicle_id) * GREATEST(1, DATEDIFF(COALESCE(OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1), 0) + OLD.late_fee) FROM DUAL WHERE OLD.start_date IS NOT NULL
+    ON DUPLICATE KEY UPDATE rentals = rentals + VALUES(rentals), revenue = revenue + VALUES(revenue);
+
+CREATE TRIGGER IF NOT EXISTS rentals_summary_vehicle_ad AFTER DELETE ON rentals FOR EACH ROW
+    INSERT INTO summary_revenue_vehicle (vehicle_id, rentals, revenue, rented_days)
+    SELECT OLD.vehicle_id, -1, -(COALESCE(OLD.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = OLD.vehicle_id) * GREATEST(1, DATEDIFF(COALESCE(OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1), 0) + OLD.late_fee), -GREATEST(1, DATEDIFF(COALESCE(OLD.actual_return_date, OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1) FROM DUAL WHERE OLD.vehicle_id IS NOT NULL
+    ON DUPLICATE KEY UPDATE rentals = rentals + VALUES(rentals), revenue = revenue + VALUES(revenue), rented_days = rented_days + VALUES(rented_days);
+
+-- backfill from existing rentals. The triggers above are already live, so
+-- writes are held off while the tables are rebuilt: a rental written between
+-- the DELETE and the INSERT ... SELECT would otherwise be counted twice or
+-- not at all. LOCK TABLES names every table the statements read, by alias;
+-- dashboard.rebuild_summaries takes the same locks through db.locked_tables.
+LOCK TABLES rentals AS r READ, vehicles AS v READ, summary_revenue_day WRITE, summary_revenue_vehicle WRITE;
+DELETE FROM summary_revenue_day;
+INSERT INTO summary_revenue_day (day, rentals, revenue)
+    SELECT r.start_date, COUNT(*), SUM(COALESCE(r.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = r.vehicle_id) * GREATEST(1, DATEDIFF(COALESCE(r.expected_return_date, r.start_date), r.start_date) + 1), 0) + r.late_fee)
+    FROM rentals r WHERE r.start_date IS NOT NULL GROUP BY r.start_date;
+DELETE FROM summary_revenue_vehicle;
+INSERT INTO summary_revenue_vehicle (vehicle_id, rentals, revenue, rented_days)
+    SELECT r.vehicle_id, COUNT(*), SUM(COALESCE(r.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = r.vehicle_id) * GREATEST(1, DATEDIFF(COALESCE(r.expected_return_date, r.start_date), r.start_date) + 1), 0) + r.late_fee), SUM(GREATEST(1, DATEDIFF(COALESCE(r.actual_return_date, r.expected_return_date, r.start_date), r.start_date) + 1))
+    FROM rentals r WHERE r.vehicle_id IS NOT NULL GROUP BY r.vehicle_id;
+UNLOCK TABLES;
@@ -0,0 +1,42 @@
+-- Hot/cold split for rentals: returned rentals older than archive.ARCHIVE
+-- ['min_age_days'] move to rentals_archive in batches (python
+-- app_ctk_login.py --archive), so the grids, availability checks and
+-- billing only ever touch open and recent rentals. The archive keeps the
+-- same columns; repository.RENTALS_HISTORY_SOURCE reads both tables when a
+-- user asks for history. Archiving deletes from rentals with
+-- @rental_archiving set, which the summary triggers below skip: archived
+-- revenue stays on the dashboard.
+--
+-- No foreign keys: cold history is a record of what happened and outlives
+-- the vehicles and customers it mentions. Deleting one leaves its archived
+-- rentals (and their revenue in the summaries) in place, and a cascade
+-- would have removed them without firing any trigger.
+CREATE TABLE IF NOT EXISTS rentals_archive (
+    id INT PRIMARY KEY,
+    vehicle_id INT,
+    customer_id INT,
+    start_date DATE,
+    expected_return_date DATE,
+    actual_return_date DATE NULL,
+    status VARCHAR(50),
+    amount DECIMAL(12,2) NULL,
+    overdue_days INT NOT NULL DEFAULT 0,
+    late_fee DECIMAL(12,2) NOT NULL DEFAULT 0,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_rentals_archive_vehicle (vehicle_id),
+    INDEX idx_rentals_archive_customer (customer_id),
+    INDEX idx_rentals_archive_start_date (start_date)
+);
+
+DROP TRIGGER IF EXISTS rentals_summary_day_ad;
+DROP TRIGGER IF EXISTS rentals_summary_vehicle_ad;
+
+CREATE TRIGGER rentals_summary_day_ad AFTER DELETE ON rentals FOR EACH ROW
+    INSERT INTO summary_revenue_day (day, rentals, revenue)
+    SELECT OLD.start_date, -1, -(COALESCE(OLD.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = OLD.vehicle_id) * GREATEST(1, DATEDIFF(COALESCE(OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1), 0) + OLD.late_fee) FROM DUAL WHERE OLD.start_date IS NOT NULL AND @rental_archiving IS NULL
+    ON DUPLICATE KEY UPDATE rentals = rentals + VALUES(rentals), revenue = revenue + VALUES(revenue);
+
+CREATE TRIGGER rentals_summary_vehicle_ad AFTER DELETE ON rentals FOR EACH ROW
+    INSERT INTO summary_revenue_vehicle (vehicle_id, rentals, revenue, rented_days)
+    SELECT OLD.vehicle_id, -1, -(COALESCE(OLD.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = OLD.vehicle_id) * GREATEST(1, DATEDIFF(COALESCE(OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1), 0) + OLD.late_fee), -GREATEST(1, DATEDIFF(COALESCE(OLD.actual_return_date, OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1) FROM DUAL WHERE OLD.vehicle_id IS NOT NULL AND @rental_archiving IS NULL
+    ON DUPLICATE KEY UPDATE rentals = rentals + VALUES(rentals), revenue = revenue + VALUES(revenue), rented_days = rented_days + VALUES(rented_days);
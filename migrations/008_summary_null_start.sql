@@ -0,0 +1,34 @@
+-- A rental without a start date bills one day (billing.bill_rental(),
+-- repository.RENTAL_DAYS_SQL), but the per-vehicle summary triggers of
+-- migrations 006/007 priced its days as GREATEST(1, DATEDIFF(...)), which is
+-- NULL there: no revenue, and a NULL rented_days the NOT NULL column refuses.
+-- The vehicle triggers are recreated with the day count defaulting to 1; the
+-- per-day triggers only see rentals that have a start date.
+DROP TRIGGER IF EXISTS rentals_summary_vehicle_ai;
+DROP TRIGGER IF EXISTS rentals_summary_vehicle_au;
+DROP TRIGGER IF EXISTS rentals_summary_vehicle_ad;
+
+CREATE TRIGGER rentals_summary_vehicle_ai AFTER INSERT ON rentals FOR EACH ROW
+    INSERT INTO summary_revenue_vehicle (vehicle_id, rentals, revenue, rented_days)
+    SELECT NEW.vehicle_id, +1, (COALESCE(NEW.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = NEW.vehicle_id) * COALESCE(GREATEST(1, DATEDIFF(COALESCE(NEW.expected_return_date, NEW.start_date), NEW.start_date) + 1), 1), 0) + NEW.late_fee), COALESCE(GREATEST(1, DATEDIFF(COALESCE(NEW.actual_return_date, NEW.expected_return_date, NEW.start_date), NEW.start_date) + 1), 1) FROM DUAL WHERE NEW.vehicle_id IS NOT NULL
+    ON DUPLICATE KEY UPDATE rentals = rentals + VALUES(rentals), revenue = revenue + VALUES(revenue), rented_days = rented_days + VALUES(rented_days);
+
+CREATE TRIGGER rentals_summary_vehicle_au AFTER UPDATE ON rentals FOR EACH ROW
+    INSERT INTO summary_revenue_vehicle (vehicle_id, rentals, revenue, rented_days)
+    SELECT OLD.vehicle_id, -1, -(COALESCE(OLD.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = OLD.vehicle_id) * COALESCE(GREATEST(1, DATEDIFF(COALESCE(OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1), 1), 0) + OLD.late_fee), -COALESCE(GREATEST(1, DATEDIFF(COALESCE(OLD.actual_return_date, OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1), 1) FROM DUAL WHERE OLD.vehicle_id IS NOT NULL
+    UNION ALL SELECT NEW.vehicle_id, +1, (COALESCE(NEW.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = NEW.vehicle_id) * COALESCE(GREATEST(1, DATEDIFF(COALESCE(NEW.expected_return_date, NEW.start_date), NEW.start_date) + 1), 1), 0) + NEW.late_fee), COALESCE(GREATEST(1, DATEDIFF(COALESCE(NEW.actual_return_date, NEW.expected_return_date, NEW.start_date), NEW.start_date) + 1), 1) FROM DUAL WHERE NEW.vehicle_id IS NOT NULL
+    ON DUPLICATE KEY UPDATE rentals = rentals + VALUES(rentals), revenue = revenue + VALUES(revenue), rented_days = rented_days + VALUES(rented_days);
+
+CREATE TRIGGER rentals_summary_vehicle_ad AFTER DELETE ON rentals FOR EACH ROW
+    INSERT INTO summary_revenue_vehicle (vehicle_id, rentals, revenue, rented_days)
+    SELECT OLD.vehicle_id, -1, -(COALESCE(OLD.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = OLD.vehicle_id) * COALESCE(GREATEST(1, DATEDIFF(COALESCE(OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1), 1), 0) + OLD.late_fee), -COALESCE(GREATEST(1, DATEDIFF(COALESCE(OLD.actual_return_date, OLD.expected_return_date, OLD.start_date), OLD.start_date) + 1), 1) FROM DUAL WHERE OLD.vehicle_id IS NOT NULL AND @rental_archiving IS NULL
+    ON DUPLICATE KEY UPDATE rentals = rentals + VALUES(rentals), revenue = revenue + VALUES(revenue), rented_days = rented_days + VALUES(rented_days);
+
+-- re-price the per-vehicle summary from hot and archived rentals, under the
+-- same table locks as the 006 backfill and dashboard.rebuild_summaries
+LOCK TABLES rentals READ, rentals_archive READ, vehicles AS v READ, summary_revenue_vehicle WRITE;
+DELETE FROM summary_revenue_vehicle;
+INSERT INTO summary_revenue_vehicle (vehicle_id, rentals, revenue, rented_days)
+    SELECT r.vehicle_id, COUNT(*), SUM(COALESCE(r.amount, (SELECT v.rate_per_day FROM vehicles v WHERE v.id = r.vehicle_id) * COALESCE(GREATEST(1, DATEDIFF(COALESCE(r.expected_return_date, r.start_date), r.start_date) + 1), 1), 0) + r.late_fee), SUM(COALESCE(GREATEST(1, DATEDIFF(COALESCE(r.actual_return_date, r.expected_return_date, r.start_date), r.start_date) + 1), 1))
+    FROM (SELECT vehicle_id, start_date, expected_return_date, actual_return_date, amount, late_fee FROM rentals UNION ALL SELECT vehicle_id, start_date, expected_return_date, actual_return_date, amount, late_fee FROM rentals_archive) r WHERE r.vehicle_id IS NOT NULL GROUP BY r.vehicle_id;
+UNLOCK TABLES;
@@ -0,0 +1,354 @@
+# offline.py
+"""Local SQLite replica and durable write queue for working through MySQL outages.
+
+The replica mirrors vehicles, customers and open (ongoing/reserved)
+rentals. It is filled by pull() and kept current from change_log by
+sync_down(), the same replay the grids and the availability index use.
+When the server cannot be reached the app reads from it, and writes are
+appended to the ``outbox`` table (committed to disk before the UI
+confirms) and applied to the local copy straight away.
+
+flush() replays the outbox to MySQL in order, a batch at a time. Each
+update or delete carries the row as it was when it was edited; if the
+server row no longer matches, the operation is parked as a conflict
+instead of overwriting someone else's change; the user can force it or
+discard it. Operations the server refuses outright (a booking clash, a
+row deleted since) are parked as rejected and can only be discarded.
+Rows created offline get negative ids locally until their insert is
+applied, and later queued operations that refer to them are remapped to
+the server ids.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+import mysql.connector
+
+from db import change_log_cursor, read_changes, transaction
+from repository import BookingError, customers, rentals, vehicle_cache, vehicles
+
+OFFLINE = dict(
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "offline_cache.sqlite3"),
+    sync_interval=30,     # seconds between background sync attempts
+    batch_ops=200,        # outbox operations replayed per flush()
+    pull_page=5000        # rows per page when (re)loading the replica
+)
+
+OFFLINE_REPLAY_LIMIT = 5000     # change_log entries sync_down() applies before re-pulling instead
+
+REPOS = {'vehicles': vehicles, 'customers': customers, 'rentals': rentals}
+OPEN_RENTAL_STATUSES = ("ongoing", "reserved")
+
+# client errors that mean "server unreachable" rather than "statement rejected"; matched
+# by errno only, since InterfaceError/OperationalError also cover lock wait timeouts,
+# deadlocks and bad statements, and a full local pool (TimeoutError) is not an outage
+_CONNECTION_ERRNOS = {2002, 2003, 2005, 2006, 2013, 2055}
+
+def is_connection_error(e):
+    return getattr(e, "errno", None) in _CONNECTION_ERRNOS
+
+class SyncConflict(Exception):
+    """A queued write the server refused. ``forceable`` ones only lost the conflict
+    check (the row changed on the server) and can be re-sent to overwrite it."""
+    def __init__(self, message, forceable=False):
+        super().__init__(message)
+        self.forceable = forceable
+
+def _load_cursor(stored):
+    # meta keeps [id, [seen ids]]; replicas from before the gap-aware cursor kept a bare id
+    value = json.loads(stored)
+    if isinstance(value, int):
+        return value, frozenset()
+    return int(value[0]), frozenset(value[1])
+
+def _plain(value):
+    # MySQL and SQLite values in one comparable, JSON-safe form
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def _row(columns, values):
+    return {c: _plain(v) for c, v in zip(columns, values)}
+
+class OfflineStore:
+    """SQLite mirror of the grid tables plus the outbox of queued writes."""
+    def __init__(self, path=None):
+        self.path = path or OFFLINE['path']
+        self._lock = threading.RLock()
+        self._conn = None
+
+    # ----- local database -----
+    def _db(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")     # a queued write survives a crash or power cut
+            for table, repo in REPOS.items():
+                cols = repo.record.__slots__
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, {', '.join(cols[1:])})")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rentals_vehicle ON rentals (vehicle_id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT NOT NULL,"
+                         " tbl TEXT NOT NULL, op TEXT NOT NULL, row_id INTEGER, payload TEXT, base TEXT,"
+                         " state TEXT NOT NULL DEFAULT 'pending', error TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS id_map (tbl TEXT NOT NULL, local_id INTEGER NOT NULL,"
+                         " server_id INTEGER NOT NULL, PRIMARY KEY (tbl, local_id))")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _meta(self, key, value=None):
+        db = self._db()
+        if value is None:
+            r = db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+            return r[0] if r else None
+        db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?,?)", (key, str(value)))
+
+    def _save_cursor(self, cursor):
+        safe, seen = cursor
+        self._meta("cursor", json.dumps([safe, sorted(seen)]))
+
+    def _put(self, table, row):
+        cols = list(row)
+        self._db().execute(f"INSERT OR REPLACE INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                           [row[c] for c in cols])
+
+    def _pending_rows(self, table):
+        # rows with queued edits keep their local version until the edit is applied
+        return {r[0] for r in self._db().execute("SELECT row_id FROM outbox WHERE state='pending' AND tbl=?", (table,))}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ----- server -> replica -----
+    def pull(self):
+        """Reload the replica from MySQL, keeping rows that have queued offline edits."""
+        cursor = change_log_cursor()
+        pages = {}
+        for table, repo in REPOS.items():
+            where = [f"status IN ({','.join(['%s'] * len(OPEN_RENTAL_STATUSES))})"] if table == "rentals" else []
+            params = list(OPEN_RENTAL_STATUSES) if table == "rentals" else []
+            rows, before = [], None
+            while True:
+                page = repo.list(where, params, before_id=before, limit=OFFLINE['pull_page'])
+                rows += [r.as_dict() for r in page]
+                if len(page) < OFFLINE['pull_page']:
+                    break
+                before = page[-1].id
+            pages[table] = rows
+        with self._lock:
+            db = self._db()
+            for table, rows in pages.items():
+                keep = self._pending_rows(table)
+                marks = ",".join("?" * len(keep))
+                db.execute(f"DELETE FROM {table}" + (f" WHERE id NOT IN ({marks})" if keep else ""), list(keep))
+                for r in rows:
+                    if r['id'] not in keep:
+                        self._put(table, {k: _plain(v) for k, v in r.items()})
+            self._save_cursor(cursor)
+            self._meta("pulled_at", time.strftime("%Y-%m-%d %H:%M:%S"))
+            db.commit()
+
+    def sync_down(self):
+        """Apply server changes logged since the last pull/sync; re-pulls when too far behind."""
+        with self._lock:
+            since = self._meta("cursor")
+        if since is None:
+            return self.pull()
+        changes = read_changes(_load_cursor(since), OFFLINE_REPLAY_LIMIT, tables=set(REPOS))
+        if changes is None:
+            return self.pull()
+        log, cursor = changes
+        changed = {}
+        for e in log:
+            if e['table_name'] in REPOS:
+                changed.setdefault(e['table_name'], set()).add(int(e['row_id']))
+        fresh = {t: {r.id: r.as_dict() for r in REPOS[t].get_many(ids)} for t, ids in changed.items()}
+        with self._lock:
+            db = self._db()
+            for table, ids in changed.items():
+                keep = self._pending_rows(table)
+                for rid in ids - keep:
+                    r = fresh[table].get(rid)
+                    if r is None or (table == "rentals" and r['status'] not in OPEN_RENTAL_STATUSES):
+                        db.execute(f"DELETE FROM {table} WHERE id=?", (rid,))
+                        if table == "vehicles":
+                            db.execute("DELETE FROM rentals WHERE vehicle_id=?", (rid,))   # cascaded on the server
+                        elif table == "customers":
+                            db.execute("DELETE FROM rentals WHERE customer_id=?", (rid,))
+                    else:
+                        self._put(table, {k: _plain(v) for k, v in r.items()})
+            self._save_cursor(cursor)
+            db.commit()
+
+    # ----- local reads -----
+    def get(self, table, row_id):
+        with self._lock:
+            r = self._db().execute(f"SELECT * FROM {table} WHERE id=?", (int(row_id),)).fetchone()
+        return dict(r) if r else None
+
+    def grid_rows(self, table, limit):
+        """Newest rows shaped like the online grid queries (rentals joined, amounts priced)."""
+        if table == "rentals":
+            sql = ("SELECT r.*, v.reg_no, v.rate_per_day, c.name AS customer_name,"
+                   " COALESCE(r.amount, v.rate_per_day * MAX(1, CAST(julianday(COALESCE(r.expected_return_date, r.start_date))"
+                   " - julianday(r.start_date) AS INTEGER) + 1)) AS computed_amount"
+                   " FROM rentals r LEFT JOIN vehicles v ON v.id = r.vehicle_id LEFT JOIN customers c ON c.id = r.customer_id"
+                   " ORDER BY r.id < 0 DESC, r.id DESC LIMIT ?")
+        else:
+            sql = f"SELECT * FROM {table} ORDER BY id < 0 DESC, id DESC LIMIT ?"
+        with self._lock:
+            return [dict(r) for r in self._db().execute(sql, (int(limit),))]
+
+    def count(self, table):
+        with self._lock:
+            return self._db().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    # ----- write queue -----
+    def enqueue(self, table, op, row_id=None, values=None):
+        """Queue an insert/update/delete (values = column tuple without id) and apply it locally.
+
+        Returns the row id the local copy uses (negative for offline inserts).
+        """
+        cols = REPOS[table].record.__slots__
+        with self._lock:
+            db = self._db()
+            base = self.get(table, row_id) if row_id is not None else None
+            if op == "insert":
+                row_id = min(0, db.execute(f"SELECT COALESCE(MIN(id), 0) FROM {table}").fetchone()[0]) - 1
+            elif base is None:
+                raise KeyError(f"{table} #{row_id} is not in the offline copy")
+            if op == "delete":
+                db.execute(f"DELETE FROM {table} WHERE id=?", (row_id,))
+            else:
+                self._put(table, _row(cols, (row_id,) + tuple(values)))
+                if table == "rentals" and op == "insert" and values[5] == "ongoing":
+                    db.execute("UPDATE vehicles SET status='rented' WHERE id=?", (values[0],))
+            db.execute("INSERT INTO outbox (created_at, tbl, op, row_id, payload, base) VALUES (?,?,?,?,?,?)",
+                       (time.strftime("%Y-%m-%d %H:%M:%S"), table, op, row_id,
+                        json.dumps([_plain(v) for v in values]) if values is not None else None,
+                        json.dumps(base) if base is not None else None))
+            db.commit()
+        return row_id
+
+    def _server_id(self, table, row_id):
+        if row_id is None or row_id > 0:
+            return row_id
+        r = self._db().execute("SELECT server_id FROM id_map WHERE tbl=? AND local_id=?", (table, row_id)).fetchone()
+        if r is None:
+            raise SyncConflict(f"depends on {table} #{row_id}, which has not been synced")
+        return r[0]
+
+    def _apply(self, op):
+        table, repo = op['tbl'], REPOS[op['tbl']]
+        values = json.loads(op['payload']) if op['payload'] else None
+        if values is not None and table == "rentals":
+            values[0] = self._server_id("vehicles", values[0])
+            values[1] = self._server_id("customers", values[1])
+        if op['op'] == "insert":
+            return rentals.book(*values) if table == "rentals" else repo.insert(values)
+        row_id = self._server_id(table, op['row_id'])
+        cols = repo.record.__slots__
+        base = json.loads(op['base']) if op['base'] else None
+        with transaction(dictionary=True) as cur:
+            cur.execute(repo.select_sql() + " WHERE id=%s FOR UPDATE", (row_id,))
+            current = cur.fetchone()
+            if current is None:
+                raise SyncConflict(f"{table} #{row_id} was deleted on the server")
+            if base is not None and _row(cols, [current[c] for c in cols]) != dict(base, id=row_id):
+                raise SyncConflict(f"{table} #{row_id} was changed on the server after it was edited offline",
+                                   forceable=True)
+            if op['op'] == "update":
+                repo.update(row_id, values, cur)
+            else:
+                # the repository's delete, inside the locked check: cascades and frees vehicles as online
+                repo.delete_many([row_id], cur)
+        if op['op'] == "delete" or table == "rentals":
+            vehicle_cache.invalidate()      # vehicles it freed or took are not known here
+        elif table == "vehicles":
+            vehicle_cache.invalidate(row_id)
+        return row_id
+
+    def flush(self, limit=None):
+        """Replay queued writes to MySQL in order; returns {'applied', 'conflicts', 'pending'}.
+
+        Stops at the first connection error, leaving the rest queued.
+        """
+        applied = conflicts = 0
+        with self._lock:
+            ops = [dict(r) for r in self._db().execute("SELECT * FROM outbox WHERE state='pending' ORDER BY id LIMIT ?",
+                                                      (int(limit or OFFLINE['batch_ops']),))]
+        for op in ops:
+            try:
+                server_id = self._apply(op)
+            except Exception as e:
+                if is_connection_error(e):
+                    raise
+                if not isinstance(e, (SyncConflict, BookingError, mysql.connector.errors.Error)):
+                    raise
+                # only a lost conflict check can be forced; the rest would just fail again
+                state = "conflict" if getattr(e, "forceable", False) else "rejected"
+                with self._lock:
+                    self._db().execute("UPDATE outbox SET state=?, error=? WHERE id=?", (state, str(e), op['id']))
+                    self._db().commit()
+                conflicts += 1
+                continue
+            with self._lock:
+                db = self._db()
+                if op['op'] == "insert":
+                    local = op['row_id']
+                    db.execute("INSERT OR REPLACE INTO id_map (tbl, local_id, server_id) VALUES (?,?,?)",
+                               (op['tbl'], local, server_id))
+                    db.execute(f"DELETE FROM {op['tbl']} WHERE id=?", (server_id,))    # already mirrored by sync_down
+                    db.execute(f"UPDATE {op['tbl']} SET id=? WHERE id=?", (server_id, local))
+                    fk = {'vehicles': "vehicle_id", 'customers': "customer_id"}.get(op['tbl'])
+                    if fk:
+                        db.execute(f"UPDATE rentals SET {fk}=? WHERE {fk}=?", (server_id, local))
+                    db.execute("UPDATE outbox SET row_id=? WHERE tbl=? AND row_id=? AND state='pending'",
+                               (server_id, op['tbl'], local))
+                db.execute("UPDATE outbox SET state='done' WHERE id=?", (op['id'],))
+                db.commit()
+            applied += 1
+        return {'applied': applied, 'conflicts': conflicts, 'pending': self.pending_count()}
+
+    def pending_count(self):
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM outbox WHERE state='pending'").fetchone()[0]
+
+    def conflicts(self):
+        with self._lock:
+            return [dict(r) for r in self._db().execute("SELECT * FROM outbox WHERE state IN ('conflict','rejected')"
+                                                        " ORDER BY id")]
+
+    def resolve(self, op_id, action="discard"):
+        """'discard' drops a conflicted or rejected operation (the server version wins on the
+        next pull); 'force' requeues a conflicted one without the conflict check."""
+        with self._lock:
+            db = self._db()
+            if action == "force":
+                db.execute("UPDATE outbox SET state='pending', base=NULL, error=NULL WHERE id=? AND state='conflict'", (op_id,))
+            else:
+                db.execute("UPDATE outbox SET state='discarded' WHERE id=? AND state IN ('conflict','rejected')", (op_id,))
+                db.execute("DELETE FROM meta WHERE key='cursor'")     # next sync re-pulls the server version
+            db.commit()
+
+    def sync(self):
+        """flush() then sync_down(); raises on a connection error. Returns the status dict."""
+        report = self.flush() if self.pending_count() else {'applied': 0, 'conflicts': 0, 'pending': 0}
+        self.sync_down()
+        report['conflicted'] = len(self.conflicts())
+        return report
+
+offline = OfflineStore()
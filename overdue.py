@@ -0,0 +1,85 @@
+# overdue.py
+"""Overdue scheduler: accrue late fees on ongoing rentals past their expected return.
+
+Each pass finds ongoing rentals with expected_return_date before today
+(idx_rentals_status_expected) and, ``batch_rows`` rentals at a time, sets
+overdue_days and late_fee with one joined UPDATE per batch, priced by the
+same rules as billing.bill_rental(). Rows whose figures have not changed
+since the last pass are not rewritten, so a pass costs one small UPDATE per
+batch of newly overdue rentals, and change_log / the dashboard summaries
+only see rentals whose fee actually moved. Passes are idempotent: several
+counters running the scheduler at once just repeat each other's work.
+
+The app runs a pass every OVERDUE['interval'] seconds; on a server, run it
+without the GUI:
+
+    python overdue.py [--once] [--interval 300]
+"""
+import argparse
+import json
+import threading
+from datetime import date
+
+from billing import late_fee_sql, overdue_days_sql
+from db import db_query, transaction
+
+OVERDUE = dict(
+    interval=300,         # seconds between passes (in the app and the standalone worker)
+    batch_rows=1000       # rentals updated per transaction
+)
+
+_OVERDUE_IDS_SQL = ("SELECT id FROM rentals WHERE status='ongoing' AND expected_return_date < %s"
+                    " AND id > %s ORDER BY id LIMIT %s")
+
+def _accrue_batch(ids, today):
+    marks = ",".join(["%s"] * len(ids))
+    days, fee = overdue_days_sql("%s"), late_fee_sql("%s")
+    with transaction() as cur:
+        cur.execute(f"UPDATE rentals r JOIN vehicles v ON v.id = r.vehicle_id"
+                    f" SET r.overdue_days = {days}, r.late_fee = {fee}"
+                    f" WHERE r.id IN ({marks}) AND r.status = 'ongoing'"
+                    f" AND (r.overdue_days <> {days} OR r.late_fee <> {fee})",
+                    [today, today] + ids + [today, today])
+        return cur.rowcount
+
+def accrue_late_fees(today=None, batch_rows=None, progress=None):
+    """One pass over overdue rentals; returns {'overdue': rentals, 'updated': rows changed, 'batches': n}."""
+    today = (today or date.today()).isoformat()
+    batch_rows = batch_rows or OVERDUE['batch_rows']
+    after, overdue, updated, batches = 0, 0, 0, 0
+    while True:
+        ids = [r['id'] for r in db_query(_OVERDUE_IDS_SQL, (today, after, int(batch_rows)), primary=True)]
+        if not ids:
+            break
+        updated += _accrue_batch(ids, today)
+        overdue += len(ids)
+        batches += 1
+        after = ids[-1]
+        if progress:
+            progress(overdue, updated)
+    return {'overdue': overdue, 'updated': updated, 'batches': batches}
+
+def run_worker(interval=None, stop=None, report=None):
+    """Run a pass every ``interval`` seconds until ``stop`` (a threading.Event) is set."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            result = accrue_late_fees()
+        except Exception as e:      # server away: try again next interval
+            result = {'error': str(e)}
+        if report:
+            report(result)
+        stop.wait(interval or OVERDUE['interval'])
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--once", action="store_true", help="run a single pass and exit")
+    ap.add_argument("--interval", type=float, default=OVERDUE['interval'], help="seconds between passes")
+    args = ap.parse_args()
+    if args.once:
+        print(json.dumps(accrue_late_fees()))
+    else:
+        try:
+            run_worker(args.interval, report=lambda r: print(json.dumps(r), flush=True))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,1116 @@
+# repository.py
+"""Headless data-access layer: typed records and per-table repositories.
+
+Everything the desktop app does to the database goes through here, so the
+same code can be driven from the CLI, background workers and benchmarks
+without starting Tk. Methods raise on failure (ValidationError,
+BookingError or mysql.connector errors).
+"""
+import csv
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import mysql.connector
+
+from db import add_write_hook, db_execute, db_query, db_query_prepared, get_pool, transaction
+
+#############################################
+#              RECORDS
+#############################################
+class Record:
+    """Base row object: one slot per column, no per-instance __dict__."""
+    __slots__ = ()
+
+    def __init__(self, *values, **named):
+        slots = self.__slots__
+        for name, value in zip(slots, values):
+            setattr(self, name, value)
+        for name in slots[len(values):]:
+            setattr(self, name, named.get(name))
+
+    @classmethod
+    def from_dict(cls, row):
+        return cls(*(row.get(c) for c in cls.__slots__))
+
+    def as_dict(self):
+        return {c: getattr(self, c) for c in self.__slots__}
+
+    def as_tuple(self):
+        return tuple(getattr(self, c) for c in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_tuple() == other.as_tuple()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{c}={getattr(self, c)!r}' for c in self.__slots__)})"
+
+class Vehicle(Record):
+    __slots__ = ("id", "reg_no", "make", "model", "year", "rate_per_day", "status")
+
+class Customer(Record):
+    __slots__ = ("id", "name", "phone", "email")
+
+class Rental(Record):
+    __slots__ = ("id", "vehicle_id", "customer_id", "start_date", "expected_return_date",
+                 "actual_return_date", "status", "amount")
+
+#############################################
+#              RENTALS GRID QUERY
+#############################################
+# billable days of rental r in SQL, as billing.bill_rental() counts them: inclusive,
+# at least one, and one without a start date (where DATEDIFF, and so GREATEST, is NULL)
+RENTAL_DAYS_SQL = ("COALESCE(GREATEST(1, DATEDIFF(COALESCE(r.expected_return_date, r.start_date), r.start_date) + 1),"
+                   " 1)")
+
+# one round trip for the whole grid: vehicle/customer labels come from the JOIN
+# and a missing amount is priced in SQL as rate * RENTAL_DAYS_SQL
+RENTALS_GRID_SQL = f"""
+    SELECT r.id, r.vehicle_id, r.customer_id, r.start_date, r.expected_return_date,
+           r.actual_return_date, r.status, r.amount,
+           v.reg_no, v.rate_per_day, c.name AS customer_name,
+           COALESCE(r.amount,
+                    v.rate_per_day * {RENTAL_DAYS_SQL}
+           ) AS computed_amount
+    FROM rentals r
+    LEFT JOIN vehicles v ON v.id = r.vehicle_id
+    LEFT JOIN customers c ON c.id = r.customer_id
+"""
+
+# "Include history": the same queries over hot and archived rentals (archive.py).
+# Much slower than the hot table alone, so only used when asked for.
+_RENTAL_COLUMNS = ("id, vehicle_id, customer_id, start_date, expected_return_date, actual_return_date,"
+                   " status, amount, overdue_days, late_fee")
+RENTALS_HISTORY_SOURCE = (f"(SELECT {_RENTAL_COLUMNS} FROM rentals"
+                          f" UNION ALL SELECT {_RENTAL_COLUMNS} FROM rentals_archive)")
+
+def with_history(sql):
+    """``sql`` reading ``FROM rentals r`` rewritten to read hot and archived rentals."""
+    return sql.replace("FROM rentals r", f"FROM {RENTALS_HISTORY_SOURCE} r", 1)
+
+#############################################
+#              BOOKING OVERLAP
+#############################################
+# A rental holds its vehicle from start_date through expected_return_date
+# while it is ongoing or reserved; an overdue ongoing rental holds it until
+# it is returned, and one without an expected return date (never overdue)
+# from its start on. Params: (range_end, range_start), unless the range is
+# given as SQL expressions. Served by idx_rentals_availability (migration 005).
+def rental_overlap_sql(vehicle_col, range_end="%s", range_start="%s"):
+    return (f"r.vehicle_id = {vehicle_col} AND r.status IN ('ongoing','reserved') AND r.start_date <= {range_end}"
+            f" AND (r.expected_return_date IS NULL OR r.expected_return_date >= {range_start}"
+            " OR (r.status = 'ongoing' AND r.expected_return_date < CURDATE()))")
+
+#############################################
+#              REPOSITORIES
+#############################################
+def _id_list(ids):
+    """(int ids, "(%s,...)" placeholders) for an IN clause."""
+    ids = [int(i) for i in ids]
+    return ids, "(" + ",".join(["%s"] * len(ids)) + ")"
+
+def _free_vehicles(cur, where, params):
+    """Inside a transaction: mark available the vehicles of the ongoing rentals matching ``where``."""
+    cur.execute(f"SELECT DISTINCT vehicle_id FROM rentals WHERE ({where}) AND status='ongoing' FOR UPDATE", params)
+    vids = [r['vehicle_id'] if isinstance(r, dict) else r[0] for r in cur.fetchall()]
+    if vids:
+        cur.execute("UPDATE vehicles SET status='available' WHERE id IN " + _id_list(vids)[1], vids)
+    return vids
+
+class Repository:
+    """CRUD and keyset listing for one table, returning ``record`` objects.
+
+    Point lookups go through cached server-side prepared statements; bulk
+    writes use executemany. ``where``/``params`` arguments take the
+    condition lists built by the *_filter helpers below.
+    """
+    table = ""
+    record = Record
+
+    @classmethod
+    def _columns(cls):
+        return cls.record.__slots__
+
+    @classmethod
+    def select_sql(cls):
+        return f"SELECT {', '.join(cls._columns())} FROM {cls.table}"
+
+    @classmethod
+    def insert_sql(cls):
+        cols = cls._columns()[1:]       # id is AUTO_INCREMENT
+        return f"INSERT INTO {cls.table} ({','.join(cols)}) VALUES ({','.join(['%s'] * len(cols))})"
+
+    @classmethod
+    def update_sql(cls):
+        return f"UPDATE {cls.table} SET {','.join(c + '=%s' for c in cls._columns()[1:])} WHERE id=%s"
+
+    @staticmethod
+    def _where(where):
+        return (" WHERE " + " AND ".join(f"({c})" for c in where)) if where else ""
+
+    def get(self, record_id, primary=False):
+        """One row or None; ``primary`` skips the replicas (e.g. before editing the row)."""
+        rows = db_query_prepared(self.select_sql() + " WHERE id=%s", (int(record_id),), primary=primary)
+        return self.record(*rows[0]) if rows else None
+
+    def get_many(self, ids):
+        ids = [int(i) for i in ids]
+        if not ids:
+            return []
+        rows = db_query(self.select_sql() + f" WHERE id IN ({','.join(['%s'] * len(ids))})", ids, dictionary=False)
+        return [self.record(*r) for r in rows]
+
+    def list(self, where=(), params=(), before_id=None, limit=None):
+        """Rows ordered by id DESC; pass the last id seen as ``before_id`` for the next page."""
+        where = list(where); params = list(params)
+        if before_id is not None:
+            where.append("id < %s"); params.append(int(before_id))
+        sql = self.select_sql() + self._where(where) + " ORDER BY id DESC"
+        if limit is not None:
+            sql += " LIMIT %s"; params.append(int(limit))
+        return [self.record(*r) for r in db_query(sql, params, dictionary=False)]
+
+    def count(self, where=(), params=()):
+        return int(db_query(f"SELECT COUNT(*) FROM {self.table}" + self._where(where), params, dictionary=False)[0][0])
+
+    def insert(self, values):
+        """Insert one row from a column tuple (without id); returns the new id."""
+        return db_execute(self.insert_sql(), tuple(values))[1]
+
+    def insert_many(self, rows, cur=None):
+        """executemany the column tuples, in ``cur``'s transaction if given; returns rows inserted."""
+        rows = [tuple(r) for r in rows]
+        if not rows:
+            return 0
+        if cur is not None:
+            cur.executemany(self.insert_sql(), rows)
+            return len(rows)
+        return db_execute(self.insert_sql(), rows, many=True)[0]
+
+    def update(self, record_id, values, cur=None):
+        """Update one row from a column tuple (without id), in ``cur``'s transaction if given."""
+        params = tuple(values) + (int(record_id),)
+        if cur is not None:
+            cur.execute(self.update_sql(), params)
+            return cur.rowcount
+        return db_execute(self.update_sql(), params)[0]
+
+    def delete(self, record_id):
+        return db_execute(f"DELETE FROM {self.table} WHERE id=%s", (int(record_id),))[0]
+
+class VehicleRepository(Repository):
+    table = "vehicles"
+    record = Vehicle
+
+    def set_status(self, ids, status):
+        ids, marks = _id_list(ids)
+        if not ids:
+            return 0
+        if status not in VEHICLE_STATUSES:
+            raise ValidationError(f"Unknown vehicle status {status!r}.")
+        return db_execute(f"UPDATE vehicles SET status=%s WHERE id IN {marks}", [status] + ids)[0]
+
+    def delete(self, vehicle_id):
+        return self.delete_many([vehicle_id])
+
+    def delete_many(self, vehicle_ids, cur=None):
+        """Delete vehicles and their rentals in one transaction; returns vehicles deleted.
+
+        With ``cur`` the deletes join the caller's transaction, and the caller
+        invalidates vehicle_cache once it commits.
+        """
+        ids, marks = _id_list(vehicle_ids)
+        if not ids:
+            return 0
+        if cur is None:
+            with transaction() as cur:
+                n = self.delete_many(ids, cur)
+            for vid in ids:
+                vehicle_cache.invalidate(vid)
+            return n
+        # rentals are deleted explicitly: ON DELETE CASCADE does not fire the change_log/summary triggers
+        cur.execute(f"DELETE FROM rentals WHERE vehicle_id IN {marks}", ids)
+        cur.execute(f"DELETE FROM vehicles WHERE id IN {marks}", ids)
+        return cur.rowcount
+
+class CustomerRepository(Repository):
+    table = "customers"
+    record = Customer
+
+    def delete(self, customer_id):
+        return self.delete_many([customer_id])
+
+    def delete_many(self, customer_ids, cur=None):
+        """Delete customers and their rentals in one transaction, freeing vehicles they had out.
+
+        With ``cur`` the deletes join the caller's transaction, and the caller
+        invalidates vehicle_cache once it commits.
+        """
+        ids, marks = _id_list(customer_ids)
+        if not ids:
+            return 0
+        if cur is not None:
+            return self._delete(cur, ids, marks)[0]
+        with transaction() as cur:
+            n, freed = self._delete(cur, ids, marks)
+        for vid in freed:
+            vehicle_cache.invalidate(vid)
+        return n
+
+    @staticmethod
+    def _delete(cur, ids, marks):
+        freed = _free_vehicles(cur, f"customer_id IN {marks}", ids)
+        cur.execute(f"DELETE FROM rentals WHERE customer_id IN {marks}", ids)
+        cur.execute(f"DELETE FROM customers WHERE id IN {marks}", ids)
+        return cur.rowcount, freed
+
+BOOKING_RETRIES = 3      # attempts when InnoDB picks the booking as a deadlock victim / lock wait times out
+BOOKING_RETRY_ERRNOS = (1213, 1205)     # deadlock, lock wait timeout: the transaction was rolled back
+
+class BookingError(Exception):
+    """A booking rejected by a business rule (unknown or unavailable vehicle)."""
+
+# the booking transaction's statements, shared with the asyncio service (async_service.py)
+BOOKING_LOCK_SQL = "SELECT status, rate_per_day FROM vehicles WHERE id=%s FOR UPDATE"
+BOOKING_CLASH_SQL = f"SELECT r.id FROM rentals r WHERE {rental_overlap_sql('%s')} LIMIT 1"
+BOOKING_RECLASH_SQL = f"SELECT r.id FROM rentals r WHERE {rental_overlap_sql('%s')} AND r.id <> %s LIMIT 1"   # edits
+BOOKING_RENTED_SQL = "UPDATE vehicles SET status='rented' WHERE id=%s"
+
+def _retry_booking(attempt):
+    """Run ``attempt()`` (one whole transaction), again when InnoDB rolled it back as a deadlock victim."""
+    for n in range(1, BOOKING_RETRIES + 1):
+        try:
+            return attempt()
+        except mysql.connector.errors.DatabaseError as e:
+            # the transaction was rolled back, safe to retry
+            if getattr(e, "errno", None) not in BOOKING_RETRY_ERRNOS or n == BOOKING_RETRIES:
+                raise
+
+def check_booking(vehicle, clash, status):
+    """Apply the booking rules to the locked vehicle row and the first clashing rental (dicts or None)."""
+    if not vehicle:
+        raise BookingError("Vehicle not found.")
+    if status == 'ongoing' and vehicle['status'] != 'available':
+        raise BookingError("Vehicle is not available.")
+    if clash:
+        raise BookingError(f"Vehicle is already booked for those dates (rental #{clash['id']}).")
+
+class RentalRepository(Repository):
+    table = "rentals"
+    record = Rental
+
+    # one round trip for the whole grid: vehicle/customer labels come from the JOIN
+    # and a missing amount is priced in SQL as rate * inclusive days (min 1)
+    GRID_SQL = RENTALS_GRID_SQL
+
+    def book(self, vehicle_id, customer_id, start_date, expected_date, actual_date=None, status="ongoing", amount=None):
+        """Insert a rental and, when it is ongoing, mark the vehicle rented - atomically.
+
+        The vehicle row is locked with SELECT ... FOR UPDATE, so two counters
+        booking the same car serialize and the second sees it as rented.
+        Ongoing and reserved rentals are also refused when they overlap
+        another booking of the same vehicle. Returns the new rental id;
+        raises BookingError on a rule violation.
+        """
+        def attempt():
+            with transaction(dictionary=True) as cur:
+                cur.execute(BOOKING_LOCK_SQL, (vehicle_id,))
+                v = cur.fetchone()
+                clash = None
+                if v and status in ('ongoing', 'reserved'):
+                    cur.execute(BOOKING_CLASH_SQL, (vehicle_id, expected_date or start_date, start_date))
+                    clash = cur.fetchone()
+                check_booking(v, clash, status)
+                cur.execute(self.insert_sql(), (vehicle_id, customer_id, start_date, expected_date, actual_date, status, amount))
+                rental_id = cur.lastrowid
+                if status == 'ongoing':
+                    cur.execute(BOOKING_RENTED_SQL, (vehicle_id,))
+            return rental_id
+        rental_id = _retry_booking(attempt)
+        vehicle_cache.invalidate(vehicle_id)
+        return rental_id
+
+    def update(self, rental_id, values, cur=None):
+        """Save an edited rental under the booking rules; returns rows changed.
+
+        ``values`` are the column tuple (without id). The rental and its old
+        and new vehicles are locked like book() does, the new dates must not
+        overlap another booking, and a rental that newly takes a vehicle
+        needs it available. Vehicle statuses follow the rental. Raises
+        BookingError on a rule violation. With ``cur`` it runs in the
+        caller's (dictionary) transaction, and the caller invalidates
+        vehicle_cache once it commits.
+        """
+        if cur is not None:
+            return self._update(cur, int(rental_id), tuple(values))[0]
+        def attempt():
+            with transaction(dictionary=True) as cur:
+                return self._update(cur, int(rental_id), tuple(values))
+        n, vids = _retry_booking(attempt)
+        for vid in vids:
+            vehicle_cache.invalidate(vid)
+        return n
+
+    def _update(self, cur, rental_id, values):
+        vehicle_id, start_date, expected_date, status = int(values[0]), values[2], values[3], values[5]
+        cur.execute("SELECT vehicle_id, status FROM rentals WHERE id=%s FOR UPDATE", (rental_id,))
+        old = cur.fetchone()
+        if old is None:
+            return 0, []
+        vids, marks = _id_list(sorted({old['vehicle_id'], vehicle_id}))
+        # in id order, so two edits swapping vehicles cannot deadlock on each other
+        cur.execute(f"SELECT id, status FROM vehicles WHERE id IN {marks} ORDER BY id FOR UPDATE", vids)
+        v = next((r for r in cur.fetchall() if r['id'] == vehicle_id), None)
+        clash = None
+        if v and status in ('ongoing', 'reserved'):
+            cur.execute(BOOKING_RECLASH_SQL, (vehicle_id, expected_date or start_date, start_date, rental_id))
+            clash = cur.fetchone()
+        # an ongoing rental keeping its vehicle already holds it: only a new hold needs it available
+        takes = status == 'ongoing' and (old['status'] != 'ongoing' or old['vehicle_id'] != vehicle_id)
+        check_booking(v, clash, status if takes else None)
+        cur.execute(self.update_sql(), values + (rental_id,))
+        n = cur.rowcount
+        if old['status'] == 'ongoing' and (status != 'ongoing' or old['vehicle_id'] != vehicle_id):
+            cur.execute("UPDATE vehicles SET status='available' WHERE id=%s", (old['vehicle_id'],))
+        if takes:
+            cur.execute(BOOKING_RENTED_SQL, (vehicle_id,))
+        return n, vids
+
+    def delete(self, rental_id):
+        """Delete a rental, freeing its vehicle if it was ongoing."""
+        return self.delete_many([rental_id])
+
+    def delete_many(self, rental_ids, cur=None):
+        """Delete rentals in one transaction, freeing the vehicles of ongoing ones; returns rows deleted.
+
+        With ``cur`` the deletes join the caller's transaction, and the caller
+        invalidates vehicle_cache once it commits.
+        """
+        ids, marks = _id_list(rental_ids)
+        if not ids:
+            return 0
+        if cur is not None:
+            return self._delete(cur, ids, marks)[0]
+        with transaction() as cur:
+            n, freed = self._delete(cur, ids, marks)
+        for vid in freed:
+            vehicle_cache.invalidate(vid)
+        return n
+
+    @staticmethod
+    def _delete(cur, ids, marks):
+        freed = _free_vehicles(cur, f"id IN {marks}", ids)
+        cur.execute(f"DELETE FROM rentals WHERE id IN {marks}", ids)
+        return cur.rowcount, freed
+
+    def archived(self, rental_ids):
+        """Those of ``rental_ids`` that are archived history (rentals_archive, read-only)."""
+        ids, marks = _id_list(rental_ids)
+        if not ids:
+            return []
+        return [r[0] for r in db_query(f"SELECT id FROM rentals_archive WHERE id IN {marks} ORDER BY id", ids,
+                                       dictionary=False)]
+
+    def mark_returned(self, rental_ids, actual_date=None):
+        """Return ongoing rentals as of ``actual_date`` (ISO, default today) in one transaction.
+
+        Sets actual_return_date and status, prices a missing amount as rate *
+        inclusive days, charges overdue days at the billing.LATE_FEE rules
+        and frees the vehicles. Rentals that are not ongoing are left alone.
+        Returns {'returned': rentals, 'vehicles': vehicles freed}.
+        """
+        from billing import late_fee_sql, overdue_days_sql    # billing imports this module
+        ids, marks = _id_list(rental_ids)
+        actual_date = actual_date or datetime.now().strftime("%Y-%m-%d")
+        if not ids:
+            return {'returned': 0, 'vehicles': 0}
+        with transaction() as cur:
+            freed = _free_vehicles(cur, f"id IN {marks}", ids)
+            cur.execute("UPDATE rentals r JOIN vehicles v ON v.id = r.vehicle_id"
+                        " SET r.actual_return_date = %s, r.status = 'returned',"
+                        f" r.amount = COALESCE(r.amount, ROUND(v.rate_per_day * {RENTAL_DAYS_SQL}, 2)),"
+                        f" r.overdue_days = {overdue_days_sql('%s')}, r.late_fee = {late_fee_sql('%s')}"
+                        f" WHERE r.id IN {marks} AND r.status = 'ongoing'",
+                        [actual_date, actual_date, actual_date] + ids)
+            n = cur.rowcount
+        for vid in freed:
+            vehicle_cache.invalidate(vid)
+        return {'returned': n, 'vehicles': len(freed)}
+
+    def set_status(self, rental_ids, status):
+        """Move rentals to ``status`` in one transaction, keeping vehicle status in step.
+
+        'returned' goes through mark_returned() (today). Going ongoing needs
+        every vehicle available; leaving ongoing frees it. Raises
+        BookingError, rolling everything back, if the new open rentals would
+        overlap other bookings. Returns rentals changed.
+        """
+        if status == 'returned':
+            return self.mark_returned(rental_ids)['returned']
+        if status not in RENTAL_STATUSES:
+            raise ValidationError(f"Unknown rental status {status!r}.")
+        ids, marks = _id_list(rental_ids)
+        if not ids:
+            return 0
+        with transaction(dictionary=True) as cur:
+            cur.execute("SELECT r.id, r.vehicle_id, r.status, v.status AS vehicle_status FROM rentals r"
+                        f" JOIN vehicles v ON v.id = r.vehicle_id WHERE r.id IN {marks} FOR UPDATE", ids)
+            moving = [r for r in cur.fetchall() if r['status'] != status]
+            touched = sorted({r['vehicle_id'] for r in moving})
+            if status == 'ongoing':
+                vids = [r['vehicle_id'] for r in moving]
+                busy = [r['id'] for r in moving if r['vehicle_status'] != 'available' or vids.count(r['vehicle_id']) > 1]
+                if busy:
+                    raise BookingError("Vehicle is not available for rental(s) " + ", ".join(f"#{i}" for i in busy) + ".")
+                new_vehicle_status = 'rented'
+            else:
+                vids = [r['vehicle_id'] for r in moving if r['status'] == 'ongoing']
+                new_vehicle_status = 'available'
+            if vids:
+                vids, vmarks = _id_list(set(vids))
+                cur.execute(f"UPDATE vehicles SET status=%s WHERE id IN {vmarks}", [new_vehicle_status] + vids)
+            moved, mmarks = _id_list(r['id'] for r in moving)
+            n = 0
+            if moved:
+                cur.execute(f"UPDATE rentals SET status=%s WHERE id IN {mmarks}", [status] + moved)
+                n = cur.rowcount
+                # checked after the update so clashes between the selected rentals count too;
+                # the booking overlap rules, overdue ongoing rentals included
+                overlap = rental_overlap_sql("m.vehicle_id", "COALESCE(m.expected_return_date, m.start_date)", "m.start_date")
+                cur.execute(f"SELECT m.id FROM rentals m JOIN rentals r ON r.id <> m.id AND {overlap}"
+                            f" WHERE m.id IN {mmarks} LIMIT 1", moved)
+                clash = cur.fetchone()
+                if clash:
+                    raise BookingError(f"Rental #{clash['id']} would overlap another booking of its vehicle.")
+        for vid in touched:
+            vehicle_cache.invalidate(vid)
+        return n
+
+vehicles = VehicleRepository()
+customers = CustomerRepository()
+rentals = RentalRepository()
+
+def book_rental(*args, **kwargs):
+    return rentals.book(*args, **kwargs)
+
+#############################################
+#              ADMIN LOGIN
+#############################################
+def verify_admin(username, password):
+    """Plain-text login (NO HASHING)."""
+    r = db_query("SELECT password FROM admins WHERE username=%s", (username,))
+    if not r:
+        return False, "User not found"
+    return (r[0]['password'] == password), ("OK" if r[0]['password'] == password else "Incorrect password")
+
+#############################################
+#              VEHICLE CACHE
+#############################################
+# vehicle row cache tuning
+VEHICLE_CACHE = dict(
+    max_size=1024,        # vehicles kept (least recently used evicted first)
+    ttl=30                # seconds before a cached row is re-read
+)
+
+class VehicleCache:
+    """Read-through LRU cache of vehicle rows with a TTL.
+
+    Writes through the repositories (and any db_execute touching
+    ``vehicles``) invalidate entries, so local edits are visible
+    immediately; the TTL bounds staleness for edits made from other counters.
+    """
+    def __init__(self, fetch, max_size=1024, ttl=30):
+        self.fetch = fetch                # vehicle_id -> row dict or None
+        self.max_size = max(1, int(max_size))
+        self.ttl = ttl
+        self._rows = OrderedDict()        # id -> (expires_at, row), oldest use first
+        self._lock = threading.Lock()
+        self._generation = 0              # bumped by invalidate(); a fetch that spans one isn't stored
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, vehicle_id):
+        try:
+            vehicle_id = int(vehicle_id)
+        except (TypeError, ValueError):
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._rows.get(vehicle_id)
+            if entry and entry[0] > now:
+                self._rows.move_to_end(vehicle_id)
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+            generation = self._generation
+        row = self.fetch(vehicle_id)
+        if row is None:
+            return None         # not cached, so a vehicle added later is found on the next lookup
+        with self._lock:
+            if generation != self._generation:
+                return dict(row)    # invalidated while fetching: the row may predate that write
+            self._rows[vehicle_id] = (now + self.ttl, dict(row))
+            self._rows.move_to_end(vehicle_id)
+            while len(self._rows) > self.max_size:
+                self._rows.popitem(last=False)
+                self.evictions += 1
+        return dict(row)
+
+    def invalidate(self, vehicle_id=None):
+        with self._lock:
+            self._generation += 1
+            if vehicle_id is None:
+                self._rows.clear()
+            else:
+                try: self._rows.pop(int(vehicle_id), None)
+                except (TypeError, ValueError): pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._rows), 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'hit_rate': (self.hits / lookups) if lookups else 0.0}
+
+def _load_vehicle(vehicle_id):
+    v = vehicles.get(vehicle_id)
+    return v.as_dict() if v else None
+
+vehicle_cache = VehicleCache(_load_vehicle, **VEHICLE_CACHE)
+
+def get_vehicle(vehicle_id):
+    return vehicle_cache.get(vehicle_id)
+
+def get_rate(vehicle_id):
+    v = get_vehicle(vehicle_id)
+    if not v: return None
+    try:
+        return float(v['rate_per_day'])
+    except:
+        return None
+
+_VEHICLES_WRITE = re.compile(r"^\s*(UPDATE|DELETE\s+FROM|INSERT\s+INTO|REPLACE\s+INTO)\s+`?vehicles`?\b", re.I)
+_WHERE_SINGLE_ID = re.compile(r"\bWHERE\s+`?id`?\s*=\s*%s\s*$", re.I)
+
+def _invalidate_after_write(query, params):
+    # keep vehicle_cache write-through: drop the touched row, or everything if we can't tell which
+    m = _VEHICLES_WRITE.match(query)
+    if not m or m.group(1).upper().startswith("INSERT"):
+        return
+    if _WHERE_SINGLE_ID.search(query) and params:
+        vehicle_cache.invalidate(params[-1])
+    else:
+        vehicle_cache.invalidate()
+
+add_write_hook(_invalidate_after_write)
+
+#############################################
+#              RENTAL PRICING
+#############################################
+def rental_days(start_iso, expected_iso=None):
+    """Billable days: inclusive of both ends, at least one."""
+    d1 = datetime.strptime(start_iso, "%Y-%m-%d")
+    d2 = datetime.strptime(expected_iso or start_iso, "%Y-%m-%d")
+    return max(1, (d2 - d1).days + 1)
+
+def quote_amount(vehicle_id, start_text, expected_text=""):
+    """Price a rental like the rental modal: (total, days, rate), or None while inputs are incomplete."""
+    try:
+        vid = int(str(vehicle_id).strip())
+    except (TypeError, ValueError):
+        return None
+    start_text = (start_text or "").strip()
+    if not start_text:
+        return None
+    rate = get_rate(vid)
+    if rate is None:
+        return None
+    try:
+        sd_iso = parse_date_flexible(start_text)
+        ed_iso = parse_date_flexible((expected_text or "").strip() or start_text) or sd_iso
+    except ValueError:
+        return None
+    days = rental_days(sd_iso, ed_iso)
+    return rate * days, days, rate
+
+#############################################
+#              DATES & RECORD VALIDATION
+#############################################
+def parse_date_flexible(s):
+    if not s or not s.strip():
+        return None
+    s = s.strip()
+    fmts = ["%Y-%m-%d", "%d-%m-%Y", "%d-%m-%y", "%Y/%m/%d", "%d/%m/%Y"]
+    for f in fmts:
+        try:
+            dt = datetime.strptime(s, f)
+            return dt.strftime("%Y-%m-%d")
+        except:
+            continue
+    raise ValueError(f"Unrecognized date format: {s!r}. Use YYYY-MM-DD or DD-MM-YYYY.")
+
+# Shared by the modals and bulk import: each takes a mapping of field -> text
+# and returns the column tuple in INSERT order, or raises ValidationError.
+VEHICLE_STATUSES = ("available", "rented")
+RENTAL_STATUSES = ("ongoing", "reserved", "returned")
+
+class ValidationError(ValueError):
+    def __init__(self, message, title="Input Error"):
+        super().__init__(message)
+        self.title = title
+
+def _text(rec, key):
+    v = rec.get(key)
+    return "" if v is None else str(v).strip()
+
+def validate_vehicle(rec):
+    try:
+        year = int(_text(rec, 'year'))
+        rate = float(_text(rec, 'rate_per_day'))
+    except ValueError:
+        raise ValidationError("Please check Year and Rate fields.")
+    status = _text(rec, 'status') or "available"
+    if status not in VEHICLE_STATUSES:
+        raise ValidationError(f"Unknown vehicle status {status!r}.")
+    return (_text(rec, 'reg_no'), _text(rec, 'make'), _text(rec, 'model'), year, rate, status)
+
+def validate_customer(rec):
+    name, phone, email = _text(rec, 'name'), _text(rec, 'phone'), _text(rec, 'email')
+    if not (name and phone and email):
+        raise ValidationError("All fields required")
+    return (name, phone, email)
+
+def validate_rental(rec):
+    vid_text, cid_text = _text(rec, 'vehicle_id'), _text(rec, 'customer_id')
+    if not vid_text or not cid_text:
+        raise ValidationError("Vehicle ID and Customer ID are required.")
+    try:
+        vid = int(vid_text)
+    except ValueError:
+        raise ValidationError("Vehicle ID must be an integer.")
+    try:
+        cid = int(cid_text)
+    except ValueError:
+        raise ValidationError("Customer ID must be an integer.")
+    try:
+        sd_iso = parse_date_flexible(_text(rec, 'start_date'))
+    except ValueError as ve:
+        raise ValidationError(str(ve), "Start Date")
+    if not sd_iso:
+        raise ValidationError("Start date required.")
+    try:
+        ed_iso = parse_date_flexible(_text(rec, 'expected_return_date')) or sd_iso
+    except ValueError as ve:
+        raise ValidationError(str(ve), "Expected Date")
+    try:
+        act_iso = parse_date_flexible(_text(rec, 'actual_return_date'))
+    except ValueError as ve:
+        raise ValidationError(str(ve), "Actual Date")
+    if ed_iso < sd_iso:     # ISO dates compare correctly as strings
+        raise ValidationError("Expected return date cannot be before start date.")
+    status = _text(rec, 'status') or "ongoing"
+    if status not in RENTAL_STATUSES:
+        raise ValidationError(f"Unknown rental status {status!r}.")
+    amount = _text(rec, 'amount')
+    try:
+        amount = float(amount) if amount else None
+    except ValueError:
+        raise ValidationError(f"Invalid amount {amount!r}.")
+    return (vid, cid, sd_iso, ed_iso, act_iso, status, amount)
+
+#############################################
+#              SEARCH FILTERS
+#############################################
+# Each builder returns (where, params) for Repository.list/count (and the UI's
+# PagedTree.set_filter). Text terms use index-friendly prefix LIKEs or the
+# FULLTEXT indexes from migration 003.
+FT_MIN_TOKEN = 3         # InnoDB innodb_ft_min_token_size default; shorter words fall back to LIKE
+
+def _words(text):
+    return re.findall(r"\w+", text or "")
+
+def _fulltext(columns, text):
+    """MATCH ... AGAINST condition requiring every word as a prefix, or None if unusable."""
+    words = _words(text)
+    if not words or any(len(w) < FT_MIN_TOKEN for w in words):
+        return None
+    return f"MATCH({columns}) AGAINST (%s IN BOOLEAN MODE)", " ".join(f"+{w}*" for w in words)
+
+def _like_prefix(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def _any_of(column, branches):
+    """``column`` matching any of the ``SELECT ... AS id`` branches.
+
+    A plain OR across different indexes makes MySQL scan the table; the UNION
+    lets each branch use its own index, and the derived table is materialized
+    once and semijoined on ``column``.
+    """
+    return f"{column} IN (SELECT id FROM ({' UNION '.join(branches)}) AS matches)"
+
+def _text_branches(table, like_cols, ft_cols, text, select="id", join="", fallback_cols=None):
+    """Branches for ``_any_of``: a prefix LIKE per ``like_cols`` column, then FULLTEXT
+    on ``ft_cols`` or, when the words are too short, a LIKE per ``fallback_cols``
+    column (default: the ``ft_cols`` columns)."""
+    branches, params = [], []
+    conds = [(f"{c} LIKE %s", _like_prefix(text)) for c in like_cols]
+    if ft_cols:
+        ft = _fulltext(ft_cols, text)
+        fallback = fallback_cols or ft_cols.split(", ")
+        conds += [ft] if ft else [(f"{c} LIKE %s", _like_prefix(text)) for c in fallback]
+    for cond, param in conds:
+        alias = "" if select == "id" else " AS id"
+        branches.append(f"SELECT {select}{alias} FROM {table}{join} WHERE {cond}"); params.append(param)
+    return branches, params
+
+def vehicle_filter(text="", status="", free_from=None, free_to=None):
+    """Vehicles by reg_no/make/model and status; with free_from (ISO) only those unbooked through free_to."""
+    where, params = [], []
+    text = (text or "").strip()
+    if text:
+        branches, params = _text_branches("vehicles", ["reg_no"], "make, model", text)
+        where.append(_any_of("id", branches))
+    if status:
+        where.append("status=%s"); params.append(status)
+    if free_from:
+        where.append(f"NOT EXISTS (SELECT 1 FROM rentals r WHERE {rental_overlap_sql('vehicles.id')})")
+        params += [free_to or free_from, free_from]
+    return where, params
+
+def customer_filter(text=""):
+    where, params = [], []
+    text = (text or "").strip()
+    if text:
+        branches, params = _text_branches("customers", ["phone"], "name, email", text)
+        where.append(_any_of("id", branches))
+    return where, params
+
+def rental_filter(text="", status="", date_from=None, date_to=None, include_history=False):
+    """Rentals by id, vehicle reg_no or customer name/phone, status and start-date range.
+
+    Vehicle/customer terms are resolved to rental ids through the
+    rentals.vehicle_id/customer_id indexes, so the grid's COUNT(*) doesn't
+    need the joins. Pass ``include_history`` when the grid reads archived
+    rentals too (RENTALS_HISTORY_SOURCE).
+    """
+    where, params = [], []
+    text = (text or "").strip()
+    if text:
+        branches = []
+        for table in ("rentals", "rentals_archive") if include_history else ("rentals",):
+            b, p = _text_branches("vehicles", ["reg_no"], None, text, "x.id",
+                                  f" v JOIN {table} x ON x.vehicle_id = v.id")
+            branches += b; params += p
+            b, p = _text_branches("customers", ["phone"], "name, email", text, "x.id",
+                                  f" c JOIN {table} x ON x.customer_id = c.id", fallback_cols=["name"])
+            branches += b; params += p
+        if text.isdigit():
+            branches.append("SELECT %s AS id"); params.append(int(text))
+        where.append(_any_of("r.id", branches))
+    if status:
+        where.append("r.status=%s"); params.append(status)
+    if date_from:
+        where.append("r.start_date >= %s"); params.append(date_from)
+    if date_to:
+        where.append("r.start_date <= %s"); params.append(date_to)
+    return where, params
+
+#############################################
+#              BULK IMPORT
+#############################################
+IMPORT_CHUNK_ROWS = 1000     # rows per executemany batch / transaction
+
+IMPORT_SPECS = {
+    # table: (validator, repository whose insert columns match the validator's tuple)
+    'vehicles': (validate_vehicle, vehicles),
+    'customers': (validate_customer, customers),
+    'rentals': (validate_rental, rentals),
+}
+
+def _iter_json_array(f, chunk_size=1 << 16):
+    # incremental decode of a top-level JSON array without reading the whole file
+    decoder = json.JSONDecoder()
+    buf, pos, started = "", 0, False
+    while True:
+        chunk = f.read(chunk_size)
+        buf = buf[pos:] + chunk; pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if not started and pos < len(buf):
+                if buf[pos] != "[":
+                    raise ValueError("JSON import expects an array of objects (or use .jsonl)")
+                started = True; pos += 1
+                continue
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                break       # object continues in the next chunk
+            yield obj
+            pos = end
+        if not chunk:
+            if buf[pos:].strip():
+                raise ValueError("Truncated JSON array")
+            return
+
+def iter_records(path):
+    """Yield (record_no, dict) from a .csv, .jsonl/.ndjson or .json array file, streaming.
+
+    A .jsonl line that is not valid JSON is yielded as a ValidationError in
+    place of the dict, so the caller rejects that line and carries on.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if ext == ".csv":
+            for n, rec in enumerate(csv.DictReader(f), start=2):     # line 1 is the header
+                yield n, rec
+        elif ext in (".jsonl", ".ndjson"):
+            for n, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        rec = ValidationError(f"Invalid JSON: {e}")
+                    yield n, rec
+        elif ext == ".json":
+            for n, rec in enumerate(_iter_json_array(f), start=1):
+                yield n, rec
+        else:
+            raise ValueError(f"Unsupported import file type {ext!r} (use .csv, .json or .jsonl)")
+
+class _ImportBookings:
+    """The booking rules for one chunk of imported rentals, as book() applies them.
+
+    Locks the chunk's vehicles (in id order, like book()) and reads their
+    open rentals; rows are then checked in file order against those and
+    against the rows of the file accepted before them.
+    """
+    def __init__(self, cur, rows):
+        from availability import BookingSet     # loads on first use, not at startup
+        self.bookings = BookingSet()
+        self.vehicles = {}
+        vids, marks = _id_list(sorted({r[0] for _, r in rows if r[5] in ('ongoing', 'reserved')}))
+        if not vids:
+            return
+        cur.execute(f"SELECT id, status FROM vehicles WHERE id IN {marks} ORDER BY id FOR UPDATE", vids)
+        self.vehicles = {vid: {'status': status} for vid, status in cur.fetchall()}
+        cur.execute("SELECT id, vehicle_id, start_date, expected_return_date, status FROM rentals"
+                    f" WHERE vehicle_id IN {marks} AND status IN ('ongoing','reserved')", vids)
+        for rid, vid, sd, ed, status in cur.fetchall():
+            self.bookings.add(f"rental #{rid}", vid, sd, ed, status)
+
+    def check(self, row):
+        """Why the validated rental tuple can't be booked, or None."""
+        vid, _, sd, ed, _, status, _ = row
+        if status not in ('ongoing', 'reserved'):
+            return None
+        vehicle = self.vehicles.get(vid)
+        try:
+            check_booking(vehicle, None, status)
+        except BookingError as e:
+            return str(e)
+        clash = self.bookings.clash(vid, sd, ed)
+        if clash is not None:
+            return f"Vehicle is already booked for those dates ({clash})."
+        return None
+
+    def accept(self, n, row):
+        vid, _, sd, ed, _, status, _ = row
+        if status in ('ongoing', 'reserved'):
+            self.bookings.add(f"record {n} of this file", vid, sd, ed, status)
+            if status == 'ongoing':
+                self.vehicles[vid]['status'] = 'rented'
+
+# errors caused by one row's values (constraint, out of range, too long): that row is
+# rejected and the rest of the batch still goes in. Anything else aborts the import.
+_ROW_ERRORS = (mysql.connector.errors.IntegrityError, mysql.connector.errors.DataError)
+
+def _insert_chunk(repo, rows, rejects):
+    """Insert one batch in one transaction; on a bad row fall back to row-by-row.
+
+    Rentals go through the booking rules first (_ImportBookings); rows that
+    break them are rejected with the reason.
+    """
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            refused, ok = [], rows
+            if repo.table == 'rentals':
+                bookings, ok = _ImportBookings(cur, rows), []
+                for n, r in rows:
+                    err = bookings.check(r)
+                    if err:
+                        refused.append((n, err))
+                    else:
+                        bookings.accept(n, r); ok.append((n, r))
+            try:
+                repo.insert_many([r for _, r in ok], cur)
+                inserted = ok
+                rejects.extend(refused)
+            except _ROW_ERRORS:
+                conn.rollback()     # releases the vehicle locks: the rows are checked again below
+                bookings = _ImportBookings(cur, rows) if repo.table == 'rentals' else None
+                inserted = []
+                for n, r in rows:
+                    err = bookings.check(r) if bookings else None
+                    if err:
+                        rejects.append((n, err)); continue
+                    try:
+                        cur.execute(repo.insert_sql(), r)
+                    except _ROW_ERRORS as e:
+                        rejects.append((n, str(e))); continue
+                    if bookings:
+                        bookings.accept(n, r)
+                    inserted.append((n, r))
+            if repo.table == 'rentals':
+                # ongoing rentals take their vehicles off the available list, set-based
+                busy = sorted({r[0] for _, r in inserted if r[5] == 'ongoing'})
+                if busy:
+                    cur.execute(f"UPDATE vehicles SET status='rented' WHERE id IN ({','.join(['%s'] * len(busy))})", busy)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    return len(inserted)
+
+def import_file(table, path, chunk_rows=IMPORT_CHUNK_ROWS, progress=None, rejects_path=None):
+    """Stream records from ``path`` into ``table`` in validated, batched transactions.
+
+    Rows failing validation, a DB constraint or (rentals) the booking rules
+    are skipped and reported. ``progress(inserted, rejected)`` is called
+    after every chunk.
+    """
+    validator, repo = IMPORT_SPECS[table]
+    inserted, rejects, batch = 0, [], []
+    t0 = time.perf_counter()
+    for n, rec in iter_records(path):
+        if isinstance(rec, ValidationError):
+            rejects.append((n, str(rec))); continue
+        if not isinstance(rec, dict):
+            rejects.append((n, "Record is not an object")); continue
+        try:
+            batch.append((n, validator(rec)))
+        except ValidationError as ve:
+            rejects.append((n, str(ve)))
+        if len(batch) >= chunk_rows:
+            inserted += _insert_chunk(repo, batch, rejects); batch = []
+            if progress: progress(inserted, len(rejects))
+    if batch:
+        inserted += _insert_chunk(repo, batch, rejects)
+        if progress: progress(inserted, len(rejects))
+    if table == 'vehicles' or table == 'rentals':
+        vehicle_cache.invalidate()
+    if rejects and rejects_path:
+        with open(rejects_path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f); w.writerow(["record", "error"]); w.writerows(rejects)
+    elapsed = time.perf_counter() - t0
+    return {'table': table, 'inserted': inserted, 'rejected': len(rejects), 'rejects': rejects[:100],
+            'seconds': round(elapsed, 3), 'rows_per_sec': round(inserted / elapsed, 1) if elapsed else None}
+
+#############################################
+#              STREAMING EXPORT
+#############################################
+EXPORT_BATCH_ROWS = 5000     # rows pulled from the server cursor (and written) per step
+
+EXPORT_COLUMNS = ("id", "vehicle_id", "reg_no", "customer_id", "customer_name", "start_date",
+                  "expected_return_date", "actual_return_date", "status", "amount")
+
+# same joins and pricing as the grid; amount is the stored or computed revenue
+RENTALS_EXPORT_SQL = f"""
+    SELECT r.id, r.vehicle_id, v.reg_no, r.customer_id, c.name AS customer_name, r.start_date,
+           r.expected_return_date, r.actual_return_date, r.status,
+           COALESCE(r.amount,
+                    v.rate_per_day * {RENTAL_DAYS_SQL}
+           ) AS amount
+    FROM rentals r
+    LEFT JOIN vehicles v ON v.id = r.vehicle_id
+    LEFT JOIN customers c ON c.id = r.customer_id
+"""
+
+def stream_rentals(where=(), params=(), batch_rows=EXPORT_BATCH_ROWS, include_history=False):
+    """Yield batches (lists of tuples in EXPORT_COLUMNS order) from an unbuffered cursor.
+
+    Rows stream from the server as they are consumed, so memory is bounded
+    by ``batch_rows`` whatever the table size. The pooled connection is held
+    until the generator is exhausted or closed.
+    """
+    sql = with_history(RENTALS_EXPORT_SQL) if include_history else RENTALS_EXPORT_SQL
+    if where:
+        sql += " WHERE " + " AND ".join(f"({c})" for c in where)
+    sql += " ORDER BY r.id"
+    pool = get_pool()
+    conn = pool.acquire()
+    cur = None; clean = False
+    try:
+        cur = conn.cursor(buffered=False)
+        cur.execute(sql, tuple(params))
+        while True:
+            rows = cur.fetchmany(batch_rows)
+            if not rows:
+                break
+            yield rows
+        clean = True
+    finally:
+        try:
+            if cur: cur.close()
+        except Exception:
+            clean = False
+        # an abandoned unbuffered result leaves the connection unusable
+        pool.release(conn, discard=not clean)
+
+def _export_csv(path, batches, tally):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(EXPORT_COLUMNS)
+        for rows in batches:
+            w.writerows(rows)
+            tally(rows)
+
+def _export_parquet(path, batches, tally):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+    schema = pa.schema([("id", pa.int64()), ("vehicle_id", pa.int64()), ("reg_no", pa.string()),
+                        ("customer_id", pa.int64()), ("customer_name", pa.string()), ("start_date", pa.date32()),
+                        ("expected_return_date", pa.date32()), ("actual_return_date", pa.date32()),
+                        ("status", pa.string()), ("amount", pa.float64())])
+    amount_col = EXPORT_COLUMNS.index("amount")
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in batches:
+            # one row group per batch: transpose to columns, Decimal amounts to float
+            cols = [list(c) for c in zip(*rows)]
+            cols[amount_col] = [float(a) if a is not None else None for a in cols[amount_col]]
+            writer.write_table(pa.Table.from_arrays([pa.array(c, type=t) for c, t in zip(cols, schema.types)], schema=schema))
+            tally(rows)
+
+def export_rentals(path, status="", date_from=None, date_to=None, where=None, params=None, progress=None,
+                   include_history=False):
+    """Stream rentals (filtered like the rentals grid) to .csv or .parquet at ``path``.
+
+    Pass ``where``/``params`` (e.g. a PagedTree's current filter) to override
+    the status/date-range arguments; ``include_history`` adds archived
+    rentals. Returns row count and revenue total.
+    """
+    if where is None:
+        where, params = rental_filter("", status, date_from, date_to)
+    ext = os.path.splitext(path)[1].lower()
+    writer = {".csv": _export_csv, ".parquet": _export_parquet}.get(ext)
+    if writer is None:
+        raise ValueError(f"Unsupported export file type {ext!r} (use .csv or .parquet)")
+    totals = {'rows': 0, 'revenue': 0.0}
+    amount_col = EXPORT_COLUMNS.index("amount")
+    def tally(rows):
+        totals['rows'] += len(rows)
+        totals['revenue'] += sum(float(r[amount_col]) for r in rows if r[amount_col] is not None)
+        if progress: progress(totals['rows'])
+    t0 = time.perf_counter()
+    writer(path, stream_rentals(where, params or (), include_history=include_history), tally)
+    return dict(totals, revenue=round(totals['revenue'], 2), seconds=round(time.perf_counter() - t0, 3))